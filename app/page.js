@@ -160,11 +160,31 @@ export default function Terminal() {
   const [isBackendConnected, setIsBackendConnected] = useState(false);
   const [backendStatus, setBackendStatus] = useState('checking');
   const terminalRef = useRef(null);
+  const sessionIdRef = useRef(null);
+  const followRef = useRef(null);
 
   useEffect(() => {
+    // Reuse the backend session across reloads so its history is kept
+    sessionIdRef.current = window.localStorage.getItem('terminalx-session');
     checkBackendConnection();
   }, []);
 
+  // Print alert state changes pushed by the backend while connected
+  useEffect(() => {
+    if (!isBackendConnected) return;
+    const source = new EventSource(`${API_BASE_URL}/api/alerts/stream`);
+    source.addEventListener('alert', (e) => {
+      const { data } = JSON.parse(e.data);
+      const icon = data.state === 'firing' ? '🔥' : '✅';
+      setHistory(prev => [...prev, {
+        alert: data.state,
+        output: `${icon} ALERT ${data.state.toUpperCase()}: ${data.rule} (${data.expression}) value=${data.value}`,
+        timestamp: new Date()
+      }]);
+    });
+    return () => source.close();
+  }, [isBackendConnected]);
+
   // Check if backend is available
   const checkBackendConnection = async () => {
     try {
@@ -199,7 +219,8 @@ export default function Terminal() {
         },
         body: JSON.stringify({
           command: cmd,
-          current_path: path
+          current_path: path,
+          session_id: sessionIdRef.current
         })
       });
 
@@ -208,6 +229,10 @@ export default function Terminal() {
       }
 
       const data = await response.json();
+      if (data.session_id) {
+        sessionIdRef.current = data.session_id;
+        window.localStorage.setItem('terminalx-session', data.session_id);
+      }
       return data;
     } catch (error) {
       console.error('Backend command error:', error);
@@ -215,6 +240,42 @@ export default function Terminal() {
     }
   };
 
+  // Follow a file after `tail -f` by polling its continuation token
+  const stopFollowing = () => {
+    if (followRef.current) {
+      clearTimeout(followRef.current);
+      followRef.current = null;
+    }
+  };
+
+  const followFile = (token) => {
+    stopFollowing();
+    const poll = async () => {
+      try {
+        const params = new URLSearchParams({ token, session_id: sessionIdRef.current || '' });
+        const response = await fetch(`${API_BASE_URL}/api/files/read?${params}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        token = data.next_token;
+        if (data.data) {
+          const appended = data.data.replace(/\n$/, '');
+          setHistory(prev => {
+            // Alerts may have been printed since; append to the command's own entry
+            let index = prev.length - 1;
+            while (index > 0 && prev[index].alert) index--;
+            const entry = prev[index];
+            const output = entry.output ? `${entry.output}\n${appended}` : appended;
+            return [...prev.slice(0, index), { ...entry, output }, ...prev.slice(index + 1)];
+          });
+        }
+        followRef.current = setTimeout(poll, data.eof ? 1000 : 0);
+      } catch (error) {
+        console.error('Follow error:', error);
+      }
+    };
+    followRef.current = setTimeout(poll, 1000);
+  };
+
   // Get system monitoring data from backend
   const getSystemData = async (command) => {
     try {
@@ -318,6 +379,7 @@ sdb               0.12         2.34         1.23      23456      12345`;
   const executeCommand = async (cmd) => {
     const trimmedCmd = cmd.trim();
     if (!trimmedCmd) return;
+    stopFollowing();
 
     // Parse natural language commands
     const parsedCommand = parseNaturalLanguage(trimmedCmd);
@@ -355,6 +417,7 @@ sdb               0.12         2.34         1.23      23456      12345`;
     let output = '';
     let newPath = currentPath;
     let success = true;
+    let continuation = null;
 
     try {
       // Try backend first if connected
@@ -387,9 +450,11 @@ Mem:        ${systemData.memory_total} ${systemData.memory_used} ${systemData.me
                   output = ` ${new Date().toLocaleTimeString()} up ${systemData.uptime},  2 users,  load average: 0.15, 0.12, 0.08`;
                   break;
                 case 'ps':
-                  output = `  PID TTY          TIME CMD`;
-                  systemData.processes.slice(0, 10).forEach(proc => {
-                    output += `\n${proc.pid.toString().padStart(5)} pts/0    00:00:01 ${proc.name}`;
+                  output = `  PID  PPID USER       STAT     TIME CMD`;
+                  systemData.processes.filter(proc => proc.pid !== undefined).forEach(proc => {
+                    const seconds = Math.floor(proc.cpu_time || 0);
+                    const time = `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`;
+                    output += `\n${String(proc.pid).padStart(5)} ${String(proc.ppid ?? '').padStart(5)} ${(proc.username || '').slice(0, 10).padEnd(10)} ${(proc.status || '').slice(0, 4).padEnd(4)} ${time.padStart(8)} ${proc.command || proc.name}`;
                   });
                   break;
                 case 'iostat':
@@ -406,6 +471,7 @@ Mem:        ${systemData.memory_total} ${systemData.memory_used} ${systemData.me
             output = result.output;
             newPath = result.current_path;
             success = result.success;
+            continuation = result.continuation;
           }
         } catch (backendError) {
           console.log('Backend command failed, falling back to local simulation:', backendError.message);
@@ -433,6 +499,9 @@ Mem:        ${systemData.memory_total} ${systemData.memory_used} ${systemData.me
 
     addToHistory(parsedCommand, output);
     setCurrentPath(newPath);
+    if (continuation) {
+      followFile(continuation);
+    }
   };
 
   // Add to history
@@ -559,6 +628,46 @@ Natural Language Commands:
     }
   };
 
+  // Tab completion against the backend's command and file system index
+  const handleKeyDown = async (e) => {
+    if (e.key !== 'Tab' || !isBackendConnected) {
+      return;
+    }
+    e.preventDefault();
+    const line = command;
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/complete`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          line,
+          current_path: currentPath,
+          session_id: sessionIdRef.current
+        })
+      });
+      if (!response.ok) {
+        return;
+      }
+      const data = await response.json();
+      const completions = data.completions || [];
+      if (completions.length === 0) {
+        return;
+      }
+      let replacement = data.common_prefix;
+      if (completions.length === 1) {
+        replacement = completions[0].endsWith('/') ? completions[0] : completions[0] + ' ';
+      } else if (replacement.length <= data.partial.length) {
+        addToHistory(line, completions.join('  '));
+        return;
+      }
+      setCommand(line.slice(0, data.replace_from) + replacement);
+    } catch (error) {
+      console.error('Completion error:', error);
+    }
+  };
+
   // Scroll to bottom
   useEffect(() => {
     if (terminalRef.current) {
@@ -615,13 +724,21 @@ Natural Language Commands:
             animate={{ opacity: 1, y: 0 }}
             className="space-y-1"
           >
-            <div className="flex items-center space-x-2">
-              <span className="text-blue-400">$</span>
-              <span className="text-white">{item.command}</span>
-            </div>
-            <div className="text-gray-300 whitespace-pre-wrap ml-4">
-              {item.output}
-            </div>
+            {item.alert ? (
+              <div className={item.alert === 'firing' ? 'text-red-400' : 'text-yellow-300'}>
+                {item.output}
+              </div>
+            ) : (
+              <>
+                <div className="flex items-center space-x-2">
+                  <span className="text-blue-400">$</span>
+                  <span className="text-white">{item.command}</span>
+                </div>
+                <div className="text-gray-300 whitespace-pre-wrap ml-4">
+                  {item.output}
+                </div>
+              </>
+            )}
           </motion.div>
         ))}
 
@@ -633,6 +750,7 @@ Natural Language Commands:
             value={command}
             onChange={(e) => setCommand(e.target.value)}
             onKeyPress={handleKeyPress}
+            onKeyDown={handleKeyDown}
             className="bg-transparent text-white flex-1 outline-none"
             placeholder="Type a command or try 'help'..."
             autoFocus
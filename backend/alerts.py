@@ -0,0 +1,391 @@
+"""
+Threshold Alerting for TerminalX
+Rules over the sampler's metric stream, evaluated incrementally on every tick
+
+A rule compares one metric from ``flatten_snapshot`` with a threshold:
+
+    cpu.percent > 90                  latest value
+    cpu_percent_avg > 90 for 30s      average over the last 30s
+    swap percent max >= 50 for 1m     maximum over the last minute
+    memory.percent > 80 for 30s       held for 30s (minimum above 80)
+
+Metric words may be separated by dots, underscores or spaces, and a trailing
+``avg``/``min``/``max`` word picks the aggregate. ``for`` without one means
+"the condition held for the whole window", which is the window minimum for
+``>``/``>=`` and the maximum for ``<``/``<=``.
+
+Each distinct (metric, window) pair keeps one sliding window shared by all
+rules on it: a running sum for averages and monotonic deques for min/max,
+updated in O(1) amortized however long the window is, so nothing rescans
+history. Rules on the same aggregate are kept sorted by threshold and only
+those between the previous and the new value are tested, so a tick costs
+O(windows + state changes) rather than O(rules). A windowed rule only fires
+once its window has been observed for its full length. State changes are
+kept for pushing to subscribers and appended as JSON lines to a local log.
+
+With a rules file, rule changes are written there (under a file lock) and
+every worker reloads it when it changes, so a rule added through any worker
+is evaluated by all of them.
+"""
+
+import json
+import operator
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from timeseries import flatten_snapshot
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+AGGREGATES = ('avg', 'min', 'max')
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+    '==': operator.eq, '!=': operator.ne,
+}
+OPERATOR_NAMES = {'>': 'gt', '>=': 'ge', '<': 'lt', '<=': 'le', '==': 'eq', '!=': 'ne'}
+UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+_RULE = re.compile(
+    r'^\s*(?:(?P<name>[\w-]+)\s*:\s*)?(?P<metric>[A-Za-z][\w. ]*?)\s*(?P<op>>=|<=|==|!=|>|<)\s*'
+    r'(?P<threshold>-?\d+(?:\.\d+)?)\s*%?\s*'
+    r'(?:for\s+(?P<window>\d+(?:\.\d+)?)\s*(?P<unit>ms|s|m|h)?)?\s*$'
+)
+
+
+class RuleError(ValueError):
+    """A rule expression could not be parsed"""
+
+
+class UnknownMetric(RuleError):
+    """A rule names a metric the sampler does not report"""
+
+
+@lru_cache(maxsize=1024)
+def metric_key(name: str) -> str:
+    """Canonical metric name: lower case words joined by dots"""
+    return '.'.join(word for word in re.split(r'[\s_.]+', name.lower()) if word)
+
+
+class SlidingWindow:
+    """Sum, count, min and max of the samples in the last `seconds`, updated in O(1) amortized"""
+
+    __slots__ = ('seconds', 'first', 'total', '_samples', '_max', '_min')
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.first: Optional[float] = None  # timestamp of the first sample ever seen
+        self.total = 0.0
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._max: Deque[Tuple[float, float]] = deque()  # values decreasing front to back
+        self._min: Deque[Tuple[float, float]] = deque()  # values increasing front to back
+
+    def add(self, timestamp: float, value: float) -> None:
+        if self.first is None:
+            self.first = timestamp
+        self._samples.append((timestamp, value))
+        self.total += value
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        cutoff = timestamp - self.seconds
+        samples = self._samples
+        while samples[0][0] <= cutoff:
+            self.total -= samples.popleft()[1]
+        while self._max[0][0] <= cutoff:
+            self._max.popleft()
+        while self._min[0][0] <= cutoff:
+            self._min.popleft()
+
+    def full(self, now: float) -> bool:
+        """Whether samples have been seen for at least the whole window"""
+        return self.first is not None and now - self.first >= self.seconds
+
+    def value(self, aggregate: str) -> Optional[float]:
+        if not self._samples:
+            return None
+        if aggregate == 'avg':
+            return self.total / len(self._samples)
+        if aggregate == 'max':
+            return self._max[0][1]
+        if aggregate == 'min':
+            return self._min[0][1]
+        return self._samples[-1][1]
+
+
+class Rule:
+    """One parsed rule and its current alert state"""
+
+    __slots__ = ('name', 'expression', 'metric', 'aggregate', 'op', 'compare', 'threshold',
+                 'window', 'firing', 'since', 'group')
+
+    def __init__(self, name: str, expression: str, metric: str, aggregate: str, op: str,
+                 threshold: float, window: float):
+        self.name = name
+        self.expression = expression
+        self.metric = metric
+        self.aggregate = aggregate  # 'last', 'avg', 'min' or 'max'
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        self.window = window  # seconds; 0 for the latest value
+        self.firing = False
+        self.since: Optional[float] = None  # when the current state began
+        self.group: Optional[_RuleGroup] = None
+
+    @classmethod
+    def parse(cls, expression: str, name: Optional[str] = None) -> 'Rule':
+        match = _RULE.match(expression)
+        if match is None:
+            raise RuleError(f"Cannot parse rule '{expression}'; expected e.g. 'cpu.percent avg > 90 for 30s'")
+        words = metric_key(match['metric']).split('.')
+        aggregate = words.pop() if len(words) > 1 and words[-1] in AGGREGATES else None
+        window = float(match['window']) * UNITS[match['unit'] or 's'] if match['window'] else 0.0
+        op = match['op']
+        if window and aggregate is None:
+            if op in ('>', '>='):
+                aggregate = 'min'  # held for the whole window
+            elif op in ('<', '<='):
+                aggregate = 'max'
+            else:
+                raise RuleError(f"'{op}' with 'for' needs an aggregate (avg, min or max)")
+        elif aggregate is not None and not window:
+            raise RuleError(f"'{aggregate}' needs a window, e.g. 'for 30s'")
+        metric = '.'.join(words)
+        rule_name = name or match['name'] or f"{metric}.{aggregate or 'last'}.{OPERATOR_NAMES[op]}.{match['threshold']}"
+        return cls(rule_name, expression.strip(), metric, aggregate or 'last', op,
+                   float(match['threshold']), window)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'expression': self.expression, 'metric': self.metric,
+                'aggregate': self.aggregate, 'window': self.window, 'op': self.op,
+                'threshold': self.threshold, 'state': 'firing' if self.firing else 'ok',
+                'value': self.group.value if self.group is not None else None, 'since': self.since}
+
+
+class _RuleGroup:
+    """Rules sharing one (metric, window, aggregate) value, sorted by threshold per operator
+
+    When the value moves from `a` to `b`, only rules whose threshold lies
+    between the two can change state, so they are found by bisection instead
+    of testing every rule.
+    """
+
+    __slots__ = ('metric', 'window', 'aggregate', 'value', 'added', '_thresholds', '_rules')
+
+    def __init__(self, metric: str, window: float, aggregate: str):
+        self.metric = metric
+        self.window = window
+        self.aggregate = aggregate
+        self.value: Optional[float] = None
+        self.added = False  # rules were added since the last evaluation: test them all
+        self._thresholds: Dict[str, List[float]] = {}
+        self._rules: Dict[str, List[Rule]] = {}
+
+    def __bool__(self) -> bool:
+        return any(self._rules.values())
+
+    def add(self, rule: Rule) -> None:
+        thresholds = self._thresholds.setdefault(rule.op, [])
+        index = bisect_right(thresholds, rule.threshold)
+        thresholds.insert(index, rule.threshold)
+        self._rules.setdefault(rule.op, []).insert(index, rule)
+        rule.group = self
+        self.added = True
+
+    def remove(self, rule: Rule) -> None:
+        index = self._rules[rule.op].index(rule)
+        del self._thresholds[rule.op][index]
+        del self._rules[rule.op][index]
+
+    def candidates(self, value: float) -> Iterator[Rule]:
+        """Rules that may change state when the value moves from the last one to `value`"""
+        previous = self.value
+        for op, rules in self._rules.items():
+            if previous is None or self.added or op in ('==', '!='):
+                yield from rules
+                continue
+            thresholds = self._thresholds[op]
+            low, high = (previous, value) if previous <= value else (value, previous)
+            yield from rules[bisect_left(thresholds, low):bisect_right(thresholds, high)]
+
+
+class AlertEngine:
+    """Evaluates rules on each sampler snapshot and records state changes"""
+
+    def __init__(self, log_path: Optional[str] = None, rules_path: Optional[str] = None,
+                 max_events: int = 256):
+        self.log_path = log_path
+        self.rules_path = rules_path  # JSON {name: expression} shared by workers
+        self._rules_stamp: Optional[Tuple[int, int, int]] = None  # rules file version last loaded
+        self._rules: Dict[str, Rule] = {}
+        self._groups: Dict[Tuple[str, float, str], _RuleGroup] = {}
+        self._windows: Dict[Tuple[str, float], SlidingWindow] = {}
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=max_events)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def add(self, expression: str, name: Optional[str] = None,
+            metrics: Optional[Iterable[str]] = None) -> Rule:
+        """Parse and add a rule, replacing any rule with the same name
+
+        With `metrics` (the names ``flatten_snapshot`` reports), a rule on any
+        other metric raises UnknownMetric instead of never evaluating.
+        """
+        rule = Rule.parse(expression, name)
+        if metrics is not None and rule.metric not in {metric_key(metric) for metric in metrics}:
+            raise UnknownMetric(f"Unknown metric '{rule.metric}' in rule '{rule.expression}'")
+        if self.rules_path:
+            self._write_rules(lambda rules: rules.update({rule.name: rule.expression}))
+            self.sync()
+            with self._lock:
+                return self._rules[rule.name]
+        with self._lock:
+            self._add(rule)
+        return rule
+
+    def remove(self, name: str) -> bool:
+        if self.rules_path:
+            removed = self._write_rules(lambda rules: rules.pop(name, None) is not None)
+            self.sync()
+            return removed
+        with self._lock:
+            rule = self._rules.pop(name, None)
+            if rule is None:
+                return False
+            self._discard(rule)
+            return True
+
+    def _add(self, rule: Rule) -> None:
+        if rule.name in self._rules:
+            self._discard(self._rules[rule.name])
+        self._rules[rule.name] = rule
+        key = (rule.metric, rule.window, rule.aggregate)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _RuleGroup(*key)
+        group.add(rule)
+        if rule.window and (rule.metric, rule.window) not in self._windows:
+            self._windows[(rule.metric, rule.window)] = SlidingWindow(rule.window)
+
+    def _discard(self, rule: Rule) -> None:
+        group = rule.group
+        group.remove(rule)
+        if not group:
+            del self._groups[(group.metric, group.window, group.aggregate)]
+            if group.window and not any(key[:2] == (group.metric, group.window) for key in self._groups):
+                del self._windows[(group.metric, group.window)]
+
+    def _write_rules(self, change: Callable[[Dict[str, str]], Any]) -> Any:
+        """Apply `change` to the rules file's {name: expression} under a file lock"""
+        with open(self.rules_path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            rules = self._read_rules()
+            if rules is None:
+                # First change from any worker: start from the rules every worker was configured with
+                with self._lock:
+                    rules = {rule.name: rule.expression for rule in self._rules.values()}
+            result = change(rules)
+            temp = f"{self.rules_path}.{os.getpid()}.tmp"
+            with open(temp, 'w') as f:
+                json.dump(rules, f)
+            os.replace(temp, self.rules_path)
+        return result
+
+    def _read_rules(self) -> Optional[Dict[str, str]]:
+        try:
+            with open(self.rules_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def sync(self) -> None:
+        """Reload the rules file if another worker (or this one) changed it"""
+        if not self.rules_path:
+            return
+        try:
+            st = os.stat(self.rules_path)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._rules_stamp:
+            return
+        rules = self._read_rules() or {}
+        parsed = []
+        for name, expression in rules.items():
+            try:
+                parsed.append(Rule.parse(expression, name))
+            except RuleError:
+                continue  # written by a newer version or by hand: skip it, keep the rest
+        with self._lock:
+            for name in [name for name in self._rules if name not in rules]:
+                self._discard(self._rules.pop(name))
+            for rule in parsed:
+                current = self._rules.get(rule.name)
+                if current is None or current.expression != rule.expression:
+                    self._add(rule)  # unchanged rules keep their state
+            self._rules_stamp = stamp
+
+    def rules(self) -> List[Dict[str, Any]]:
+        self.sync()
+        with self._lock:
+            return [rule.to_dict() for rule in self._rules.values()]
+
+    def update(self, snapshot: Dict[str, Any], log: bool = True) -> None:
+        """Sampler listener: advance the windows and re-evaluate the rules that can change"""
+        self.sync()
+        values = {metric_key(metric): value for metric, value in flatten_snapshot(snapshot).items()}
+        now = snapshot.get('timestamp', time.time())
+        changes = []
+        with self._lock:
+            for (metric, _), window in self._windows.items():
+                value = values.get(metric)
+                if value is not None:
+                    window.add(now, value)
+            for group in self._groups.values():
+                if group.window:
+                    window = self._windows[(group.metric, group.window)]
+                    value = window.value(group.aggregate) if window.full(now) else None
+                else:
+                    value = values.get(group.metric)
+                if value is None:
+                    continue  # metric missing or window still filling: keep the state
+                for rule in group.candidates(value):
+                    if rule.since is None:
+                        rule.since = now
+                    firing = rule.compare(value, rule.threshold)
+                    if firing == rule.firing:
+                        continue
+                    rule.firing, rule.since = firing, now
+                    self._sequence += 1
+                    event = {'rule': rule.name, 'expression': rule.expression,
+                             'state': 'firing' if firing else 'resolved',
+                             'value': round(value, 3), 'threshold': rule.threshold, 'timestamp': now}
+                    self._events.append((self._sequence, event))
+                    changes.append(event)
+                group.value, group.added = value, False
+        if changes and log and self.log_path:
+            with open(self.log_path, 'a') as f:
+                f.writelines(json.dumps(event) + '\n' for event in changes)
+
+    @property
+    def sequence(self) -> int:
+        """Number of state changes so far; pass it to events_since to read newer ones"""
+        return self._sequence
+
+    def events_since(self, sequence: int) -> Tuple[int, List[Dict[str, Any]]]:
+        """State changes after `sequence` (as far as they are still kept) and the new position"""
+        with self._lock:
+            return self._sequence, [event for seq, event in self._events if seq > sequence]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Overlay VFS Benchmark for TerminalX
+Measures memory per idle session overlay and fork/reset cost over a shared base
+
+Usage: python benchmarks/bench_overlay.py [--sessions 10000] [--base-entries 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sessions import SessionManager  # noqa: E402
+from vfs import VirtualFileSystem, OverlayFileSystem  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--base-entries', type=int, default=100000)
+    args = parser.parse_args()
+
+    base = VirtualFileSystem()
+    for d in range(max(1, args.base_entries // 100)):
+        base.mkdir(f'/srv/d{d}', parents=True)
+        for f in range(99):
+            base.touch(f'/srv/d{d}/f{f}')
+
+    manager = SessionManager(max_sessions=args.sessions, fs_factory=lambda: OverlayFileSystem(base))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    async def create_all():
+        return [await manager.create() for _ in range(args.sessions)]
+    sessions = asyncio.run(create_all())
+    create = time.perf_counter() - start
+    idle = (tracemalloc.get_traced_memory()[0] - before) / len(sessions)
+
+    fs = sessions[0].fs
+    for i in range(100):
+        fs.touch(f'/tmp-{i}')
+    start = time.perf_counter()
+    forks = [fs.fork() for _ in range(10000)]
+    fork = (time.perf_counter() - start) / len(forks)
+    start = time.perf_counter()
+    forks[0].write('/srv/d0/f0', 'changed')
+    first_write = time.perf_counter() - start
+    start = time.perf_counter()
+    forks[0].reset()
+    reset = time.perf_counter() - start
+    tracemalloc.stop()
+
+    print(f'base entries:        {len(base):,}')
+    print(f'sessions:            {len(sessions):,} in {create:.2f}s')
+    print(f'memory/idle session: {idle / 1024:.2f} KB (session + overlay)')
+    print(f'fork:                {fork * 1e6:.2f} us')
+    print(f'first write of fork: {first_write * 1e6:.1f} us ({fs.delta_size} paths in delta)')
+    print(f'reset:               {reset * 1e6:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
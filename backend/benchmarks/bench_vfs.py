@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+VFS Benchmark for TerminalX
+Builds a large VirtualFileSystem and reports build rate, lookup/ls latency and memory
+
+Usage: python benchmarks/bench_vfs.py [--entries 1000000] [--per-dir 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs import VirtualFileSystem  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--per-dir', type=int, default=1000)
+    args = parser.parse_args()
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    fs = VirtualFileSystem()
+    paths = []
+
+    start = time.perf_counter()
+    dirs = max(1, args.entries // args.per_dir)
+    for d in range(dirs):
+        directory = f'/data/d{d:06d}'
+        fs.mkdir(directory, parents=True)
+        for f in range(args.per_dir - 1):
+            path = f'{directory}/file{f:06d}.log'
+            fs.touch(path)
+            if f % 97 == 0:
+                paths.append(path)
+    build = time.perf_counter() - start
+    rss_after = process.memory_info().rss
+
+    sample = random.sample(paths, min(len(paths), 10000))
+    start = time.perf_counter()
+    for path in sample:
+        fs.lookup(path)
+    lookup = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    fs.listdir('/data/d000000')
+    ls = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fs.resolve('../../d000001/./file000001.log', '/data/d000000/x')
+    resolve = time.perf_counter() - start
+
+    print(f'entries:          {len(fs):,}')
+    print(f'build:            {build:.2f}s ({len(fs) / build:,.0f} entries/s)')
+    print(f'lookup:           {lookup * 1e6:.2f} us')
+    print(f'ls ({args.per_dir} names): {ls * 1e6:.1f} us')
+    print(f'resolve:          {resolve * 1e6:.1f} us')
+    print(f'memory:           {(rss_after - rss_before) / 1024 ** 2:.0f} MB '
+          f'({(rss_after - rss_before) / len(fs):.0f} B/entry)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Fake psutil for TerminalX benchmarks
+Stands in for the parts of psutil that ProcessTable uses, with any number of processes
+
+Process calls are cheap and deterministic, so a benchmark measures the
+process table itself rather than /proc on the machine running it.
+"""
+
+import contextlib
+import random
+import time
+from collections import namedtuple
+
+from psutil import AccessDenied, NoSuchProcess  # noqa: F401 (re-exported like psutil)
+
+CpuTimes = namedtuple('CpuTimes', 'user system')
+MemoryInfo = namedtuple('MemoryInfo', 'rss vms')
+VirtualMemory = namedtuple('VirtualMemory', 'total available percent used free')
+
+STATUSES = ('running', 'sleeping', 'sleeping', 'sleeping', 'idle', 'disk-sleep', 'zombie')
+
+
+class FakeHost:
+    """A set of fake processes whose CPU counters advance on every tick()"""
+
+    def __init__(self, processes: int, seed: int = 0):
+        rng = random.Random(seed)
+        now = time.time()
+        self.rng = rng
+        self.processes = {
+            pid: Process(pid, now - rng.uniform(10, 86400), rng)
+            for pid in range(1, processes + 1)
+        }
+
+    def tick(self, churn: float = 0.01) -> None:
+        """Advance CPU time and replace a `churn` fraction of processes"""
+        for proc in self.processes.values():
+            proc.cpu += self.rng.random() * 0.05
+        for pid in self.rng.sample(list(self.processes), int(len(self.processes) * churn)):
+            self.processes[pid] = Process(pid, time.time(), self.rng)
+
+    def install(self, module) -> None:
+        """Point `module.psutil` at this host"""
+        module.psutil = _Module(self)
+
+
+class Process:
+    def __init__(self, pid: int, create_time: float, rng: random.Random):
+        self.pid = pid
+        self._create_time = create_time
+        self._name = f'proc{pid % 500}'
+        self._status = rng.choice(STATUSES)
+        self._rss = rng.randint(1, 512) * 1024 * 1024
+        self._ppid = rng.randrange(pid)  # some earlier pid, so the processes form a tree
+        self.cpu = rng.random() * 100
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+    def create_time(self) -> float:
+        return self._create_time
+
+    def name(self) -> str:
+        return self._name
+
+    def username(self) -> str:
+        return 'user'
+
+    def cmdline(self):
+        return [f'/usr/bin/{self._name}', '--serve', str(self.pid)]
+
+    def cpu_times(self) -> CpuTimes:
+        return CpuTimes(self.cpu * 0.7, self.cpu * 0.3)
+
+    def ppid(self) -> int:
+        return self._ppid
+
+    def status(self) -> str:
+        return self._status
+
+    def memory_info(self) -> MemoryInfo:
+        return MemoryInfo(self._rss, self._rss * 2)
+
+
+class _Module:
+    """The psutil module surface ProcessTable touches"""
+
+    AccessDenied = AccessDenied
+    NoSuchProcess = NoSuchProcess
+
+    def __init__(self, host: FakeHost):
+        self._host = host
+
+    def pids(self):
+        return list(self._host.processes)
+
+    def virtual_memory(self) -> VirtualMemory:
+        total = 64 * 1024 ** 3
+        return VirtualMemory(total, total // 2, 50.0, total // 2, total // 2)
+
+    def Process(self, pid: int) -> Process:
+        proc = self._host.processes.get(pid)
+        if proc is None:
+            raise NoSuchProcess(pid)
+        return proc
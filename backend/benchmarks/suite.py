@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for TerminalX
+Runs the backend hot-path benchmarks, writes JSON results and compares them to a baseline
+
+Usage: python benchmarks/suite.py [--quick] [--only vfs,commands] [--output results.json]
+                                  [--baseline benchmarks/baseline.json] [--save-baseline]
+                                  [--tolerance 0.15]
+
+Every result is named ``group.metric`` and has a direction: ``*_us``, ``*_ms``
+and ``*_bytes`` are lower-is-better, ``*_per_s`` and ``rps`` higher-is-better.
+A metric regresses when it is worse than the baseline by more than the
+tolerance; the script then exits with status 1. Baselines are machine
+specific, so save one on the machine that will run the comparison.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+Results = Dict[str, float]
+
+
+def timeit(fn: Callable[[], Any], repeat: int, rounds: int = 5) -> float:
+    """Median seconds per call over `rounds` rounds of `repeat` calls"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings.append((time.perf_counter() - start) / repeat)
+    return statistics.median(timings)
+
+
+def bench_commands(quick: bool) -> Results:
+    """execute_command latency per command type against a session overlay"""
+    import main
+    from vfs import OverlayFileSystem
+
+    fs = OverlayFileSystem(main.file_system)
+    fs.write('/home/user/big.log', '\n'.join(f'line {i} status={"ok" if i % 7 else "error"}'
+                                             for i in range(20000)))
+    env = {'HOME': '/home/user'}
+    commands = {
+        'pwd': 'pwd',
+        'echo': 'echo hello world',
+        'ls': 'ls -la /home/user/documents',
+        'cd': 'cd /etc',
+        'cat': 'cat /etc/hosts',
+        'grep_pipeline': 'cat big.log | grep error | wc -l',
+        'head_early_exit': 'cat big.log | head -n 5',
+        'touch_rm': 'touch scratch && rm scratch',
+        'ps': 'ps',
+        'free': 'free',
+    }
+    repeat = 20 if quick else 200
+    loop = asyncio.new_event_loop()
+    try:
+        results = {}
+        for name, line in commands.items():
+            seconds = timeit(lambda: loop.run_until_complete(
+                main.execute_command(line, '/home/user', dict(env), fs)), repeat)
+            results[f'{name}_us'] = seconds * 1e6
+        return results
+    finally:
+        loop.close()
+
+
+def bench_vfs(quick: bool) -> Results:
+    """ls and path resolution/lookup at growing directory and tree sizes"""
+    from vfs import VirtualFileSystem
+
+    results = {}
+    for size in (1000, 10000) if quick else (1000, 10000, 100000):
+        fs = VirtualFileSystem()
+        fs.mkdir('/data')
+        for i in range(size):
+            fs.touch(f'/data/file{i:07d}')
+        fs.mkdir('/data/a/b/c/d', parents=True)
+        results[f'listdir_{size}_us'] = timeit(lambda: fs.listdir('/data'), 10 if size > 10000 else 100) * 1e6
+        results[f'children_{size}_us'] = timeit(lambda: list(fs.children('/data')), 10) * 1e6
+        target = f'file{size // 2:07d}'
+        results[f'resolve_lookup_{size}_us'] = timeit(
+            lambda: fs.lookup(fs.resolve(f'../../../../{target}', '/data/a/b/c/d')), 10000) * 1e6
+    return results
+
+
+def bench_processes(quick: bool) -> Results:
+    """SystemMonitor.get_top_processes and the process tree against fake hosts with many processes"""
+    import process_table
+    import system_monitor
+    from benchmarks.fake_psutil import FakeHost
+
+    real_psutil = process_table.psutil
+    monitor = system_monitor.SystemMonitor()
+    results = {}
+    try:
+        for count in (1000, 5000) if quick else (1000, 10000, 50000):
+            host = FakeHost(count)
+            host.install(process_table)
+            monitor.process_table = process_table.ProcessTable()
+            start = time.perf_counter()
+            monitor.get_top_processes(10)
+            results[f'top_cold_{count}_ms'] = (time.perf_counter() - start) * 1e3
+
+            def tick():
+                host.tick()
+                monitor.get_top_processes(10)
+            results[f'top_warm_{count}_ms'] = timeit(tick, 1 if count > 10000 else 3) * 1e3
+            results[f'tree_{count}_ms'] = timeit(monitor.process_table.tree, 1 if count > 10000 else 3) * 1e3
+    finally:
+        process_table.psutil = real_psutil
+    return results
+
+
+def bench_http(quick: bool) -> Results:
+    """/api/command and /api/system throughput and latency through an in-process ASGI client"""
+    import httpx
+    import main
+    from perf import LatencyHistogram
+
+    concurrency = 8 if quick else 32
+    total = 200 if quick else 2000
+
+    async def load(client: httpx.AsyncClient, method: str, url: str, body=None) -> Results:
+        histogram = LatencyHistogram()
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                histogram.record(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return {'rps': histogram.count / elapsed,
+                'p50_ms': histogram.quantile(0.5) * 1e3,
+                'p99_ms': histogram.quantile(0.99) * 1e3}
+
+    async def run() -> Results:
+        await main.metrics_sampler.start()
+        while not main.metrics_sampler.sampling:
+            await asyncio.sleep(0.05)  # measure steady state, not the first sample
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+                session_id = (await client.post('/api/command', json={'command': 'pwd'})).json()['session_id']
+                results = {}
+                for name, (method, url, body) in {
+                    'command': ('POST', '/api/command', {'command': 'ls -la', 'session_id': session_id}),
+                    'system': ('GET', '/api/system', None),
+                }.items():
+                    for metric, value in (await load(client, method, url, body)).items():
+                        results[f'{name}_{metric}'] = value
+                return results
+        finally:
+            await main.metrics_sampler.stop()
+
+    return asyncio.run(run())
+
+
+def bench_alerts(quick: bool) -> Results:
+    """AlertEngine cost per sampler tick as rule count and window length grow"""
+    import math
+    from alerts import AlertEngine
+
+    def snapshot(t: int) -> Dict[str, Any]:
+        value = 50 + 40 * math.sin(t / 30)
+        return {'timestamp': float(t), 'cpu': {'cpu_percent_average': value, 'load_average': (1, 1, 1)},
+                'memory': {'virtual_memory': {'percent': value, 'used': 0},
+                           'swap_memory': {'percent': value / 2, 'used': 0}}}
+
+    results = {}
+    ticks = 500 if quick else 3000
+    for rules in (10, 1000) if quick else (10, 1000, 10000):
+        for window in (10, 600):
+            engine = AlertEngine()
+            for i in range(rules):
+                metric = ('cpu.percent', 'memory.percent', 'swap.percent')[i % 3]
+                engine.add(f"{metric} {('avg', 'max', 'min')[i % 3]} > {i * 100 / rules:.3f} for {window}s",
+                           name=f'rule{i}')
+            for t in range(window):  # fill the windows first
+                engine.update(snapshot(t))
+            start = time.perf_counter()
+            for t in range(window, window + ticks):
+                engine.update(snapshot(t))
+            results[f'tick_{rules}_rules_{window}s_us'] = (time.perf_counter() - start) / ticks * 1e6
+    return results
+
+
+def bench_startup(quick: bool) -> Results:
+    """Cold start: process spawn to first /api/health answer, with the server's own phase breakdown"""
+    import socket
+    import subprocess
+    import urllib.request
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(1 if quick else 5):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-c', f"import uvicorn; uvicorn.run('main:app', port={port}, log_level='warning')"],
+            cwd=backend, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while True:
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+                    break
+                except OSError:
+                    if server.poll() is not None:
+                        raise RuntimeError('server exited during startup')
+                    time.sleep(0.005)
+            elapsed = time.perf_counter() - start
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/debug/perf') as response:
+                phases = json.loads(response.read())['startup']['phases_ms']
+            runs.append({'first_health_ms': elapsed * 1e3, **{f'{k}_ms': v for k, v in phases.items()}})
+        finally:
+            server.terminate()
+            server.wait()
+    return {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+
+
+def bench_wire(quick: bool) -> Results:
+    """Bytes on the wire and encode time per monitoring format against the Pydantic SystemInfo body"""
+    import gzip
+    import main
+    import payloads
+
+    names = ['python3', 'node', 'postgres', 'nginx', 'systemd', 'sshd', 'chrome', 'dockerd']
+    statuses = ['running', 'sleeping', 'idle']
+    results = {}
+    for count in (20, 200) if quick else (20, 200, 2000):
+        processes = [{'pid': 1000 + i, 'name': names[i % len(names)],
+                      'cpu_percent': round((i * 7.3) % 100, 1), 'memory_percent': round((i * 1.7) % 30, 1),
+                      'username': 'root' if i % 3 else 'user', 'status': statuses[i % len(statuses)],
+                      'create_time': f'{i % 24:02d}:{i % 60:02d}:{i * 7 % 60:02d}'} for i in range(count)]
+        info = {'cpu_percent': 12.5, 'memory_percent': 43.1, 'memory_used': '6.9 GB',
+                'memory_total': '16.0 GB', 'disk_usage': '120.4 GB/500.0 GB (24.1%)',
+                'uptime': '3 days, 4:05', 'processes': processes, 'snapshot_age': 0.2}
+        repeat = 50 if quick else 200
+
+        def pydantic_body() -> bytes:
+            return main.SystemInfo(**info).model_dump_json(exclude_unset=True).encode()
+        results[f'pydantic_{count}_bytes'] = len(pydantic_body())
+        results[f'pydantic_{count}_us'] = timeit(pydantic_body, repeat) * 1e6
+        results[f'pydantic_{count}_gzip_bytes'] = len(gzip.compress(pydantic_body(), mtime=0))
+
+        data = main.SystemInfo(**info).model_dump(exclude_unset=True)
+        for fmt in payloads.available_formats():
+            for encoding in (None, 'gzip', 'br'):
+                if encoding == 'br' and payloads.brotli is None:
+                    continue
+                name = f'{fmt}_{count}' + (f'_{encoding}' if encoding else '')
+
+                def encode() -> bytes:
+                    return payloads.compress(payloads.serialize(data, fmt), encoding)[0]
+                results[f'{name}_bytes'] = len(encode())
+                results[f'{name}_us'] = timeit(encode, repeat) * 1e6
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[bool], Results]] = {
+    'commands': bench_commands,
+    'vfs': bench_vfs,
+    'processes': bench_processes,
+    'http': bench_http,
+    'wire': bench_wire,
+    'startup': bench_startup,
+    'alerts': bench_alerts,
+}
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith('_per_s') or metric.endswith('rps')
+
+
+def compare(results: Results, baseline: Results, tolerance: float) -> List[str]:
+    """Lines describing metrics worse than baseline by more than `tolerance`"""
+    regressions = []
+    for metric, value in sorted(results.items()):
+        base = baseline.get(metric)
+        if not base:
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better(metric) else change
+        if worse > tolerance:
+            regressions.append(f'{metric}: {base:.3f} -> {value:.3f} ({change:+.1%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='smaller sizes for a fast smoke run')
+    parser.add_argument('--only', default='', help='comma separated benchmark groups: ' + ','.join(BENCHMARKS))
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    groups = [g for g in args.only.split(',') if g] or list(BENCHMARKS)
+    unknown = set(groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark groups: {', '.join(sorted(unknown))}")
+
+    results: Results = {}
+    for group in groups:
+        start = time.perf_counter()
+        for metric, value in BENCHMARKS[group](args.quick).items():
+            results[f'{group}.{metric}'] = round(value, 3)
+        print(f'{group}: done in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    for metric, value in results.items():
+        print(f'{metric:<40} {value:>14,.3f}')
+
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quick': args.quick,
+        'timestamp': time.time(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick:
+            print('warning: baseline was recorded with a different --quick setting', file=sys.stderr)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:')
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print(f'\nno regressions beyond {args.tolerance:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
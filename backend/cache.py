@@ -0,0 +1,69 @@
+"""
+Response Cache for TerminalX
+Short-TTL cache with single-flight coalescing for monitoring endpoints
+
+Concurrent misses for the same key wait on the first caller's computation
+instead of repeating it, so N polling tabs cost one psutil read per TTL.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Any, Hashable, Tuple
+
+
+class TTLCache:
+    """Async get-or-compute cache with a per-call TTL"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key: Hashable, ttl: float, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            # shield: a follower giving up must not cancel the leader's work
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so a lone miss does not log a warning
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+        self._store(key, time.monotonic() + ttl, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key: Hashable, expires_at: float, value: Any) -> None:
+        entries = self._entries
+        if len(entries) >= self.max_entries and key not in entries:
+            now = time.monotonic()
+            for stale in [k for k, (expires, _) in entries.items() if expires <= now]:
+                del entries[stale]
+            if len(entries) >= self.max_entries:
+                del entries[next(iter(entries))]  # oldest insertion
+        entries[key] = (expires_at, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'coalesced': self.coalesced}
@@ -0,0 +1,170 @@
+"""
+Command Registry for TerminalX
+Declarative command handlers with O(1) dispatch and lazily imported plugin modules
+
+Command modules are listed in a manifest (module -> command names) and only
+imported the first time one of their commands runs. Inside a module, handlers
+declare their argument spec, help text and execution kind with ``@command``.
+"""
+
+import importlib
+from typing import Callable, Dict, List, Iterable, Iterator, Optional, Tuple
+
+from trie import Trie
+
+SYNC = 'sync'  # handler(ctx, flags, operands) -> str
+ASYNC = 'async'  # async handler(ctx, flags, operands) -> str
+STREAM = 'stream'  # handler(ctx, flags, operands, stdin) -> iterable of lines
+
+
+class CommandError(Exception):
+    """Raised by handlers to fail a command with a shell-style message"""
+
+
+class CommandContext:
+    """Per-invocation shell state handed to command handlers"""
+
+    __slots__ = ('cwd', 'env', 'fs', 'session', 'status', 'continuation', 'truncated')
+
+    def __init__(self, cwd: str, env: Dict[str, str], fs, session=None):
+        self.cwd = cwd
+        self.env = env
+        self.fs = fs
+        self.session = session
+        self.status = 0  # exit status of the last pipeline, for $?
+        self.continuation: Optional[str] = None  # token for reading on, e.g. after tail -f
+        self.truncated = False  # output stopped at settings.MAX_OUTPUT_BYTES
+
+
+class Command:
+    """A registered command: handler plus its declared argument spec"""
+
+    __slots__ = ('name', 'handler', 'usage', 'summary', 'flags', 'min_args',
+                 'max_args', 'missing', 'kind', 'complete')
+
+    def __init__(self, name: str, handler: Callable, usage: str, summary: str,
+                 flags: Optional[str] = '', min_args: int = 0,
+                 max_args: Optional[int] = None, missing: str = 'missing operand',
+                 kind: str = SYNC, complete: Optional[str] = 'path'):
+        self.name = name
+        self.handler = handler
+        self.usage = usage
+        self.summary = summary
+        self.flags = flags  # accepted single-letter flags; None passes args through raw
+        self.min_args = min_args
+        self.max_args = max_args
+        self.missing = missing
+        self.kind = kind
+        self.complete = complete  # operand completion: 'path', 'dir' or None
+
+    def parse(self, args: List[str]) -> Tuple[str, List[str]]:
+        """Split and validate args against the spec, raising CommandError"""
+        if self.flags is None:
+            return '', args
+        flags, operands = split_flags(args)
+        for flag in flags:
+            if flag not in self.flags:
+                raise CommandError(f"{self.name}: invalid option -- '{flag}'")
+        if len(operands) < self.min_args:
+            raise CommandError(f"{self.name}: {self.missing}")
+        if self.max_args is not None and len(operands) > self.max_args:
+            raise CommandError(f"{self.name}: too many arguments")
+        return flags, operands
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """Lazily yield the lines of `text` without building a list"""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def split_flags(args: List[str]) -> Tuple[str, List[str]]:
+    """Separate leading single-dash flags from operands: ['-rf', 'x'] -> ('rf', ['x'])"""
+    flags = ""
+    for i, arg in enumerate(args):
+        if arg == "--":
+            return flags, args[i + 1:]
+        if arg.startswith("-") and len(arg) > 1:
+            flags += arg[1:]
+        else:
+            return flags, args[i:]
+    return flags, []
+
+
+class CommandRegistry:
+    """Name -> Command table backed by a lazily imported module manifest"""
+
+    def __init__(self):
+        self._commands: Dict[str, Command] = {}
+        self._manifest: Dict[str, str] = {}  # command name -> module
+        self._names = Trie()  # all known names, for prefix completion
+
+    def register_module(self, module: str, names: Iterable[str]) -> None:
+        """Declare that importing `module` registers `names`"""
+        for name in names:
+            self._names.add(name)
+            self._manifest[name] = module
+
+    def register(self, cmd: Command) -> None:
+        self._names.add(cmd.name)
+        self._commands[cmd.name] = cmd
+
+    def get(self, name: str) -> Optional[Command]:
+        cmd = self._commands.get(name)
+        if cmd is None and name in self._manifest:
+            importlib.import_module(self._manifest[name])
+            cmd = self._commands.get(name)
+        return cmd
+
+    def names(self) -> List[str]:
+        return list(self._names.iter_prefix(""))
+
+    def complete(self, prefix: str, limit: int = 50) -> List[str]:
+        """Command names starting with `prefix`"""
+        return self._names.complete(prefix, limit)
+
+    def commands(self) -> List[Command]:
+        """All commands in manifest order, importing every module"""
+        ordered = list(dict.fromkeys(list(self._manifest) + list(self._commands)))
+        return [cmd for cmd in (self.get(name) for name in ordered) if cmd is not None]
+
+    def help_text(self) -> str:
+        lines = ["Available commands:"]
+        for cmd in self.commands():
+            lines.append(f"  {cmd.usage:<18} - {cmd.summary}")
+        return "\n".join(lines)
+
+
+registry = CommandRegistry()
+
+
+def command(name: str, usage: Optional[str] = None, summary: str = '', **spec) -> Callable:
+    """Decorator registering `handler(ctx, flags, operands) -> str` as `name`"""
+    def decorator(handler: Callable) -> Callable:
+        registry.register(Command(name, handler, usage or name, summary, **spec))
+        return handler
+    return decorator
+
+
+def load_plugins(spec: str) -> None:
+    """Register plugin modules from 'module:cmd1,cmd2;other.module:cmd3'"""
+    for entry in filter(None, (part.strip() for part in spec.split(';'))):
+        module, _, names = entry.partition(':')
+        registry.register_module(module.strip(), [n.strip() for n in names.split(',') if n.strip()])
+
+
+BUILTIN_MODULES = {
+    'commands.filesystem': ('ls', 'pwd', 'cd', 'mkdir', 'touch', 'cat', 'rm', 'rmdir', 'mv'),
+    'commands.shell': ('echo', 'env', 'export', 'clear', 'help', 'history'),
+    'commands.text': ('grep', 'head', 'tail', 'wc', 'sort', 'uniq'),
+    'commands.system': ('top', 'htop', 'free', 'df', 'uptime', 'ps', 'pstree'),
+}
+
+for _module, _names in BUILTIN_MODULES.items():
+    registry.register_module(_module, _names)
@@ -0,0 +1,122 @@
+"""
+File System Commands for TerminalX
+ls, pwd, cd, mkdir, touch, cat, rm, rmdir and mv over the session's VFS
+"""
+
+from datetime import datetime
+from typing import List, Iterable, Iterator, Optional
+
+from commands import command, CommandContext, CommandError, STREAM
+
+
+@command('ls', 'ls [-la] [dir]', 'List directory contents', flags='la', max_args=1)
+def ls(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    fs = ctx.fs
+    target = operands[0] if operands else "."
+    try:
+        path = fs.resolve(target, ctx.cwd)
+        if "l" not in flags:
+            names = fs.listdir(path)
+            if "a" not in flags:
+                names = [name for name in names if not name.startswith(".")]
+            return " ".join(names)
+        entries = list(fs.children(path))
+    except OSError as e:
+        raise CommandError(f"ls: cannot access '{target}': {e.strerror}")
+    lines = [f"total {len(entries)}"]
+    for node in entries:
+        if node.name.startswith(".") and "a" not in flags:
+            continue
+        permissions = "drwxr-xr-x" if node.is_dir else "-rw-r--r--"
+        date = datetime.fromtimestamp(node.mtime).strftime("%b %d %H:%M")
+        lines.append(f"{permissions} 1 user user {node.size:>5} {date} {node.name}")
+    return "\n".join(lines)
+
+
+@command('pwd', summary='Print working directory', max_args=0, complete=None)
+def pwd(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    return ctx.cwd
+
+
+@command('cd', 'cd <dir>', 'Change directory', max_args=1, complete='dir')
+def cd(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    target = operands[0] if operands else "/"
+    path = ctx.fs.resolve(target, ctx.cwd)
+    try:
+        node = ctx.fs.lookup(path)
+    except OSError as e:
+        raise CommandError(f"cd: {target}: {e.strerror}")
+    if not node.is_dir:
+        raise CommandError(f"cd: {target}: Not a directory")
+    ctx.cwd = path
+    return ""
+
+
+@command('mkdir', 'mkdir [-p] <dir>', 'Create directory', flags='p', min_args=1, complete='dir')
+def mkdir(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    for operand in operands:
+        try:
+            ctx.fs.mkdir(ctx.fs.resolve(operand, ctx.cwd), parents="p" in flags)
+        except OSError as e:
+            raise CommandError(f"mkdir: cannot create directory '{operand}': {e.strerror}")
+    return ""
+
+
+@command('touch', 'touch <file>', 'Create file', min_args=1, missing='missing file operand')
+def touch(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    for operand in operands:
+        try:
+            ctx.fs.touch(ctx.fs.resolve(operand, ctx.cwd))
+        except OSError as e:
+            raise CommandError(f"touch: cannot touch '{operand}': {e.strerror}")
+    return ""
+
+
+@command('cat', 'cat [file...]', 'Display file contents', kind=STREAM)
+def cat(ctx: CommandContext, flags: str, operands: List[str],
+        stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    if not operands:
+        if stdin is None:
+            raise CommandError("cat: missing file operand")
+        yield from stdin
+        return
+    for operand in operands:
+        try:
+            blob = ctx.fs.open(ctx.fs.resolve(operand, ctx.cwd))
+        except OSError as e:
+            raise CommandError(f"cat: {operand}: {e.strerror}")
+        yield from blob.lines()
+
+
+@command('rm', 'rm [-rf] <path>', 'Remove file or directory', flags='rRf', min_args=1)
+def rm(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    for operand in operands:
+        try:
+            ctx.fs.remove(ctx.fs.resolve(operand, ctx.cwd), recursive="r" in flags.lower())
+        except FileNotFoundError as e:
+            if "f" not in flags:
+                raise CommandError(f"rm: cannot remove '{operand}': {e.strerror}")
+        except OSError as e:
+            raise CommandError(f"rm: cannot remove '{operand}': {e.strerror}")
+    return ""
+
+
+@command('rmdir', 'rmdir <dir>', 'Remove empty directory', min_args=1, complete='dir')
+def rmdir(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    for operand in operands:
+        try:
+            ctx.fs.rmdir(ctx.fs.resolve(operand, ctx.cwd))
+        except OSError as e:
+            raise CommandError(f"rmdir: failed to remove '{operand}': {e.strerror}")
+    return ""
+
+
+@command('mv', 'mv <src> <dst>', 'Move or rename', min_args=2, max_args=2,
+         missing='missing destination file operand')
+def mv(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    src, dst = operands
+    try:
+        ctx.fs.move(ctx.fs.resolve(src, ctx.cwd), ctx.fs.resolve(dst, ctx.cwd))
+    except OSError as e:
+        raise CommandError(f"mv: cannot move '{src}' to '{dst}': {e.strerror}")
+    return ""
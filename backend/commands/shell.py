@@ -0,0 +1,58 @@
+"""
+Shell Builtins for TerminalX
+echo, env, export, clear, help and history
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+from commands import command, registry, CommandContext, CommandError, STREAM
+
+
+@command('echo', 'echo <text>', 'Display text', flags=None, complete=None)
+def echo(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    return " ".join(operands)
+
+
+@command('env', summary='Show environment variables', max_args=0, complete=None)
+def env(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    return "\n".join(f"{key}={value}" for key, value in sorted(ctx.env.items()))
+
+
+@command('export', 'export K=V', 'Set an environment variable', flags=None, complete=None)
+def export(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    for assignment in operands:
+        key, sep, value = assignment.partition("=")
+        if not sep or not key:
+            raise CommandError(f"export: '{assignment}': not a valid identifier")
+        ctx.env[key] = value
+    return ""
+
+
+@command('clear', summary='Clear screen', max_args=0, complete=None)
+def clear(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    return "\033[2J\033[H"
+
+
+@command('help', summary='Show this help', max_args=0, complete=None)
+def help(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    return registry.help_text()
+
+
+@command('history', 'history [-c] [n]', 'Show command history', flags='c', max_args=1,
+         kind=STREAM, complete=None)
+def history(ctx: CommandContext, flags: str, operands: List[str],
+            stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    log = ctx.session.history if ctx.session is not None else None
+    if log is None:
+        return
+    if 'c' in flags:
+        log.clear()
+        return
+    if operands:
+        if not operands[0].isdigit():
+            raise CommandError(f"history: {operands[0]}: numeric argument required")
+        entries = log.tail(int(operands[0]))
+    else:
+        entries = log.entries()
+    for number, entry in entries:
+        yield f"{number:>5}  {entry}"
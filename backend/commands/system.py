@@ -0,0 +1,134 @@
+"""
+System Monitoring Commands for TerminalX
+top, htop, free, df, uptime, ps and pstree rendered from the shared sampler snapshot
+
+None of these run psutil on the event loop: top, htop, free, df and uptime
+only read the sampler snapshot, and ps and pstree read the process table on
+the monitor executor (scanning it there only when no local sampler does).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+from commands import command, CommandContext, CommandError, ASYNC
+from executor import MonitorTimeout, monitor_executor
+from sampler import SnapshotUnavailable, metrics_sampler
+from system_monitor import system_monitor
+
+
+def _snapshot(name: str, *groups: str) -> Dict[str, Any]:
+    """The latest sampler snapshot, failing the command if `groups` have not been read yet"""
+    try:
+        snapshot, _ = metrics_sampler.latest()
+    except SnapshotUnavailable:
+        snapshot = {}
+    if any(group not in snapshot for group in groups):
+        raise CommandError(f"{name}: no system metrics sampled yet, try again in a moment")
+    return snapshot
+
+
+async def _monitor(name: str, fn, *args) -> Any:
+    try:
+        return await monitor_executor.run(fn, *args, key=(fn.__name__, *args))
+    except MonitorTimeout:
+        raise CommandError(f"{name}: timed out reading processes")
+
+
+@command('top', summary='Show system processes', max_args=0, kind=ASYNC, complete=None)
+async def top(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    snapshot = _snapshot('top', 'cpu', 'memory', 'uptime', 'processes')
+    cpu = snapshot['cpu']
+    memory = snapshot['memory']['virtual_memory']
+    load = ", ".join(f"{x:.2f}" for x in cpu.get('load_average', (0, 0, 0)))
+    lines = [
+        f"top - {datetime.now().strftime('%H:%M:%S')} up {snapshot['uptime'].get('uptime_formatted', '?')},  load average: {load}",
+        f"%Cpu(s): {cpu.get('cpu_percent_average', 0.0):5.1f} us",
+        f"MiB Mem: {memory['total'] / 1024 ** 2:9.1f} total, {memory['free'] / 1024 ** 2:9.1f} free, {memory['used'] / 1024 ** 2:9.1f} used",
+        "",
+        "  PID USER      %CPU  %MEM COMMAND"
+    ]
+    for proc in snapshot['processes']:
+        if 'error' in proc:
+            continue
+        lines.append(f"{proc['pid']:>5} {proc['username'][:8]:<8} {proc['cpu_percent']:>5.1f} {proc['memory_percent']:>5.1f} {proc['command']}")
+    return "\n".join(lines)
+
+
+@command('htop', summary='Show system processes (enhanced)', max_args=0, kind=ASYNC, complete=None)
+async def htop(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    snapshot = _snapshot('htop', 'cpu', 'memory')
+    bars = [f"{i:>3}{system_monitor.format_percent_bar(percent)}"
+            for i, percent in enumerate(snapshot['cpu'].get('cpu_percent_per_core', []))]
+    memory = snapshot['memory']['virtual_memory']
+    bars.append(f"Mem{system_monitor.format_percent_bar(memory['percent'])}")
+    return "\n".join(bars) + "\n\n" + await top(ctx, flags, operands)
+
+
+@command('free', summary='Show memory usage', flags='h', max_args=0, kind=ASYNC, complete=None)
+async def free(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    snapshot = _snapshot('free', 'memory')
+    memory = snapshot['memory']['virtual_memory']
+    swap = snapshot['memory']['swap_memory']
+    fmt = system_monitor.format_bytes if "h" in flags else (lambda value: value // 1024)
+    return "\n".join([
+        f"{'':<8}{'total':>12}{'used':>12}{'free':>12}{'buff/cache':>12}{'available':>12}",
+        f"{'Mem:':<8}{fmt(memory['total']):>12}{fmt(memory['used']):>12}{fmt(memory['free']):>12}"
+        f"{fmt(memory['cached'] + memory['buffers']):>12}{fmt(memory['available']):>12}",
+        f"{'Swap:':<8}{fmt(swap['total']):>12}{fmt(swap['used']):>12}{fmt(swap['free']):>12}"
+    ])
+
+
+@command('df', summary='Show disk usage', flags='h', max_args=0, kind=ASYNC, complete=None)
+async def df(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    snapshot = _snapshot('df', 'disk')
+    disk = snapshot['disk']['disk_usage']
+    fmt = system_monitor.format_bytes if "h" in flags else (lambda value: value // 1024)
+    size = "Size" if "h" in flags else "1K-blocks"
+    return "\n".join([
+        f"{'Filesystem':<12}{size:>12}{'Used':>12}{'Available':>12}{'Use%':>6} Mounted on",
+        f"{'/dev/root':<12}{fmt(disk['total']):>12}{fmt(disk['used']):>12}{fmt(disk['free']):>12}{disk['percent']:>5.0f}% /"
+    ])
+
+
+@command('uptime', summary='Show system uptime', max_args=0, kind=ASYNC, complete=None)
+async def uptime(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    snapshot = _snapshot('uptime', 'cpu', 'uptime')
+    load = ", ".join(f"{x:.2f}" for x in snapshot['cpu'].get('load_average', (0, 0, 0)))
+    return f" {datetime.now().strftime('%H:%M:%S')} up {snapshot['uptime'].get('uptime_formatted', '?')},  load average: {load}"
+
+
+@command('ps', summary='Show running processes', flags='auxe', max_args=0, kind=ASYNC, complete=None)
+async def ps(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    processes = await _monitor('ps', system_monitor.get_processes, 50, not metrics_sampler.sampling)
+    lines = ["  PID USER       STAT START    %CPU %MEM CMD"]
+    for proc in processes:
+        if 'error' in proc:
+            continue
+        lines.append(f"{proc['pid']:>5} {proc['username'][:10]:<10} {proc['status'][:4]:<4} {proc['create_time']} "
+                     f"{proc['cpu_percent']:>5.1f} {proc['memory_percent']:>4.1f} {proc['name']}")
+    return "\n".join(lines)
+
+
+@command('pstree', usage='pstree [pid]', summary='Show processes as a tree', flags='p', max_args=1,
+         kind=ASYNC, complete=None)
+async def pstree(ctx: CommandContext, flags: str, operands: List[str]) -> str:
+    try:
+        root = int(operands[0]) if operands else None
+    except ValueError:
+        raise CommandError(f"pstree: invalid pid '{operands[0]}'")
+    tree = await _monitor('pstree', system_monitor.get_process_tree, root, None, not metrics_sampler.sampling)
+    if tree is None:
+        raise CommandError(f"pstree: no process with pid {root}")
+    lines: List[str] = []
+
+    def draw(node: Dict[str, Any], prefix: str, branch: str, rest: str) -> None:
+        label = f"{node['name']}({node['pid']})" if "p" in flags else node['name']
+        lines.append(f"{prefix}{branch}{label}")
+        children = node['children']
+        for i, child in enumerate(children):
+            last = i == len(children) - 1
+            draw(child, prefix + rest, "└─" if last else "├─", "  " if last else "│ ")
+
+    for node in tree:
+        draw(node, "", "", "")
+    return "\n".join(lines)
@@ -0,0 +1,175 @@
+"""
+Text Filter Commands for TerminalX
+grep, head, tail, wc, sort and uniq as streaming pipeline stages
+
+File operands are read as ``FileBlob``s, so large files are scanned in place:
+``tail`` seeks back from the end, ``grep`` runs its regex over the whole
+buffer and ``wc`` counts in one pass. Stdin is a plain stream of lines.
+"""
+
+import re
+from collections import deque
+from typing import List, Iterable, Iterator, Optional, Tuple, Union
+
+from commands import command, CommandContext, CommandError, STREAM
+from filestore import FileBlob, PartialLine, encode_token
+
+Source = Union[FileBlob, Iterable[str]]
+
+
+def _inputs(ctx: CommandContext, name: str, operands: List[str],
+            stdin: Optional[Iterable[str]]) -> Iterator[Tuple[str, Source]]:
+    """(label, source) for each file operand, or for stdin when there are none"""
+    if not operands:
+        if stdin is None:
+            raise CommandError(f"{name}: missing file operand")
+        yield "", stdin
+        return
+    for operand in operands:
+        try:
+            yield operand, ctx.fs.open(ctx.fs.resolve(operand, ctx.cwd))
+        except OSError as e:
+            raise CommandError(f"{name}: {operand}: {e.strerror}")
+
+
+def _lines(source: Source) -> Iterable[str]:
+    return source.lines() if isinstance(source, FileBlob) else source
+
+
+def _count(name: str, flags: str, operands: List[str], default: int) -> int:
+    """Line count from `-n N`, `-nN` or `-N`"""
+    digits = "".join(c for c in flags if c.isdigit())
+    if digits:
+        return int(digits)
+    if "n" in flags:
+        if not operands:
+            raise CommandError(f"{name}: option requires an argument -- 'n'")
+        value = operands.pop(0)
+        if not value.isdigit():
+            raise CommandError(f"{name}: invalid number of lines: '{value}'")
+        return int(value)
+    return default
+
+
+def _bytes_pattern(pattern: 're.Pattern[str]') -> Optional['re.Pattern[bytes]']:
+    """`pattern` recompiled for scanning a whole buffer, or None if it has no bytes form"""
+    if not pattern.pattern.isascii():
+        return None  # bytes patterns only know ASCII case folding and classes
+    try:
+        return re.compile(pattern.pattern.encode(), (pattern.flags & re.IGNORECASE) | re.MULTILINE)
+    except re.error:
+        return None
+
+
+@command('grep', 'grep [-ivnc] <pattern> [file...]', 'Search for a pattern',
+         flags='ivnc', min_args=1, kind=STREAM)
+def grep(ctx: CommandContext, flags: str, operands: List[str],
+         stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    try:
+        pattern = re.compile(operands[0], re.IGNORECASE if "i" in flags else 0)
+    except re.error as e:
+        raise CommandError(f"grep: invalid pattern: {e}")
+    files = operands[1:]
+    invert = "v" in flags
+    search = pattern.search
+    for label, source in _inputs(ctx, "grep", files, stdin):
+        prefix = f"{label}:" if len(files) > 1 else ""
+        buffer_pattern = _bytes_pattern(pattern) if isinstance(source, FileBlob) and not invert else None
+        if buffer_pattern is not None:
+            # Jump from match to match instead of testing every line
+            found = source.grep(buffer_pattern, numbers="n" in flags)
+        else:
+            found = ((number, line) for number, line in enumerate(_lines(source), 1)
+                     if (search(line) is None) == invert)
+        matches = 0
+        for number, line in found:
+            matches += 1
+            if "c" not in flags:
+                yield f"{prefix}{number}:{line}" if "n" in flags else prefix + line
+        if "c" in flags:
+            yield f"{prefix}{matches}"
+
+
+@command('head', 'head [-n N] [file...]', 'Show the first lines',
+         flags='n0123456789', kind=STREAM)
+def head(ctx: CommandContext, flags: str, operands: List[str],
+         stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    count = _count("head", flags, operands, 10)
+    for _, source in _inputs(ctx, "head", operands, stdin):
+        if count <= 0:
+            continue
+        for number, line in enumerate(_lines(source), 1):
+            yield line
+            if number >= count:
+                # Stop pulling: upstream stages are never asked for more
+                break
+
+
+@command('tail', 'tail [-f] [-n N] [file...]', 'Show the last lines',
+         flags='fn0123456789', kind=STREAM)
+def tail(ctx: CommandContext, flags: str, operands: List[str],
+         stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    count = _count("tail", flags, operands, 10)
+    for label, source in _inputs(ctx, "tail", operands, stdin):
+        if isinstance(source, FileBlob):
+            if count > 0:
+                yield from source.lines(source.tail_offset(count))
+            if "f" in flags:
+                # Follow: the client polls /api/files/read with this token for appended data
+                ctx.continuation = encode_token(ctx.fs.resolve(label, ctx.cwd), source.size)
+        else:
+            yield from deque(source, maxlen=count) if count > 0 else ()
+
+
+@command('wc', 'wc [-lwmc] [file...]', 'Count lines, words, characters and bytes',
+         flags='lwmc', kind=STREAM)
+def wc(ctx: CommandContext, flags: str, operands: List[str],
+       stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    selected = flags or "lwc"
+    for label, source in _inputs(ctx, "wc", operands, stdin):
+        if isinstance(source, FileBlob):
+            n_lines, n_words, n_bytes = source.wc()
+            n_chars = source.chars() if "m" in selected else 0
+        else:
+            n_lines = n_words = n_chars = n_bytes = 0
+            line = None
+            for line in source:
+                n_lines += 1
+                n_words += len(line.split())
+                n_chars += len(line) + 1
+                n_bytes += len(line.encode("utf-8", "surrogatepass")) + 1
+            if isinstance(line, PartialLine):
+                n_chars -= 1  # a file's unterminated last line, passed through (cat f | wc)
+                n_bytes -= 1
+        counts = {"l": n_lines, "w": n_words, "m": n_chars, "c": n_bytes}
+        yield " ".join(f"{counts[f]:>7}" for f in "lwmc" if f in selected) + (f" {label}" if label else "")
+
+
+@command('sort', 'sort [-rn] [file...]', 'Sort lines', flags='rn', kind=STREAM)
+def sort(ctx: CommandContext, flags: str, operands: List[str],
+         stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    lines = [line for _, source in _inputs(ctx, "sort", operands, stdin) for line in _lines(source)]
+    if "n" in flags:
+        def key(line: str) -> float:
+            match = re.match(r"\s*(-?\d+(?:\.\d+)?)", line)
+            return float(match.group(1)) if match else 0.0
+        lines.sort(key=key, reverse="r" in flags)
+    else:
+        lines.sort(reverse="r" in flags)
+    yield from lines
+
+
+@command('uniq', 'uniq [-c] [file...]', 'Collapse repeated lines', flags='c', kind=STREAM)
+def uniq(ctx: CommandContext, flags: str, operands: List[str],
+         stdin: Optional[Iterable[str]]) -> Iterator[str]:
+    previous, repeats = None, 0
+    for _, source in _inputs(ctx, "uniq", operands, stdin):
+        for line in _lines(source):
+            if line == previous:
+                repeats += 1
+                continue
+            if previous is not None:
+                yield f"{repeats:>7} {previous}" if "c" in flags else previous
+            previous, repeats = line, 1
+    if previous is not None:
+        yield f"{repeats:>7} {previous}" if "c" in flags else previous
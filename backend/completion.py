@@ -0,0 +1,91 @@
+"""
+Tab Completion for TerminalX
+Prefix index for command names and path completion over the session VFS
+
+Command names live in a trie, so a lookup walks the prefix once and then
+visits only the matching subtree. Path completion uses the sorted child-name
+list every VFS directory already maintains on mkdir/touch/rm/mv, so nothing is
+rebuilt when the tree changes.
+"""
+
+import posixpath
+from bisect import bisect_left
+from typing import Dict, List, Any
+
+from commands import registry
+from pipeline import tokenize
+
+COMMAND_SEPARATORS = ('|', '&&', '||', ';')
+
+
+def complete_path(fs, partial: str, cwd: str, dirs_only: bool = False,
+                  limit: int = 50) -> List[str]:
+    """Completions for a partially typed path, keeping the user's directory part"""
+    head, prefix = posixpath.split(partial)
+    directory = fs.resolve(head or ".", cwd)
+    try:
+        node = fs.lookup(directory)
+    except OSError:
+        return []
+    if not node.is_dir:
+        return []
+    names = node.names
+    base = directory.rstrip("/") + "/"
+    shown = head + "/" if head and not head.endswith("/") else head
+    matches = []
+    i = bisect_left(names, prefix)
+    while i < len(names) and names[i].startswith(prefix) and len(matches) < limit:
+        name = names[i]
+        i += 1
+        if name.startswith(".") and not prefix.startswith("."):
+            continue
+        is_dir = fs.lookup(base + name).is_dir
+        if dirs_only and not is_dir:
+            continue
+        matches.append(shown + name + ("/" if is_dir else ""))
+    return matches
+
+
+def common_prefix(words: List[str]) -> str:
+    if not words:
+        return ""
+    return posixpath.commonprefix(words)
+
+
+def complete_line(line: str, fs, cwd: str, limit: int = 50) -> Dict[str, Any]:
+    """Complete the last word of `line`: a command name or a path operand"""
+    # A trailing space means a new, empty word is being completed
+    starts_new_word = not line or line[-1] in " \t"
+    try:
+        tokens = tokenize(line)
+    except Exception:
+        tokens = []
+    partial = ""
+    if tokens and not starts_new_word and tokens[-1][0] == 'word':
+        partial = "".join(text for text, _ in tokens[-1][1])
+        tokens = tokens[:-1]
+
+    # Find the words of the current simple command
+    words: List[str] = []
+    for kind, value in tokens:
+        if kind == 'op' and value in COMMAND_SEPARATORS:
+            words = []
+        elif kind == 'word':
+            words.append("".join(text for text, _ in value))
+
+    if not words:
+        kind = "command"
+        matches = registry.complete(partial, limit)
+    else:
+        cmd = registry.get(words[0].lower())
+        mode = cmd.complete if cmd is not None else 'path'
+        kind = mode or "none"
+        matches = complete_path(fs, partial, cwd, dirs_only=mode == 'dir', limit=limit) if mode else []
+
+    return {
+        "kind": kind,
+        "partial": partial,
+        "replace_from": len(line) - len(partial) if not starts_new_word else len(line),
+        "completions": matches,
+        "common_prefix": common_prefix(matches)
+    }
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List
 
 class Settings:
     # API Settings
@@ -16,9 +16,11 @@ class Settings:
     ]
     
     # Server Settings
-    HOST: str = "0.0.0.0"
-    PORT: int = 8000
-    DEBUG: bool = True
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"  # single process with auto-reload
+    WORKERS: int = int(os.getenv("WORKERS", "0"))  # 0: one per available CPU (ignored in debug mode)
+    STARTUP_BUDGET_MS: float = float(os.getenv("STARTUP_BUDGET_MS", "2000"))  # process start to first /api/health
     
     # File System Settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -28,5 +30,69 @@ class Settings:
     PROCESS_UPDATE_INTERVAL: int = 2500  # milliseconds
     MAX_PROCESSES: int = 15
     MIN_PROCESSES: int = 5
+    
+    # Metrics Sampler Settings
+    SAMPLER_INTERVAL: float = float(os.getenv("SAMPLER_INTERVAL", "1.0"))  # seconds
+    METRICS_RETENTION: int = int(os.getenv("METRICS_RETENTION", "3600"))  # seconds of history
+    MONITOR_WORKERS: int = int(os.getenv("MONITOR_WORKERS", "4"))  # threads for psutil calls
+    MONITOR_TIMEOUT: float = float(os.getenv("MONITOR_TIMEOUT", "2.0"))  # seconds per call
+    METRICS_SHM: str = os.getenv("METRICS_SHM", "")  # shared snapshot segment; set by run.py
+    METRICS_SHM_SIZE: int = int(os.getenv("METRICS_SHM_SIZE", str(1024 * 1024)))  # bytes
+    SAMPLER_LOCK: str = os.getenv("SAMPLER_LOCK", "/tmp/terminalx-sampler.lock")
+    
+    # Session Settings
+    MAX_SESSIONS: int = int(os.getenv("MAX_SESSIONS", "1000"))
+    SESSION_TTL: int = int(os.getenv("SESSION_TTL", "3600"))  # idle seconds
+    SESSION_DB: str = os.getenv("SESSION_DB", "")  # SQLite path; shared by workers when set
+    
+    # Response Cache Settings: seconds per monitoring endpoint, "name=ttl,..."
+    CACHE_TTLS: Dict[str, float] = {
+        name: float(ttl) for name, _, ttl in (
+            item.partition("=") for item in os.getenv(
+                "CACHE_TTLS", "system=1,processes=1,process_tree=1,process_detail=2,memory=1,cpu=1,disk=5,network=1,system_info=30"
+            ).split(",") if item
+        )
+    }
+    
+    # Alert Settings: rules separated by ";", e.g. "high_cpu: cpu.percent avg > 90 for 30s"
+    ALERT_RULES: List[str] = [rule.strip() for rule in os.getenv(
+        "ALERT_RULES", "cpu.percent avg > 90 for 30s; swap.percent > 50"
+    ).split(";") if rule.strip()]
+    ALERT_LOG: str = os.getenv("ALERT_LOG", "/tmp/terminalx-alerts.log")  # JSON lines; empty disables
+    ALERT_RULES_FILE: str = os.getenv("ALERT_RULES_FILE", "")  # rule changes shared by workers; set by run.py
+    
+    # Wire Format Settings for monitoring responses
+    COMPRESS_MIN_BYTES: int = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # smaller bodies are sent as is
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "5"))
+    
+    # Debug Settings
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_MAX_SECONDS: int = int(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    
+    # History Settings
+    HISTORY_DIR: str = os.getenv("HISTORY_DIR", "/tmp/terminalx-history")  # one log per session
+    HISTORY_SIZE: int = int(os.getenv("HISTORY_SIZE", "10000"))  # entries kept after compaction
+    
+    # File Storage Settings
+    FILE_STORE_DIR: str = os.getenv("FILE_STORE_DIR", "/tmp/terminalx-files")  # mmap-backed file contents
+    LARGE_FILE_THRESHOLD: int = int(os.getenv("LARGE_FILE_THRESHOLD", "65536"))  # bytes kept in memory
+    MAX_OUTPUT_BYTES: int = int(os.getenv("MAX_OUTPUT_BYTES", "1048576"))  # per command response
+    FILE_PAGE_BYTES: int = int(os.getenv("FILE_PAGE_BYTES", "65536"))  # default /api/files/read page
+    
+    # Command Settings
+    COMMAND_PLUGINS: str = os.getenv("COMMAND_PLUGINS", "")  # "module:cmd1,cmd2;module2:cmd3"
+    
+    # Real Mode Settings (runs actual binaries; off unless explicitly enabled)
+    REAL_MODE_ENABLED: bool = os.getenv("REAL_MODE_ENABLED", "false").lower() == "true"
+    REAL_MODE_ALLOWLIST: List[str] = os.getenv(
+        "REAL_MODE_ALLOWLIST", "ls,cat,head,tail,grep,wc,echo,date,uptime,df,free,ps,du,sort,uniq"
+    ).split(",")
+    REAL_MODE_ROOT: str = os.getenv("REAL_MODE_ROOT", "/tmp/terminalx-sessions")
+    REAL_MODE_TIMEOUT: float = float(os.getenv("REAL_MODE_TIMEOUT", "10"))  # wall-clock seconds
+    REAL_MODE_CPU_SECONDS: int = int(os.getenv("REAL_MODE_CPU_SECONDS", "5"))
+    REAL_MODE_MEMORY_MB: int = int(os.getenv("REAL_MODE_MEMORY_MB", "256"))
+    REAL_MODE_MAX_OUTPUT: int = int(os.getenv("REAL_MODE_MAX_OUTPUT", str(1024 * 1024)))  # bytes
+    REAL_MODE_MAX_PROCESSES: int = int(os.getenv("REAL_MODE_MAX_PROCESSES", "8"))
 
 settings = Settings()
@@ -0,0 +1,92 @@
+"""
+Monitor Executor for TerminalX
+Bounded thread pool for blocking psutil work with per-call timeouts
+
+A /proc read that hangs cannot be interrupted, so a timed-out call keeps its
+worker until it returns. To stop such calls from piling up, calls are keyed:
+while one is still running, a new call with the same key waits on it rather
+than being queued again, and at most ``max_pending`` keyed calls are queued
+or running at once.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, Hashable, List, Optional, Tuple
+
+from config import settings
+
+
+class MonitorTimeout(Exception):
+    """A monitor call did not finish in time (it may still be running)"""
+
+
+class MonitorExecutor:
+    """Runs blocking monitor calls off the event loop with timeouts"""
+
+    def __init__(self, max_workers: int = 4, timeout: float = 2.0, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='monitor')
+        self._running: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.timeouts = 0
+
+    def _submit(self, key: Hashable, fn: Callable, args: Tuple) -> Future:
+        with self._lock:
+            future = self._running.get(key)
+            if future is not None and not future.done():
+                return future  # share the call already in progress
+            if len(self._running) >= self.max_pending:
+                for done in [k for k, f in self._running.items() if f.done()]:
+                    del self._running[done]
+                if len(self._running) >= self.max_pending:
+                    raise MonitorTimeout(f"{key}: all monitor workers are busy")
+            future = self._pool.submit(fn, *args)
+            self._running[key] = future
+            return future
+
+    async def run(self, fn: Callable, *args, key: Optional[Hashable] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """Await ``fn(*args)`` in the pool; raise MonitorTimeout after `timeout` seconds
+
+        Calls sharing a `key` (default: the function's qualified name) are
+        assumed to be interchangeable, so include any arguments in the key.
+        """
+        key = key if key is not None else getattr(fn, '__qualname__', fn)
+        future = self._submit(key, fn, args)
+        try:
+            # shield: a timed-out waiter must not cancel a call others share
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                          self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise MonitorTimeout(f"{key}: timed out")
+
+    async def gather(self, calls: Dict[str, Callable], timeout: Optional[float] = None
+                     ) -> Tuple[Dict[str, Any], List[str]]:
+        """Run named zero-argument calls concurrently; return results and the names that timed out"""
+        names = list(calls)
+        outcomes = await asyncio.gather(
+            *(self.run(calls[name], key=name, timeout=timeout) for name in names),
+            return_exceptions=True
+        )
+        results, missing = {}, []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, MonitorTimeout):
+                missing.append(name)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[name] = outcome
+        return results, missing
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy = sum(1 for f in self._running.values() if not f.done())
+        return {'workers': self.max_workers, 'busy': busy, 'timeouts': self.timeouts}
+
+
+# Global executor for SystemMonitor work
+monitor_executor = MonitorExecutor(max_workers=settings.MONITOR_WORKERS, timeout=settings.MONITOR_TIMEOUT)
@@ -0,0 +1,152 @@
+"""
+OpenMetrics Exporter for TerminalX
+Renders sampler snapshots and request latencies for Prometheus scrapes
+
+The exposition text is rebuilt once per sampler tick and kept as bytes, so a
+scrape is a reference read no matter how often Prometheus polls.
+"""
+
+import math
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from perf import LatencyRecorder, RequestMetrics
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'terminalx_'
+
+Sample = Tuple[str, Dict[str, str], float]  # (name suffix, labels, value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class _Writer:
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str, samples: Iterable[Sample]) -> None:
+        name = PREFIX + name
+        self.lines.append(f'# TYPE {name} {kind}')
+        self.lines.append(f'# HELP {name} {help_text}')
+        for suffix, labels, value in samples:
+            if labels:
+                label_text = ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                self.lines.append(f'{name}{suffix}{{{label_text}}} {_format_value(value)}')
+            else:
+                self.lines.append(f'{name}{suffix} {_format_value(value)}')
+
+    def gauge(self, name: str, help_text: str, value: float, **labels: str) -> None:
+        self.family(name, 'gauge', help_text, [('', labels, value)])
+
+    def render(self) -> bytes:
+        self.lines.append('# EOF')
+        return ('\n'.join(self.lines) + '\n').encode('utf-8')
+
+
+class OpenMetricsExporter:
+    """Keeps a pre-rendered OpenMetrics payload, refreshed by the sampler"""
+
+    def __init__(self, request_metrics: Optional[RequestMetrics] = None,
+                 monitor_timings: Optional[LatencyRecorder] = None):
+        self.request_metrics = request_metrics
+        self.monitor_timings = monitor_timings
+        self.payload: Optional[bytes] = None
+
+    def update(self, snapshot: Dict[str, Any]) -> None:
+        """Sampler listener: re-render from the newest snapshot"""
+        self.payload = self.render(snapshot)
+
+    def render(self, snapshot: Dict[str, Any]) -> bytes:
+        out = _Writer()
+        out.gauge('sample_timestamp_seconds', 'Time the system metrics were sampled',
+                  snapshot.get('timestamp', 0.0))
+
+        cpu = snapshot.get('cpu', {})
+        if 'cpu_percent_average' in cpu:
+            out.gauge('cpu_usage_percent', 'CPU utilisation averaged over all cores',
+                      cpu['cpu_percent_average'])
+            out.family('cpu_core_usage_percent', 'gauge', 'CPU utilisation per core',
+                       [('', {'core': str(i)}, percent)
+                        for i, percent in enumerate(cpu.get('cpu_percent_per_core', []))])
+            out.family('cpu_seconds', 'counter', 'CPU time spent in each mode',
+                       [('_total', {'mode': mode}, seconds)
+                        for mode, seconds in cpu.get('cpu_times', {}).items()])
+            load = cpu.get('load_average') or (0, 0, 0)
+            out.family('load_average', 'gauge', 'System load average',
+                       [('', {'period': period}, value) for period, value in zip(('1m', '5m', '15m'), load)])
+
+        memory = snapshot.get('memory', {})
+        if 'virtual_memory' in memory:
+            virtual, swap = memory['virtual_memory'], memory['swap_memory']
+            out.family('memory_bytes', 'gauge', 'Physical memory by state',
+                       [('', {'state': state}, virtual[state])
+                        for state in ('total', 'available', 'used', 'free', 'cached', 'buffers')])
+            out.gauge('memory_usage_percent', 'Physical memory in use', virtual['percent'])
+            out.family('swap_bytes', 'gauge', 'Swap space by state',
+                       [('', {'state': state}, swap[state]) for state in ('total', 'used', 'free')])
+            out.gauge('swap_usage_percent', 'Swap space in use', swap['percent'])
+
+        disk = snapshot.get('disk', {})
+        if 'disk_usage' in disk:
+            usage, io = disk['disk_usage'], disk['disk_io']
+            out.family('disk_bytes', 'gauge', 'Root file system space by state',
+                       [('', {'state': state}, usage[state]) for state in ('total', 'used', 'free')])
+            out.family('disk_reads', 'counter', 'Completed disk reads', [('_total', {}, io['read_count'])])
+            out.family('disk_writes', 'counter', 'Completed disk writes', [('_total', {}, io['write_count'])])
+            out.family('disk_read_bytes', 'counter', 'Bytes read from disk', [('_total', {}, io['read_bytes'])])
+            out.family('disk_written_bytes', 'counter', 'Bytes written to disk',
+                       [('_total', {}, io['write_bytes'])])
+
+        network = snapshot.get('network', {})
+        if 'network_io' in network:
+            io = network['network_io']
+            out.family('network_sent_bytes', 'counter', 'Bytes sent on all interfaces',
+                       [('_total', {}, io['bytes_sent'])])
+            out.family('network_received_bytes', 'counter', 'Bytes received on all interfaces',
+                       [('_total', {}, io['bytes_recv'])])
+            out.family('network_sent_packets', 'counter', 'Packets sent on all interfaces',
+                       [('_total', {}, io['packets_sent'])])
+            out.family('network_received_packets', 'counter', 'Packets received on all interfaces',
+                       [('_total', {}, io['packets_recv'])])
+            out.gauge('network_connections', 'Open network connections', network['active_connections'])
+
+        uptime = snapshot.get('uptime', {})
+        if 'uptime_seconds' in uptime:
+            out.gauge('uptime_seconds', 'Seconds since boot', uptime['uptime_seconds'])
+
+        states = snapshot.get('process_states')
+        if states is not None:
+            out.family('processes', 'gauge', 'Processes by state',
+                       [('', {'state': state}, count) for state, count in sorted(states.items())])
+
+        if self.request_metrics is not None:
+            out.family('http_request_duration_seconds', 'histogram', 'HTTP request latency by route',
+                       _histogram_samples(self.request_metrics, ('method', 'route')))
+            out.gauge('http_requests_in_flight', 'HTTP requests currently being served',
+                      self.request_metrics.in_flight)
+        if self.monitor_timings is not None:
+            out.family('monitor_call_duration_seconds', 'histogram', 'Time spent in SystemMonitor readers',
+                       _histogram_samples(self.monitor_timings, ('call',)))
+        return out.render()
+
+
+def _histogram_samples(recorder: LatencyRecorder, label_names: Tuple[str, ...]) -> List[Sample]:
+    samples: List[Sample] = []
+    for key, histogram in recorder.items():
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        for bound, count in histogram.cumulative():
+            samples.append(('_bucket', {**labels, 'le': _format_value(bound)}, count))
+        samples.append(('_count', labels, histogram.count))
+        samples.append(('_sum', labels, histogram.sum))
+    return samples
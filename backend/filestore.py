@@ -0,0 +1,168 @@
+"""
+File Content Store for TerminalX
+Memory-mapped storage for large VFS files and buffer-level text operations
+
+Contents above a size threshold are written once to an unlinked temporary
+file and read through a read-only ``mmap``, so they live in the page cache
+rather than the Python heap. ``FileBlob`` works on any buffer (``bytes`` or
+``mmap``): lines are found with ``find``/``rfind``, ``tail`` seeks back from
+the end, ``grep`` runs the regex over the whole buffer and only slices out
+matching lines, and ``wc`` is one chunked pass.
+
+Byte ranges are handed to clients as opaque continuation tokens.
+
+Streams of lines treat every line as newline-terminated, except a final
+``PartialLine``, which ``lines`` yields for a blob that does not end in a
+newline; ``wc`` and redirects then count and write it without one.
+"""
+
+import base64
+import json
+import mmap
+import os
+import re
+import tempfile
+from typing import Iterator, Optional, Tuple, Union
+
+CHUNK_SIZE = 1024 * 1024
+# Maps the whitespace bytes.split() splits on to b' ' and everything else to b'x'
+_WORD_TABLE = bytes(32 if c in b' \t\n\r\x0b\x0c' else 120 for c in range(256))
+_UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
+
+
+class PartialLine(str):
+    """Last line of a file that has no trailing newline"""
+
+    __slots__ = ()
+
+
+class FileBlob:
+    """Read-only file contents over a bytes-like buffer"""
+
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self.buffer = buffer
+
+    @property
+    def size(self) -> int:
+        return len(self.buffer)
+
+    def text(self) -> str:
+        return self.buffer[:].decode('utf-8', 'replace')
+
+    def lines(self, start: int = 0) -> Iterator[str]:
+        """Lines from byte offset `start`, without a trailing empty line
+
+        An unterminated last line is yielded as a ``PartialLine``.
+        """
+        buffer, size = self.buffer, len(self.buffer)
+        while start < size:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                yield PartialLine(buffer[start:size].decode('utf-8', 'replace'))
+                return
+            yield buffer[start:end].decode('utf-8', 'replace')
+            start = end + 1
+
+    def tail_offset(self, count: int) -> int:
+        """Byte offset where the last `count` lines start, found by scanning back"""
+        buffer = self.buffer
+        pos = len(buffer)
+        if pos and buffer[pos - 1:pos] == b'\n':
+            pos -= 1
+        for _ in range(count):
+            pos = buffer.rfind(b'\n', 0, pos)
+            if pos < 0:
+                return 0
+        return pos + 1
+
+    def grep(self, pattern: 're.Pattern[bytes]', numbers: bool = False) -> Iterator[Tuple[int, str]]:
+        """(line number, line) for lines matching `pattern`; numbers are 0 unless requested"""
+        buffer, size = self.buffer, len(self.buffer)
+        pos = counted = newlines = 0
+        while pos <= size:
+            match = pattern.search(buffer, pos)
+            if match is None:
+                return
+            start = buffer.rfind(b'\n', 0, match.start()) + 1
+            end = buffer.find(b'\n', match.end())
+            if end < 0:
+                end = size
+            if start == size:
+                return  # empty match after the final newline
+            if numbers:
+                newlines += buffer[counted:start].count(b'\n')
+                counted = start
+            yield newlines + 1 if numbers else 0, buffer[start:end].decode('utf-8', 'replace')
+            pos = end + 1
+
+    def wc(self) -> Tuple[int, int, int]:
+        """(lines, words, bytes) in one pass; a final unterminated line counts as a line"""
+        buffer, size = self.buffer, len(self.buffer)
+        lines = words = 0
+        in_word = False
+        for offset in range(0, size, CHUNK_SIZE):
+            chunk = buffer[offset:offset + CHUNK_SIZE]
+            lines += chunk.count(b'\n')
+            # Count word starts without materializing the words
+            shape = chunk.translate(_WORD_TABLE)
+            words += shape.count(b' x')
+            if not in_word and shape[:1] == b'x':
+                words += 1
+            in_word = shape[-1:] == b'x'
+        if size and buffer[size - 1:size] != b'\n':
+            lines += 1
+        return lines, words, size
+
+    def chars(self) -> int:
+        """UTF-8 characters, counted as the bytes that start one, without decoding"""
+        buffer = self.buffer
+        return sum(len(buffer[offset:offset + CHUNK_SIZE].translate(None, _UTF8_CONTINUATION))
+                   for offset in range(0, len(buffer), CHUNK_SIZE))
+
+    def read_range(self, offset: int, limit: int) -> Tuple[str, int]:
+        """Decode up to `limit` bytes from `offset`; returns (text, next offset)
+
+        The end is moved back to a UTF-8 character boundary so a multi-byte
+        character is never split between two pages.
+        """
+        buffer, size = self.buffer, len(self.buffer)
+        end = min(offset + limit, size)
+        while offset < end < size and buffer[end] & 0xC0 == 0x80:
+            end -= 1
+        return buffer[offset:end].decode('utf-8', 'replace'), end
+
+
+class FileStore:
+    """Creates mmap-backed blobs for contents above `threshold` bytes"""
+
+    def __init__(self, root: str, threshold: int = 64 * 1024):
+        self.root = root
+        self.threshold = threshold
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, *parts: Union[bytes, mmap.mmap]) -> FileBlob:
+        """Store the concatenation of `parts` (e.g. an existing blob's buffer plus an append)"""
+        if not any(len(part) for part in parts):
+            return FileBlob(b'')
+        # Unlinked on creation: the mapping keeps the data alive until the blob is dropped
+        with tempfile.TemporaryFile(dir=self.root) as f:
+            for part in parts:
+                f.write(part)
+            f.flush()
+            return FileBlob(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def encode_token(path: str, offset: int) -> str:
+    """Opaque continuation token for reading `path` from byte `offset`"""
+    raw = json.dumps({'p': path, 'o': offset}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token: str) -> Optional[Tuple[str, int]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return str(data['p']), int(data['o'])
+    except (ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,363 @@
+"""
+Command History for TerminalX
+Per-session append-only history log with memory-mapped recall and search
+
+Each entry is stored as a 4-byte little-endian length followed by the UTF-8
+command. A sidecar ``.idx`` file holds the byte offset of every entry, so
+opening a log reads one array of offsets and maps the log itself; commands
+are only decoded when they are recalled. Reverse search scans the mapping
+backwards with ``rfind``. Once the log holds a quarter more than
+``max_entries`` it is compacted down to the newest ``max_entries``.
+
+Prefix lookups (``!prefix`` and suggestions) use an index built on first
+use and kept up to date on append: every distinct command with its use
+count and newest history number, plus the commands in sorted order, so
+the commands sharing a prefix are one bisected slice rather than a scan.
+
+Several processes (workers sharing a session store) may open the same log.
+Appends, compaction and index rewrites hold an ``flock`` on a ``.lock``
+sidecar, and only the process that wrote an entry adds it to ``.idx``;
+entries another process appended are picked up in memory only.
+"""
+
+import heapq
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from typing import Dict, List, Iterator, Optional, Tuple
+
+from commands import CommandError
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+HEADER = struct.Struct('<I')
+
+
+class HistoryLog:
+    """Append-only, length-prefixed command log for one session"""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.lock_path = path + '.lock'
+        self._held = 0  # nesting depth of _exclusive in this instance
+        self.max_entries = max_entries
+        self._offsets = array('Q')
+        self._end = 0  # bytes of the log covered by _offsets
+        self._inode = 0  # of the log file _offsets describe; compaction replaces it
+        self._map: Optional[mmap.mmap] = None
+        # command -> [use count, newest history number]; built on first prefix lookup
+        self._stats: Optional[Dict[str, List[int]]] = None
+        self._sorted: List[str] = []  # distinct commands of _stats in sorted order
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._load_index()
+
+    def _log_stat(self) -> Tuple[int, int]:
+        """(size, inode) of the log; (0, 0) before the first append"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0, 0
+        return st.st_size, st.st_ino
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the cross-process lock on this log; call with _lock held"""
+        f = None
+        if fcntl is not None and not self._held:
+            f = open(self.lock_path, 'a')
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when f is closed
+        self._held += 1
+        try:
+            yield
+        finally:
+            self._held -= 1
+            if f is not None:
+                f.close()
+
+    def _load_index(self) -> None:
+        with self._exclusive():
+            self._read_index()
+
+    def _read_index(self) -> None:
+        offsets = array('Q')
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            offsets.frombytes(data[:len(data) - len(data) % offsets.itemsize])
+        except FileNotFoundError:
+            pass
+        size, self._inode = self._log_stat()
+        end = 0
+        if offsets and offsets[-1] + HEADER.size <= size:
+            with open(self.path, 'rb') as f:
+                f.seek(offsets[-1])
+                end = offsets[-1] + HEADER.size + HEADER.unpack(f.read(HEADER.size))[0]
+        if offsets and not 0 < end <= size:
+            offsets, end = array('Q'), 0  # stale index; rebuild from the log
+        self._offsets = offsets
+        self._end = end
+        self._close_map()
+        self._stats = None
+        indexed = len(offsets)
+        self._catch_up()
+        if len(self._offsets) != indexed or not indexed:
+            self._write_index()  # missing, stale or behind the log: rewrite it whole
+
+    def _write_index(self) -> None:
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            self._offsets.tofile(f)
+        os.replace(tmp, self.index_path)
+
+    def _catch_up(self) -> None:
+        """Pick up entries appended by another process since the last look
+
+        Only the in-memory offsets grow here; the writer indexed them already.
+        """
+        size, inode = self._log_stat()
+        if size < self._end or (inode != self._inode and self._end):
+            self._load_index()  # compacted elsewhere
+            return
+        self._inode = inode
+        if size == self._end:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._end)
+            data = f.read(size - self._end)
+        new = array('Q')
+        pos = 0
+        while pos + HEADER.size <= len(data):
+            length = HEADER.unpack_from(data, pos)[0]
+            if pos + HEADER.size + length > len(data):
+                break  # a writer is mid-append
+            new.append(self._end + pos)
+            if self._stats is not None:
+                self._note(data[pos + HEADER.size:pos + HEADER.size + length].decode('utf-8', 'replace'),
+                           len(self._offsets) + len(new))
+            pos += HEADER.size + length
+        if new:
+            self._offsets.extend(new)
+            self._end += pos
+
+    def _mapping(self) -> Optional[mmap.mmap]:
+        if self._end == 0:
+            return None
+        if self._map is None or len(self._map) < self._end:
+            self._close_map()
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _entry(self, i: int) -> str:
+        m = self._mapping()
+        start = self._offsets[i] + HEADER.size
+        length = HEADER.unpack_from(m, self._offsets[i])[0]
+        return m[start:start + length].decode('utf-8', 'replace')
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return len(self._offsets)
+
+    def __getitem__(self, number: int) -> str:
+        """Entry by 1-based history number; negative numbers count from the end"""
+        with self._lock:
+            self._catch_up()
+            count = len(self._offsets)
+            i = number - 1 if number > 0 else count + number
+            if number == 0 or not 0 <= i < count:
+                raise IndexError(number)
+            return self._entry(i)
+
+    def append(self, command: str) -> None:
+        data = command.encode('utf-8')
+        with self._lock, self._exclusive():
+            self._catch_up()
+            with open(self.path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)  # past any torn tail a crashed writer left
+                f.write(HEADER.pack(len(data)) + data)
+            self._offsets.append(offset)
+            self._end = offset + HEADER.size + len(data)
+            with open(self.index_path, 'ab') as f:
+                f.write(self._offsets[-1:].tobytes())
+            if self._stats is not None:
+                self._note(command, len(self._offsets))
+            if len(self._offsets) > self.max_entries + self.max_entries // 4:
+                self._compact()
+
+    def entries(self, start: int = 1) -> Iterator[Tuple[int, str]]:
+        """(number, command) pairs from history number `start` onwards"""
+        with self._lock:
+            self._catch_up()
+            count = len(self._offsets)
+        for i in range(max(start, 1) - 1, count):
+            with self._lock:
+                entry = self._entry(i)
+            yield i + 1, entry
+
+    def tail(self, n: int) -> Iterator[Tuple[int, str]]:
+        return self.entries(len(self) - n + 1)
+
+    def search(self, text: str, before: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        """Newest entry containing `text` with a number below `before` (reverse-i-search)"""
+        with self._lock:
+            self._catch_up()
+            offsets = self._offsets
+            count = len(offsets) if before is None else min(before - 1, len(offsets))
+            if count <= 0:
+                return None
+            if not text:
+                return count, self._entry(count - 1)
+            m = self._mapping()
+            needle = text.encode('utf-8')
+            end = offsets[count] if count < len(offsets) else self._end
+            while True:
+                pos = m.rfind(needle, 0, end)
+                if pos < 0:
+                    return None
+                i = bisect_right(offsets, pos) - 1
+                start = offsets[i] + HEADER.size
+                if pos >= start and pos + len(needle) <= start + HEADER.unpack_from(m, offsets[i])[0]:
+                    return i + 1, self._entry(i)
+                end = pos + len(needle) - 1  # matched across a length header
+
+    def _note(self, command: str, number: int) -> None:
+        stat = self._stats.get(command)
+        if stat is None:
+            self._stats[command] = [1, number]
+            insort(self._sorted, command)
+        else:
+            stat[0] += 1
+            stat[1] = number
+
+    def _matching(self, prefix: str) -> List[str]:
+        """Distinct commands starting with `prefix`, from the prefix index"""
+        self._catch_up()
+        if self._stats is None:
+            self._stats, self._sorted = {}, []
+            for i in range(len(self._offsets)):
+                self._note(self._entry(i), i + 1)
+        commands = self._sorted
+        return commands[bisect_left(commands, prefix):bisect_left(commands, prefix + '\U0010ffff')]
+
+    def find_prefix(self, prefix: str) -> Optional[Tuple[int, str]]:
+        """Newest entry starting with `prefix`"""
+        with self._lock:
+            matching = self._matching(prefix)
+            if not matching:
+                return None
+            stats = self._stats
+            command = max(matching, key=lambda c: stats[c][1])
+            return stats[command][1], command
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Distinct commands starting with `prefix`, most used (then most recent) first"""
+        with self._lock:
+            matching = self._matching(prefix)
+            stats = self._stats
+            return heapq.nlargest(limit, matching, key=lambda c: stats[c])
+
+    def compact(self) -> None:
+        """Rewrite the log keeping only the newest `max_entries` commands"""
+        with self._lock, self._exclusive():
+            self._compact()
+
+    def _compact(self) -> None:
+        self._catch_up()
+        if len(self._offsets) <= self.max_entries:
+            return
+        keep = self._offsets[len(self._offsets) - self.max_entries:] if self.max_entries else array('Q')
+        start = keep[0] if keep else self._end
+        m = self._mapping()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            if keep:
+                f.write(m[start:self._end])
+        self._close_map()
+        os.replace(tmp, self.path)
+        self._inode = self._log_stat()[1]
+        self._offsets = array('Q', (offset - start for offset in keep))
+        self._end -= start
+        self._stats = None
+        self._write_index()
+
+    def clear(self) -> None:
+        with self._lock, self._exclusive():
+            self._close_map()
+            open(self.path, 'wb').close()
+            self._offsets = array('Q')
+            self._end = 0
+            self._stats = None
+            self._write_index()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_map()
+
+    def delete(self) -> None:
+        """Close the log and remove its files"""
+        with self._lock:
+            self._close_map()
+            for path in (self.path, self.index_path, self.lock_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_EVENT = re.compile(r"!(!|-?\d+|[^\s!=()'\"|;&<>]+)")
+
+
+def expand_history(line: str, log: HistoryLog) -> str:
+    """Substitute !!, !n, !-n and !prefix event designators outside single quotes"""
+    if '!' not in line:
+        return line
+    out = []
+    quoted = False
+    i, n = 0, len(line)
+    while i < n:
+        c = line[i]
+        if c == "'":
+            quoted = not quoted
+        elif c == '\\' and not quoted:
+            out.append(line[i:i + 2])
+            i += 2
+            continue
+        elif c == '!' and not quoted:
+            match = _EVENT.match(line, i)
+            if match:
+                out.append(_event(match.group(1), log))
+                i = match.end()
+                continue
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def _event(spec: str, log: HistoryLog) -> str:
+    try:
+        if spec == '!':
+            return log[-1]
+        if spec.lstrip('-').isdigit():
+            return log[int(spec)]
+    except IndexError:
+        raise CommandError(f"!{spec}: event not found")
+    found = log.find_prefix(spec)
+    if found is None:
+        raise CommandError(f"!{spec}: event not found")
+    return found[1]
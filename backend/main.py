@@ -1,15 +1,80 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
+import hashlib
 import json
+import math
 import os
+import time
 from datetime import datetime
 import asyncio
-import random
+from contextlib import asynccontextmanager
 from system_monitor import system_monitor
+from sampler import SnapshotUnavailable, metrics_sampler
+from timeseries import MetricStore, flatten_snapshot
+from streaming import MetricsSubscription, alert_stream, parse_fields, sse_events
+from alerts import AlertEngine, RuleError, UnknownMetric
+from sessions import Session, SessionManager, SQLiteSessionStore
+from vfs import VirtualFileSystem, OverlayFileSystem
+from filestore import FileStore, decode_token, encode_token
+from commands import load_plugins, CommandContext, CommandError
+import pipeline
+from completion import complete_line
+from history import HistoryLog, expand_history
+from sandbox import SandboxRunner, SandboxError
+from perf import RequestMetrics, RequestMetricsMiddleware, monitor_timings, profiler, startup_timings
+from exporter import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, OpenMetricsExporter
+from cache import TTLCache
+from payloads import MEDIA_TYPES, EncodedPayload, UnsupportedFormat, negotiate_encoding, negotiate_format
+from executor import MonitorTimeout, monitor_executor
+from config import settings
 
-app = FastAPI(title="TerminalX Backend", version="1.0.0")
+startup_timings.mark("imports")
+metric_store = MetricStore(retention=settings.METRICS_RETENTION, interval=settings.SAMPLER_INTERVAL)
+metrics_sampler.add_listener(metric_store.record)
+request_metrics = RequestMetrics()
+metrics_exporter = OpenMetricsExporter(request_metrics, monitor_timings)
+metrics_sampler.add_listener(metrics_exporter.update)
+alert_engine = AlertEngine(log_path=settings.ALERT_LOG or None, rules_path=settings.ALERT_RULES_FILE or None)
+for expression in settings.ALERT_RULES:
+    alert_engine.add(expression)
+# Every worker evaluates for its own subscribers; only the sampling one writes the log
+metrics_sampler.add_listener(lambda snapshot: alert_engine.update(snapshot, log=metrics_sampler.owner))
+session_manager = SessionManager(
+    max_sessions=settings.MAX_SESSIONS,
+    ttl=settings.SESSION_TTL,
+    store=SQLiteSessionStore(settings.SESSION_DB) if settings.SESSION_DB else None,
+    fs_factory=lambda: OverlayFileSystem(file_system),
+    history_factory=lambda session_id: HistoryLog(
+        os.path.join(settings.HISTORY_DIR, f"{session_id}.log"), max_entries=settings.HISTORY_SIZE
+    ),
+    on_evict=lambda session_id: sandbox.cleanup(session_id)
+)
+load_plugins(settings.COMMAND_PLUGINS)
+response_cache = TTLCache()
+sandbox = SandboxRunner(
+    root=settings.REAL_MODE_ROOT,
+    allowlist=settings.REAL_MODE_ALLOWLIST,
+    timeout=settings.REAL_MODE_TIMEOUT,
+    cpu_seconds=settings.REAL_MODE_CPU_SECONDS,
+    memory_mb=settings.REAL_MODE_MEMORY_MB,
+    max_output=settings.REAL_MODE_MAX_OUTPUT,
+    max_processes=settings.REAL_MODE_MAX_PROCESSES
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services on startup and stop them on shutdown"""
+    await metrics_sampler.start()
+    startup_timings.mark("startup")
+    yield
+    await metrics_sampler.stop()
+    for session_id in session_manager.session_ids():
+        sandbox.cleanup(session_id)  # real-mode scratch directories do not outlive the server
+
+app = FastAPI(title="TerminalX Backend", version="1.0.0", lifespan=lifespan)
 
 # Get environment variables
 HOST = os.getenv("HOST", "0.0.0.0")
@@ -43,35 +108,61 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware, metrics=request_metrics)
 
 # Data models
 class CommandRequest(BaseModel):
     command: str
-    current_path: str
+    current_path: Optional[str] = None
+    session_id: Optional[str] = None
 
 class CommandResponse(BaseModel):
     output: str
     current_path: str
     success: bool
     error: Optional[str] = None
+    session_id: Optional[str] = None
+    truncated: bool = False
+    continuation: Optional[str] = None
+
+class BatchCommandRequest(BaseModel):
+    commands: List[str]
+    current_path: Optional[str] = None
+    session_id: Optional[str] = None
+    stop_on_error: bool = True
+    stream: bool = False
+
+class BatchCommandResponse(BaseModel):
+    results: List[CommandResponse]
+    completed: int
+    current_path: str
+    session_id: str
+
+class AlertRuleRequest(BaseModel):
+    rule: str
+    name: Optional[str] = None
+
+class CompletionRequest(BaseModel):
+    line: str
+    cursor: Optional[int] = None
+    current_path: Optional[str] = None
+    session_id: Optional[str] = None
+    limit: int = 50
 
 class SystemInfo(BaseModel):
-    cpu_percent: float
-    memory_percent: float
-    memory_used: str
-    memory_total: str
-    disk_usage: str
-    uptime: str
-    processes: List[Dict[str, Any]]
-
-# Global state
-current_directory = os.path.expanduser("~")
-file_system = {}
-
-def simulate_file_system():
+    cpu_percent: Optional[float] = None
+    memory_percent: Optional[float] = None
+    memory_used: Optional[str] = None
+    memory_total: Optional[str] = None
+    disk_usage: Optional[str] = None
+    uptime: Optional[str] = None
+    processes: Optional[List[Dict[str, Any]]] = None
+    snapshot_age: Optional[float] = None
+
+def simulate_file_system() -> VirtualFileSystem:
     """Initialize a simulated file system"""
-    global file_system
-    file_system = {
+    fs = VirtualFileSystem(store=FileStore(settings.FILE_STORE_DIR, settings.LARGE_FILE_THRESHOLD))
+    fs.load({
         "home": {
             "user": {
                 "documents": {
@@ -97,182 +188,29 @@ def simulate_file_system():
                 "system.log": {"type": "file", "content": "System log entries..."}
             }
         }
-    }
+    })
+    return fs
 
-def get_directory_contents(path: str) -> List[Dict[str, str]]:
-    """Get contents of a directory in the simulated file system"""
-    if path == "/" or path == "":
-        return [{"name": "home", "type": "directory"}, {"name": "etc", "type": "directory"}, {"name": "var", "type": "directory"}]
-    
-    parts = [p for p in path.split("/") if p]
-    current = file_system
-    
-    for part in parts:
-        if part in current and isinstance(current[part], dict) and current[part].get("type") != "file":
-            current = current[part]
-        else:
-            return []
-    
-    contents = []
-    for name, item in current.items():
-        if isinstance(item, dict):
-            if item.get("type") == "file":
-                contents.append({"name": name, "type": "file"})
-            else:
-                contents.append({"name": name, "type": "directory"})
-    
-    return contents
+# Simulated file system: the shared immutable base under every session's overlay
+file_system = simulate_file_system()
 
-def execute_command(command: str, current_path: str) -> CommandResponse:
-    """Execute a terminal command and return the response"""
-    global current_directory
-    
-    if current_path:
-        current_directory = current_path
-    
-    parts = command.strip().split()
-    if not parts:
-        return CommandResponse(output="", current_path=current_directory, success=True)
-    
-    cmd = parts[0].lower()
-    args = parts[1:] if len(parts) > 1 else []
+async def execute_command(command: str, current_path: str, env: Optional[Dict[str, str]] = None,
+                          fs: Optional[VirtualFileSystem] = None,
+                          session: Optional[Session] = None) -> CommandResponse:
+    """Execute a terminal command line and return the response"""
+    ctx = CommandContext(current_path or "/", env if env is not None else {},
+                         fs if fs is not None else file_system, session)
     
     try:
-        if cmd == "ls":
-            if args and args[0] == "-la":
-                contents = get_directory_contents(current_directory)
-                if not contents:
-                    output = f"ls: cannot access '{current_directory}': No such file or directory"
-                else:
-                    output = "total 0\n"
-                    for item in contents:
-                        permissions = "drwxr-xr-x" if item["type"] == "directory" else "-rw-r--r--"
-                        size = "4096" if item["type"] == "directory" else "1024"
-                        date = "Dec 25 12:00"
-                        name = item["name"]
-                        output += f"{permissions} 1 user user {size} {date} {name}\n"
-            else:
-                contents = get_directory_contents(current_directory)
-                if not contents:
-                    output = f"ls: cannot access '{current_directory}': No such file or directory"
-                else:
-                    output = " ".join([item["name"] for item in contents])
-            return CommandResponse(output=output, current_path=current_directory, success=True)
-        
-        elif cmd == "pwd":
-            return CommandResponse(output=current_directory, current_path=current_directory, success=True)
-        
-        elif cmd == "cd":
-            if not args:
-                current_directory = "/"
-            elif args[0] == "..":
-                if current_directory != "/":
-                    current_directory = "/".join(current_directory.rstrip("/").split("/")[:-1]) or "/"
-            elif args[0].startswith("/"):
-                current_directory = args[0]
-            else:
-                new_path = f"{current_directory.rstrip('/')}/{args[0]}"
-                contents = get_directory_contents(new_path)
-                if contents is not None:
-                    current_directory = new_path
-                else:
-                    return CommandResponse(
-                        output=f"cd: {args[0]}: No such file or directory",
-                        current_path=current_directory,
-                        success=False
-                    )
-            return CommandResponse(output="", current_path=current_directory, success=True)
-        
-        elif cmd == "mkdir":
-            if not args:
-                return CommandResponse(output="mkdir: missing operand", current_path=current_directory, success=False)
-            # In a real implementation, you'd create the directory
-            return CommandResponse(output=f"Created directory '{args[0]}'", current_path=current_directory, success=True)
-        
-        elif cmd == "touch":
-            if not args:
-                return CommandResponse(output="touch: missing file operand", current_path=current_directory, success=False)
-            # In a real implementation, you'd create the file
-            return CommandResponse(output=f"Created file '{args[0]}'", current_path=current_directory, success=True)
-        
-        elif cmd == "cat":
-            if not args:
-                return CommandResponse(output="cat: missing file operand", current_path=current_directory, success=False)
-            
-            file_path = f"{current_directory.rstrip('/')}/{args[0]}"
-            parts = [p for p in file_path.lstrip("/").split("/") if p]
-            current = file_system
-            
-            for part in parts:
-                if part in current and isinstance(current[part], dict):
-                    current = current[part]
-                else:
-                    return CommandResponse(
-                        output=f"cat: {args[0]}: No such file or directory",
-                        current_path=current_directory,
-                        success=False
-                    )
-            
-            if current.get("type") == "file":
-                return CommandResponse(output=current.get("content", ""), current_path=current_directory, success=True)
-            else:
-                return CommandResponse(
-                    output=f"cat: {args[0]}: Is a directory",
-                    current_path=current_directory,
-                    success=False
-                )
-        
-        elif cmd == "echo":
-            message = " ".join(args)
-            return CommandResponse(output=message, current_path=current_directory, success=True)
-        
-        elif cmd == "rm":
-            if not args:
-                return CommandResponse(output="rm: missing operand", current_path=current_directory, success=False)
-            return CommandResponse(output=f"Removed '{args[0]}'", current_path=current_directory, success=True)
-        
-        elif cmd == "clear":
-            return CommandResponse(output="\033[2J\033[H", current_path=current_directory, success=True)
-        
-        elif cmd == "help":
-            help_text = """
-Available commands:
-  ls, ls -la    - List directory contents
-  pwd           - Print working directory
-  cd <dir>      - Change directory
-  mkdir <dir>   - Create directory
-  touch <file>  - Create file
-  cat <file>    - Display file contents
-  echo <text>   - Display text
-  rm <file>     - Remove file
-  clear         - Clear screen
-  help          - Show this help
-  top           - Show system processes
-  htop          - Show system processes (enhanced)
-  free          - Show memory usage
-  df            - Show disk usage
-  uptime        - Show system uptime
-  ps            - Show running processes
-  iostat        - Show I/O statistics
-  vmstat        - Show virtual memory statistics
-  backend status - Check backend connection
-  backend connect - Connect to backend
-  backend on    - Enable backend mode
-  backend off   - Disable backend mode
-            """
-            return CommandResponse(output=help_text.strip(), current_path=current_directory, success=True)
-        
-        else:
-            return CommandResponse(
-                output=f"Command not found: {cmd}. Type 'help' for available commands.",
-                current_path=current_directory,
-                success=False
-            )
-    
+        output, success = await pipeline.run(command, ctx)
+        return CommandResponse(output=output, current_path=ctx.cwd, success=success,
+                               truncated=ctx.truncated, continuation=ctx.continuation)
+    except CommandError as e:
+        return CommandResponse(output=str(e), current_path=ctx.cwd, success=False)
     except Exception as e:
         return CommandResponse(
             output=f"Error executing command: {str(e)}",
-            current_path=current_directory,
+            current_path=ctx.cwd,
             success=False,
             error=str(e)
         )
@@ -281,83 +219,498 @@ Available commands:
 async def root():
     return {"message": "TerminalX Backend API", "status": "running"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape target in OpenMetrics text format, rendered once per sampler tick"""
+    payload = metrics_exporter.payload
+    if payload is None:
+        payload = metrics_exporter.render((current_snapshot())[0])
+    return Response(content=payload, media_type=OPENMETRICS_CONTENT_TYPE)
+
+@app.get("/api/debug/perf")
+async def get_perf_stats():
+    """Per-route latency percentiles, in-flight requests and SystemMonitor call timings"""
+    return {
+        "requests": request_metrics.summary(),
+        "in_flight": request_metrics.in_flight,
+        "peak_in_flight": request_metrics.peak_in_flight,
+        "monitor_calls": monitor_timings.summary(),
+        "response_cache": response_cache.stats(),
+        "monitor_executor": monitor_executor.stats(),
+        "sampler": {"pid": os.getpid(), "owner": metrics_sampler.owner, "last_error": metrics_sampler.last_error},
+        "profiler": {"enabled": settings.PROFILER_ENABLED, "running": profiler.running},
+        "startup": startup_timings.summary(settings.STARTUP_BUDGET_MS)
+    }
+
+@app.post("/api/debug/profile")
+async def start_profiler(seconds: float = Query(10, gt=0), interval: float = Query(0.005, ge=0.001)):
+    """Sample all thread stacks for `seconds`; read the results from GET /api/debug/profile"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiler is disabled")
+    try:
+        profiler.start(min(seconds, settings.PROFILER_MAX_SECONDS), interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"running": True, "stops_at": profiler.stops_at}
+
+@app.get("/api/debug/profile")
+async def get_profile(limit: int = Query(20, ge=1, le=200)):
+    """Hottest functions and stacks from the last profiler run"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiler is disabled")
+    return profiler.report(limit)
+
 @app.get("/api/health")
 async def health_check():
+    startup_timings.mark("first_health")
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+async def execute_in_session(session: Session, command: str, current_path: Optional[str] = None) -> CommandResponse:
+    """Run one command line against a session's state and record it"""
+    expanded = command
+    if session.history is not None:
+        try:
+            expanded = expand_history(command, session.history)
+        except CommandError as e:
+            return CommandResponse(output=str(e), current_path=current_path or session.cwd,
+                                   success=False, session_id=session.session_id)
+    session.record(expanded)
+    response = await execute_command(expanded, current_path or session.cwd, session.env,
+                                     session.fs, session)
+    if expanded != command:
+        # Like bash, show the command a history reference expanded to
+        response.output = expanded + ("\n" + response.output if response.output else "")
+    session.cwd = response.current_path
+    response.session_id = session.session_id
+    return response
+
 @app.post("/api/command", response_model=CommandResponse)
 async def execute_terminal_command(request: CommandRequest):
-    """Execute a terminal command"""
-    return execute_command(request.command, request.current_path)
+    """Execute a terminal command in the caller's session"""
+    session = await session_manager.get_or_create(request.session_id)
+    response = await execute_in_session(session, request.command, request.current_path)
+    await session_manager.save(session)
+    return response
+
+@app.post("/api/command/batch")
+async def execute_command_batch(request: BatchCommandRequest):
+    """Run several commands in order in one session, as JSON or streamed NDJSON"""
+    session = await session_manager.get_or_create(request.session_id)
+    
+    async def results():
+        current_path = request.current_path
+        for command in request.commands:
+            response = await execute_in_session(session, command, current_path)
+            current_path = None  # later commands continue from the session's cwd
+            yield response
+            if not response.success and request.stop_on_error:
+                break
+        await session_manager.save(session)
+    
+    if request.stream:
+        async def body():
+            completed = 0
+            async for response in results():
+                completed += 1
+                yield json.dumps({"type": "result", "index": completed - 1, **response.model_dump()}) + "\n"
+            yield json.dumps({
+                "type": "done",
+                "completed": completed,
+                "current_path": session.cwd,
+                "session_id": session.session_id
+            }) + "\n"
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    responses = [response async for response in results()]
+    return BatchCommandResponse(
+        results=responses,
+        completed=len(responses),
+        current_path=session.cwd,
+        session_id=session.session_id
+    )
 
-@app.get("/api/system")
-async def get_system_info():
-    """Get system monitoring information"""
+@app.post("/api/command/stream")
+async def stream_real_command(request: CommandRequest):
+    """Run an allowlisted binary in real mode and stream NDJSON output events"""
+    if not settings.REAL_MODE_ENABLED:
+        raise HTTPException(status_code=403, detail="Real command mode is disabled")
+    session = await session_manager.get_or_create(request.session_id)
     try:
-        cpu_percent = system_monitor.get_cpu_percent()
-        memory_info = system_monitor.get_memory_info()
-        disk_info = system_monitor.get_disk_usage()
-        uptime_info = system_monitor.get_uptime()
-        processes = system_monitor.get_top_processes()
-        
-        return SystemInfo(
-            cpu_percent=cpu_percent,
-            memory_percent=memory_info["percent"],
-            memory_used=memory_info["used"],
-            memory_total=memory_info["total"],
-            disk_usage=disk_info,
-            uptime=uptime_info,
-            processes=processes
-        )
+        sandbox.parse(request.command, sandbox.workdir(session.session_id))
+    except SandboxError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session.record(request.command)
+    await session_manager.save(session)
+    
+    async def body():
+        yield json.dumps({"type": "session", "session_id": session.session_id}) + "\n"
+        async for event in sandbox.run(session.session_id, request.command, session.env):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def _session_history(session_id: str) -> HistoryLog:
+    session = await session_manager.get(session_id)
+    if session is None or session.history is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session.history
+
+@app.get("/api/history")
+async def get_history(session_id: str, offset: int = 0, limit: int = Query(100, ge=1, le=1000)):
+    """Page through a session's history, newest last; a negative offset counts from the end"""
+    log = await _session_history(session_id)
+    total = len(log)
+    start = max(total + offset, 0) if offset < 0 else offset
+    entries = []
+    for number, entry in log.entries(start + 1):
+        if len(entries) >= limit:
+            break
+        entries.append({"number": number, "command": entry})
+    return {"entries": entries, "total": total}
+
+@app.get("/api/history/search")
+async def search_history(session_id: str, q: str, before: Optional[int] = None):
+    """Reverse incremental search: the newest entry containing `q` below number `before`"""
+    found = (await _session_history(session_id)).search(q, before)
+    if found is None:
+        return {"match": None}
+    return {"match": {"number": found[0], "command": found[1]}}
+
+@app.get("/api/history/suggest")
+async def suggest_history(session_id: str, prefix: str = "", limit: int = Query(10, ge=1, le=100)):
+    """Previously run commands starting with `prefix`, most frequent first"""
+    return {"suggestions": (await _session_history(session_id)).suggest(prefix, limit)}
+
+@app.post("/api/complete")
+async def complete_command(request: CompletionRequest):
+    """Complete the last word of a partially typed command line"""
+    session = await session_manager.get(request.session_id)
+    fs = session.fs if session is not None else file_system
+    cwd = request.current_path or (session.cwd if session is not None else "/")
+    line = request.line if request.cursor is None else request.line[:request.cursor]
+    return complete_line(line, fs, cwd, limit=request.limit)
+
+@app.get("/api/files/read")
+async def read_file(path: Optional[str] = None, token: Optional[str] = None,
+                    session_id: Optional[str] = None, offset: int = 0,
+                    limit: Optional[int] = Query(None, ge=1, le=16 * 1024 * 1024)):
+    """Read a byte range of a file without loading the rest of it
+    
+    Start with `path` (a negative `offset` counts back from the end) and pass
+    the returned `next_token` to continue; at EOF the same token can be polled
+    to follow a growing file, as after ``tail -f``.
+    """
+    session = await session_manager.get(session_id)
+    fs = session.fs if session is not None else file_system
+    if token is not None:
+        decoded = decode_token(token)
+        if decoded is None:
+            raise HTTPException(status_code=400, detail="Invalid continuation token")
+        path, offset = decoded
+    elif path is not None:
+        path = fs.resolve(path, session.cwd if session is not None else "/")
+    else:
+        raise HTTPException(status_code=400, detail="Either path or token is required")
+    try:
+        blob = fs.open(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No such file: {path}")
+    except IsADirectoryError:
+        raise HTTPException(status_code=400, detail=f"Is a directory: {path}")
+    size = blob.size
+    if offset < 0:
+        offset = max(size + offset, 0)
+    elif offset > size:
+        offset = 0  # the file shrank or was replaced since the token was issued
+    data, end = blob.read_range(offset, limit or settings.FILE_PAGE_BYTES)
+    return {
+        "path": path,
+        "offset": offset,
+        "data": data,
+        "next_offset": end,
+        "size": size,
+        "eof": end >= size,
+        "next_token": encode_token(path, end)
+    }
+
+async def cached_json(request: Request, name: str, key: Any, compute) -> Response:
+    """Serve `compute()`'s data through the response cache with ETag revalidation
+    
+    `compute` returns ``(data, version)``; when `version` is not None (e.g. the
+    sampler snapshot's timestamp) it determines the ETag, so fields that change
+    on every render such as ``snapshot_age`` do not defeat conditional GETs.
+    The body is JSON, columnar JSON or MessagePack as negotiated from
+    ``Accept`` (or ``?format=``), compressed per ``Accept-Encoding``.
+    """
+    ttl = settings.CACHE_TTLS.get(name, 1.0)
+    try:
+        fmt = negotiate_format(request.headers.get("accept", ""), request.query_params.get("format"))
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    
+    async def render():
+        data, version = await compute()
+        tag = repr((name, key, version)).encode() if version is not None else json.dumps(data).encode()
+        return EncodedPayload(data, hashlib.blake2b(tag, digest_size=8).hexdigest())
+    
+    payload = await response_cache.get((name, key), ttl, render)
+    body, encoding = payload.body(fmt, negotiate_encoding(request.headers.get("accept-encoding", "")))
+    etag = payload.etag(fmt, encoding)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max(int(ttl), 0)}",
+               "Vary": "Accept, Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+def not_sampled(detail: str) -> HTTPException:
+    """503 asking the client to retry once the sampler has ticked"""
+    retry_after = max(1, math.ceil(metrics_sampler.interval))
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+def current_snapshot():
+    """The sampler's latest snapshot and age, or a 503 while there is none yet"""
+    try:
+        return metrics_sampler.latest()
+    except SnapshotUnavailable as e:
+        raise not_sampled(str(e))
+
+def snapshot_group(group: str):
+    """Cache compute function returning one sampler snapshot group"""
+    async def compute():
+        snapshot, age = current_snapshot()
+        if group not in snapshot:
+            # The reader failed or timed out on every sample so far
+            raise not_sampled(f"No {group} reading has been taken yet")
+        data = {**snapshot[group], "snapshot_age": age}
+        if group in snapshot.get("stale", ()):
+            data["stale"] = True  # the last read timed out; this is the previous value
+        return data, snapshot["timestamp"]
+    return compute
+
+@app.get("/api/system", response_model=SystemInfo, response_model_exclude_unset=True)
+async def get_system_info(request: Request, fields: Optional[str] = None):
+    """Get system monitoring information, optionally limited to comma separated `fields`"""
+    async def compute():
+        snapshot, age = current_snapshot()
+        info = system_monitor.get_system_info_snapshot(parse_fields(fields), sample=snapshot)
+        return SystemInfo(**info, snapshot_age=age).model_dump(exclude_unset=True), snapshot["timestamp"]
+    try:
+        return await cached_json(request, "system", fields, compute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting system info: {str(e)}")
 
+@app.get("/api/system/info")
+async def get_static_system_info(request: Request):
+    """Get platform details that do not change while the server runs"""
+    async def compute():
+        # The sampler probes this before its first sample; answer 503 until then
+        current_snapshot()
+        return await monitor_executor.run(lambda: system_monitor.system_info, key="system_info"), None
+    try:
+        return await cached_json(request, "system_info", None, compute)
+    except HTTPException:
+        raise
+    except MonitorTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting platform info: {str(e)}")
+
 @app.get("/api/processes")
-async def get_processes():
+async def get_processes(request: Request, limit: int = 20):
     """Get detailed process information"""
+    async def compute():
+        # A local sampler refreshes the process table every tick; otherwise refresh here
+        refresh = not metrics_sampler.sampling
+        try:
+            processes = await monitor_executor.run(system_monitor.get_processes, limit, refresh,
+                                                   key=("get_processes", limit, refresh))
+        except MonitorTimeout as e:
+            return {"processes": [], "partial": True, "error": str(e)}, None
+        return {"processes": processes}, None
     try:
-        processes = system_monitor.get_detailed_processes()
-        return {"processes": processes}
+        return await cached_json(request, "processes", limit, compute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting processes: {str(e)}")
 
+@app.get("/api/processes/tree")
+async def get_process_tree(request: Request, root: Optional[int] = None, depth: Optional[int] = Query(None, ge=0)):
+    """Get processes nested by parent, from `root` (default: all) down to `depth` levels"""
+    async def compute():
+        refresh = not metrics_sampler.sampling
+        try:
+            tree = await monitor_executor.run(system_monitor.get_process_tree, root, depth, refresh,
+                                              key=("get_process_tree", root, depth, refresh))
+        except MonitorTimeout as e:
+            return {"processes": [], "partial": True, "error": str(e)}, None
+        if tree is None:
+            raise HTTPException(status_code=404, detail=f"No process with pid {root}")
+        return {"processes": tree}, None
+    try:
+        return await cached_json(request, "process_tree", (root, depth), compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting process tree: {str(e)}")
+
+@app.get("/api/processes/{pid}")
+async def get_process_detail(request: Request, pid: int):
+    """Get open files, threads, IO counters, memory maps and connections of one process
+    
+    These are read only here, for one process at a time, and cached briefly per pid.
+    """
+    async def compute():
+        detail = await monitor_executor.run(system_monitor.get_process_detail, pid,
+                                            key=("get_process_detail", pid))
+        if detail is None:
+            raise HTTPException(status_code=404, detail=f"No process with pid {pid}")
+        return detail, None
+    try:
+        return await cached_json(request, "process_detail", pid, compute)
+    except HTTPException:
+        raise
+    except MonitorTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting process {pid}: {str(e)}")
+
 @app.get("/api/memory")
-async def get_memory_info():
+async def get_memory_info(request: Request):
     """Get memory information"""
     try:
-        memory_info = system_monitor.get_memory_info()
-        return memory_info
+        return await cached_json(request, "memory", None, snapshot_group("memory"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting memory info: {str(e)}")
 
 @app.get("/api/cpu")
-async def get_cpu_info():
+async def get_cpu_info(request: Request):
     """Get CPU information"""
     try:
-        cpu_info = system_monitor.get_cpu_info()
-        return cpu_info
+        return await cached_json(request, "cpu", None, snapshot_group("cpu"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting CPU info: {str(e)}")
 
 @app.get("/api/disk")
-async def get_disk_info():
+async def get_disk_info(request: Request):
     """Get disk information"""
     try:
-        disk_info = system_monitor.get_disk_usage()
-        return {"disk_usage": disk_info}
+        return await cached_json(request, "disk", None, snapshot_group("disk"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting disk info: {str(e)}")
 
 @app.get("/api/network")
-async def get_network_info():
+async def get_network_info(request: Request):
     """Get network information"""
     try:
-        network_info = system_monitor.get_network_info()
-        return network_info
+        return await cached_json(request, "network", None, snapshot_group("network"))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting network info: {str(e)}")
 
+@app.get("/api/metrics/history")
+async def get_metrics_history(
+    metric: str,
+    start: Optional[float] = Query(None, alias="from"),
+    end: Optional[float] = Query(None, alias="to"),
+    step: Optional[float] = None
+):
+    """Get a metric's recorded history, optionally bucketed to `step` seconds"""
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 300
+    try:
+        return metric_store.query(metric, start, end, step)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown metric '{metric}'. Available: {', '.join(metric_store.metrics())}"
+        )
+
+@app.websocket("/ws/metrics")
+async def metrics_websocket(websocket: WebSocket, fields: Optional[str] = None, interval: Optional[float] = None):
+    """Stream delta-encoded metric snapshots; send {"fields": [...], "interval": n} to reconfigure"""
+    await websocket.accept()
+    subscription = MetricsSubscription(metrics_sampler, parse_fields(fields), interval, alert_engine)
+
+    async def receive_config():
+        while True:
+            config = await websocket.receive_json()
+            subscription.configure(config.get("fields"), config.get("interval"))
+
+    receiver = asyncio.create_task(receive_config())
+    try:
+        async for message in subscription.messages():
+            if receiver.done():
+                break
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+@app.get("/api/metrics/stream")
+async def metrics_stream(fields: Optional[str] = None, interval: Optional[float] = None):
+    """Server-Sent Events fallback for /ws/metrics"""
+    subscription = MetricsSubscription(metrics_sampler, parse_fields(fields), interval, alert_engine)
+    return StreamingResponse(
+        sse_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/alerts")
+async def get_alerts():
+    """Alert rules with their current state and the value they were last evaluated on"""
+    return {"rules": await asyncio.to_thread(alert_engine.rules)}
+
+def check_rules_shared():
+    """Workers sharing metrics must share rule changes too, or each would evaluate its own set"""
+    if metrics_sampler.shared is not None and not alert_engine.rules_path:
+        raise HTTPException(status_code=409, detail="Alert rules cannot be changed at runtime "
+                                                    "with several workers unless ALERT_RULES_FILE is set")
+
+@app.post("/api/alerts/rules")
+async def add_alert_rule(request: AlertRuleRequest):
+    """Add (or replace, by name) a rule such as 'cpu.percent avg > 90 for 30s'"""
+    check_rules_shared()
+    metrics = flatten_snapshot(current_snapshot()[0])
+    try:
+        rule = await asyncio.to_thread(alert_engine.add, request.rule, request.name, metrics)
+    except UnknownMetric as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rule.to_dict()
+
+@app.delete("/api/alerts/rules/{name}")
+async def delete_alert_rule(name: str):
+    check_rules_shared()
+    if not await asyncio.to_thread(alert_engine.remove, name):
+        raise HTTPException(status_code=404, detail=f"No alert rule named '{name}'")
+    return {"deleted": name}
+
+@app.get("/api/alerts/stream")
+async def alerts_stream():
+    """Server-Sent Events of alert state changes, for terminals to print as they happen"""
+    return StreamingResponse(
+        alert_stream(alert_engine, metrics_sampler.interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+startup_timings.mark("app")
+
 if __name__ == "__main__":
-    simulate_file_system()
     import uvicorn
     uvicorn.run(app, host=HOST, port=PORT, debug=DEBUG)
@@ -0,0 +1,145 @@
+"""
+Wire Formats for TerminalX
+Content negotiation, columnar and MessagePack encodings and compression for monitoring responses
+
+Monitoring payloads are mostly lists of per-process dicts that repeat every
+key name. Besides plain JSON, clients can ask (via ``Accept`` or a
+``?format=`` override) for:
+
+- ``columnar``: JSON where each list of dicts becomes one array per field
+- ``msgpack``: the columnar form packed as MessagePack (needs ``msgpack``)
+
+Bodies above ``settings.COMPRESS_MIN_BYTES`` are compressed with brotli (if
+installed) or gzip, following ``Accept-Encoding``. Each cached payload keeps
+its encoded variants, so a variant is built once per cache TTL.
+"""
+
+import gzip
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import settings
+
+try:
+    import msgpack
+except ImportError:  # optional: the msgpack format is not offered
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip
+    brotli = None
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.terminalx.columnar+json',
+    'msgpack': 'application/msgpack',
+}
+_ACCEPT = {
+    'application/json': 'json',
+    'application/vnd.terminalx.columnar+json': 'columnar',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+}
+
+
+class UnsupportedFormat(ValueError):
+    """An explicitly requested format is unknown or its library is missing"""
+
+
+def available_formats() -> List[str]:
+    return [name for name in MEDIA_TYPES if name != 'msgpack' or msgpack is not None]
+
+
+def _weighted(header: str) -> List[Tuple[str, float]]:
+    """Values of an Accept-style header with their q weights, best first (stable)"""
+    values = []
+    for item in header.split(','):
+        value, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, number = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            values.append((value.strip().lower(), quality))
+    return sorted(values, key=lambda item: -item[1])
+
+
+def negotiate_format(accept: str, override: Optional[str] = None) -> str:
+    """Pick a format name from a `?format=` override or the Accept header (default: json)"""
+    formats = available_formats()
+    if override:
+        if override not in formats:
+            raise UnsupportedFormat(f"Unsupported format '{override}'; available: {', '.join(formats)}")
+        return override
+    for media_type, quality in _weighted(accept):
+        name = _ACCEPT.get(media_type)
+        if quality > 0 and name in formats:
+            return name
+    return 'json'
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """'br', 'gzip' or None from an Accept-Encoding header"""
+    accepted = {value: quality for value, quality in _weighted(accept_encoding) if quality > 0}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def columnar(data: Any) -> Any:
+    """Replace every list of dicts with a dict of per-field lists (missing values are None)"""
+    if isinstance(data, dict):
+        return {key: columnar(value) for key, value in data.items()}
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        fields = dict.fromkeys(key for item in data for key in item)
+        return {field: [item.get(field) for item in data] for field in fields}
+    return data
+
+
+def serialize(data: Any, fmt: str) -> bytes:
+    if fmt == 'json':
+        return json.dumps(data, separators=(',', ':')).encode()
+    if fmt == 'columnar':
+        return json.dumps(columnar(data), separators=(',', ':')).encode()
+    if fmt == 'msgpack':
+        return msgpack.packb(columnar(data), use_bin_type=True)
+    raise UnsupportedFormat(fmt)
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(body, applied encoding); small bodies are sent as they are"""
+    if encoding is None or len(body) < settings.COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY), 'br'
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL, mtime=0), 'gzip'
+
+
+class EncodedPayload:
+    """One computed response body and its encoded variants, built on first use"""
+
+    __slots__ = ('data', 'tag', '_bodies')
+
+    def __init__(self, data: Any, tag: str):
+        self.data = data
+        self.tag = tag  # base ETag value; variants append their format and encoding
+        self._bodies: Dict[Tuple[str, Optional[str]], Tuple[bytes, Optional[str]]] = {}
+
+    def body(self, fmt: str, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        key = (fmt, encoding)
+        variant = self._bodies.get(key)
+        if variant is None:
+            variant = self._bodies[key] = compress(serialize(self.data, fmt), encoding)
+        return variant
+
+    def etag(self, fmt: str, encoding: Optional[str]) -> str:
+        suffix = '' if fmt == 'json' else f'-{fmt}'
+        return f'"{self.tag}{suffix}{"-" + encoding if encoding else ""}"'
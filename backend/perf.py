@@ -0,0 +1,319 @@
+"""
+Request Instrumentation for TerminalX
+Per-route latency histograms, in-flight counts, SystemMonitor call timings,
+startup milestones and an on-demand sampling profiler
+
+Latencies go into HDR-style log-linear histograms: microsecond values below
+``2 * SUB_BUCKETS`` get exact buckets, larger ones share ``SUB_BUCKETS``
+buckets per power of two. That bounds the relative error to 1/32 (~3%) and
+the memory to a fixed ``array('Q')`` of ~1k counters per series (8.4 KB),
+however many requests are recorded.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Any, Hashable, Optional, Tuple
+
+# Upper bounds in seconds, matching the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_MICROSECONDS = (1 << 36) - 1  # ~19 hours; longer values are clamped
+BUCKET_COUNT = (MAX_MICROSECONDS.bit_length() - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+
+
+def _bucket_index(us: int) -> int:
+    if us < 2 * SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (us >> shift)
+
+
+def _bucket_range(index: int) -> Tuple[int, int]:
+    """[low, high) microsecond range covered by bucket `index`"""
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    top = index - shift * SUB_BUCKETS
+    return top << shift, (top + 1) << shift
+
+
+class LatencyHistogram:
+    """HDR-style latency histogram with fixed memory and ~3% quantile error"""
+
+    __slots__ = ('counts', 'sum', 'count', 'min', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+        self.sum = 0.0
+        self.count = 0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        us = min(max(int(seconds * 1e6), 0), MAX_MICROSECONDS)
+        self.counts[_bucket_index(us)] += 1
+        self.sum += seconds
+        self.count += 1
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Approximate `q` quantile in seconds (bucket midpoint, clamped to min/max)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= rank:
+                    low, high = _bucket_range(index)
+                    return min(max((low + high - 1) / 2e6, self.min), self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, count of values <= bound) pairs at LATENCY_BUCKETS ending with +Inf
+
+        A histogram bucket is counted under a bound only when it lies wholly
+        below it, so counts are exact in the linear range and conservative above.
+        """
+        limits = [int(bound * 1e6) for bound in LATENCY_BUCKETS]
+        totals = [0] * len(limits)
+        for index, count in enumerate(self.counts):
+            if count:
+                high = _bucket_range(index)[1] - 1
+                for i, limit in enumerate(limits):
+                    if high <= limit:
+                        totals[i] += count
+        buckets = list(zip(LATENCY_BUCKETS, totals))
+        buckets.append((float('inf'), self.count))
+        return buckets
+
+    def summary(self) -> Dict[str, Any]:
+        """Count plus mean, p50/p95/p99 and max in milliseconds"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.50) * 1000, 3),
+            'p95_ms': round(self.quantile(0.95) * 1000, 3),
+            'p99_ms': round(self.quantile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+
+class LatencyRecorder:
+    """Latency histograms keyed by an arbitrary label tuple or name"""
+
+    def __init__(self):
+        self.histograms: Dict[Hashable, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        # Called from the event loop and from worker threads alike
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def items(self) -> List[Tuple[Hashable, LatencyHistogram]]:
+        with self._lock:
+            return sorted(self.histograms.items())
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {' '.join(key) if isinstance(key, tuple) else str(key): histogram.summary()
+                for key, histogram in self.items()}
+
+
+class RequestMetrics(LatencyRecorder):
+    """Per (method, route template) latencies plus in-flight request counts"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self) -> None:
+        self.in_flight += 1
+        if self.in_flight > self.peak_in_flight:
+            self.peak_in_flight = self.in_flight
+
+    def finished(self, method: str, route: str, seconds: float) -> None:
+        self.in_flight -= 1
+        self.record((method, route), seconds)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request until its response is complete"""
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        self.metrics.started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Label by route template so /api/x/{pid} is one series, not one per pid
+            route = scope.get('route')
+            self.metrics.finished(scope['method'], route.path if route is not None else 'unmatched',
+                                  time.perf_counter() - start)
+            startup_timings.mark('first_request')
+
+
+class StartupTimings:
+    """Milliseconds from process start to each startup milestone, each recorded once
+
+    Milestones, in order: ``imports`` (main's imports done), ``app`` (routes
+    built), ``startup`` (lifespan startup done), ``first_request`` and
+    ``first_health`` (first /api/health answered).
+    """
+
+    PHASES = ('imports', 'app', 'startup', 'first_request')
+
+    def __init__(self):
+        self.process_start = time.time() - _process_age()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        if name not in self.marks:
+            self.marks[name] = round((time.time() - self.process_start) * 1e3, 1)
+
+    def summary(self, budget_ms: float) -> Dict[str, Any]:
+        """Milestones since process start, time spent in each phase and the health budget check"""
+        phases, previous = {}, 0.0
+        for name in self.PHASES:
+            if name in self.marks:
+                phases[name] = round(self.marks[name] - previous, 1)
+                previous = self.marks[name]
+        first_health = self.marks.get('first_health')
+        return {
+            'since_start_ms': dict(self.marks),
+            'phases_ms': phases,
+            'budget_ms': budget_ms,
+            'within_budget': None if first_health is None else first_health <= budget_ms
+        }
+
+
+def _process_age() -> float:
+    """Seconds since this process started, to clock-tick precision (0 where /proc is missing)
+
+    psutil's create_time() is anchored to a boot time rounded to whole
+    seconds, which is too coarse for a sub-second startup budget.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rpartition(')')[2].split()[19])  # field 22, starttime
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+startup_timings = StartupTimings()
+
+
+# Time spent inside SystemMonitor readers, keyed by method name
+monitor_timings = LatencyRecorder()
+
+
+def timed(recorder: LatencyRecorder) -> Callable:
+    """Decorator recording each call's wall time under the function's name"""
+    def decorator(fn: Callable) -> Callable:
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval for a limited time
+
+    Off unless started; each run replaces the previous results. Stacks are
+    kept collapsed (``file:function;...``), the format flame graph tools read.
+    """
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.0
+        self.started_at: Optional[float] = None
+        self.stops_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.005) -> None:
+        if self.running:
+            raise RuntimeError("profiler is already running")
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = interval
+        self.started_at = time.time()
+        self.stops_at = self.started_at + seconds
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds,),
+                                        name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, seconds: float) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """Hottest collapsed stacks and functions by self samples"""
+        stacks = self.stacks.copy()
+        leaves: Counter = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return {
+            'running': self.running,
+            'started_at': self.started_at,
+            'stops_at': self.stops_at,
+            'interval': self.interval,
+            'samples': self.samples,
+            'top_functions': [{'function': name, 'samples': count} for name, count in leaves.most_common(limit)],
+            'top_stacks': [{'stack': stack, 'samples': count} for stack, count in stacks.most_common(limit)]
+        }
+
+
+profiler = SamplingProfiler()
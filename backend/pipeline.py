@@ -0,0 +1,297 @@
+"""
+Shell Grammar and Pipeline Executor for TerminalX
+Parses quoting, pipes, &&, ||, ; and redirects, then streams lines between stages
+
+Parsing is cached by the raw command string. The parsed tree keeps quoting
+information so ``$VAR`` expansion happens at run time against the session's
+current environment. Each pipeline stage is an iterator of lines pulled by the
+next stage, so ``cat big.log | grep x | head`` stops reading once ``head`` has
+enough lines. Output kept for the response is capped at
+``settings.MAX_OUTPUT_BYTES``; past that the stages are no longer pulled.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from commands import registry, iter_lines, CommandContext, CommandError, ASYNC, STREAM
+from config import settings
+from filestore import PartialLine
+
+# A word is a tuple of (text, expandable) segments; single quotes disable $ expansion
+Word = Tuple[Tuple[str, bool], ...]
+
+OPERATORS = ('&&', '||', '>>', '|', ';', '>', '<', '&')
+
+
+class SimpleCommand(NamedTuple):
+    words: Tuple[Word, ...]
+    redirects: Tuple[Tuple[str, Word], ...]
+
+
+class Pipeline(NamedTuple):
+    commands: Tuple[SimpleCommand, ...]
+
+
+# (connector, pipeline) pairs; the first connector is None
+Sequence = Tuple[Tuple[Optional[str], Pipeline], ...]
+
+
+def tokenize(line: str) -> List[Tuple[str, object]]:
+    """Split a command line into ('word', Word) and ('op', str) tokens"""
+    tokens: List[Tuple[str, object]] = []
+    segments: List[Tuple[str, bool]] = []
+    buf: List[str] = []
+    in_word = False
+    i, n = 0, len(line)
+
+    def flush_buf(expand: bool) -> None:
+        if buf:
+            segments.append((''.join(buf), expand))
+            buf.clear()
+
+    def end_word() -> None:
+        nonlocal in_word
+        flush_buf(True)
+        if in_word:
+            tokens.append(('word', tuple(segments)))
+            segments.clear()
+        in_word = False
+
+    while i < n:
+        c = line[i]
+        if c in ' \t\n':
+            end_word()
+            i += 1
+        elif c == '#' and not in_word:
+            break
+        elif c == '\\':
+            flush_buf(True)
+            if i + 1 < n:
+                segments.append((line[i + 1], False))
+            in_word = True
+            i += 2
+        elif c == "'":
+            end = line.find("'", i + 1)
+            if end < 0:
+                raise CommandError("syntax error: unterminated quoted string")
+            flush_buf(True)
+            segments.append((line[i + 1:end], False))
+            in_word = True
+            i = end + 1
+        elif c == '"':
+            flush_buf(True)
+            i += 1
+            while i < n and line[i] != '"':
+                if line[i] == '\\' and i + 1 < n and line[i + 1] in '"\\$`':
+                    flush_buf(True)
+                    segments.append((line[i + 1], False))
+                    i += 2
+                else:
+                    buf.append(line[i])
+                    i += 1
+            if i >= n:
+                raise CommandError("syntax error: unterminated quoted string")
+            flush_buf(True)
+            in_word = True
+            i += 1
+        else:
+            for op in OPERATORS:
+                if line.startswith(op, i):
+                    end_word()
+                    tokens.append(('op', op))
+                    i += len(op)
+                    break
+            else:
+                buf.append(c)
+                in_word = True
+                i += 1
+    end_word()
+    return tokens
+
+
+@lru_cache(maxsize=1024)
+def parse(line: str) -> Sequence:
+    """Parse a command line into a sequence of pipelines (cached by raw string)"""
+    sequence: List[Tuple[Optional[str], Pipeline]] = []
+    commands: List[SimpleCommand] = []
+    words: List[Word] = []
+    redirects: List[Tuple[str, Word]] = []
+    connector: Optional[str] = None
+    tokens = tokenize(line)
+    i = 0
+
+    def unexpected(token: str) -> CommandError:
+        return CommandError(f"syntax error near unexpected token `{token}'")
+
+    def end_command(token: str) -> None:
+        if not words:
+            raise unexpected(token)
+        commands.append(SimpleCommand(tuple(words), tuple(redirects)))
+        words.clear()
+        redirects.clear()
+
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == 'word':
+            words.append(value)
+        elif value in ('>', '>>', '<'):
+            if i + 1 >= len(tokens) or tokens[i + 1][0] != 'word':
+                raise unexpected('newline' if i + 1 >= len(tokens) else tokens[i + 1][1])
+            redirects.append((value, tokens[i + 1][1]))
+            i += 1
+        elif value == '|':
+            end_command(value)
+        elif value in ('&&', '||', ';'):
+            end_command(value)
+            sequence.append((connector, Pipeline(tuple(commands))))
+            commands.clear()
+            connector = value
+        else:
+            raise CommandError(f"{value}: background jobs are not supported")
+        i += 1
+
+    if words or redirects or (tokens and tokens[-1] == ('op', '|')):
+        end_command('newline')
+    if commands:
+        sequence.append((connector, Pipeline(tuple(commands))))
+    elif connector in ('&&', '||'):
+        raise unexpected('newline')
+    return tuple(sequence)
+
+
+def expand(word: Word, env: Dict[str, str], status: int = 0) -> str:
+    """Join a word's segments, substituting $VAR, ${VAR} and $? where allowed"""
+    out = []
+    for text, expandable in word:
+        if not expandable or '$' not in text:
+            out.append(text)
+            continue
+        i, n = 0, len(text)
+        while i < n:
+            c = text[i]
+            if c != '$' or i + 1 >= n:
+                out.append(c)
+                i += 1
+            elif text[i + 1] == '{':
+                end = text.find('}', i + 2)
+                end = n if end < 0 else end
+                out.append(env.get(text[i + 2:end], ''))
+                i = end + 1
+            elif text[i + 1] == '?':
+                out.append(str(status))
+                i += 2
+            else:
+                j = i + 1
+                while j < n and (text[j].isalnum() or text[j] == '_'):
+                    j += 1
+                if j == i + 1:
+                    out.append(c)
+                    i += 1
+                else:
+                    out.append(env.get(text[i + 1:j], ''))
+                    i = j
+    return ''.join(out)
+
+
+class _Stage:
+    """Wraps a stage's output so errors raised while streaming mark it failed"""
+
+    def __init__(self, lines: Iterable[str], errors: List[str]):
+        self.lines = lines
+        self.errors = errors
+        self.success = True
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            yield from self.lines
+        except CommandError as e:
+            self.errors.append(str(e))
+            self.success = False
+        except OSError as e:
+            self.errors.append(str(e.strerror or e))
+            self.success = False
+
+
+async def run_pipeline(pipeline: Pipeline, ctx: CommandContext) -> Tuple[List[str], bool]:
+    """Run one pipeline, returning its output lines (stdout then stderr) and status"""
+    errors: List[str] = []
+    stream: Optional[Iterable[str]] = None
+    stage: Optional[_Stage] = None
+
+    for simple in pipeline.commands:
+        argv = [expand(word, ctx.env, ctx.status) for word in simple.words]
+        stdin = stream
+        failed = False
+        try:
+            for op, target in simple.redirects:
+                if op == '<':
+                    stdin = ctx.fs.open(ctx.fs.resolve(expand(target, ctx.env, ctx.status), ctx.cwd)).lines()
+            name = argv[0].lower()
+            handler = registry.get(name)
+            if handler is None:
+                raise CommandError(f"Command not found: {name}. Type 'help' for available commands.")
+            flags, operands = handler.parse(argv[1:])
+            if handler.kind == STREAM:
+                lines: Iterable[str] = handler.handler(ctx, flags, operands, stdin)
+            elif handler.kind == ASYNC:
+                lines = iter_lines(await handler.handler(ctx, flags, operands))
+            else:
+                lines = iter_lines(handler.handler(ctx, flags, operands))
+        except CommandError as e:
+            errors.append(str(e))
+            lines, failed = (), True
+        except OSError as e:
+            errors.append(f"{argv[0]}: {e.filename}: {e.strerror}")
+            lines, failed = (), True
+        stage = _Stage(lines, errors)
+        stage.success = not failed
+        stream = stage
+
+        for op, target in simple.redirects:
+            if op in ('>', '>>'):
+                lines = list(stage)
+                # Newline-terminated like shell output, except a file's unterminated last line (cat f > g)
+                text = ''.join(line if isinstance(line, PartialLine) and i == len(lines) - 1 else line + '\n'
+                               for i, line in enumerate(lines))
+                path = ctx.fs.resolve(expand(target, ctx.env, ctx.status), ctx.cwd)
+                try:
+                    if op == '>>' and path in ctx.fs:
+                        buffer = ctx.fs.open(path).buffer
+                        if len(buffer) and buffer[len(buffer) - 1:] != b'\n':
+                            text = '\n' + text  # keep the appended lines off an unterminated last line
+                    ctx.fs.write(path, text, append=op == '>>')
+                except OSError as e:
+                    errors.append(f"{expand(target, ctx.env, ctx.status)}: {e.strerror}")
+                    stage.success = False
+                stream = ()
+
+    output = _collect(stream, ctx) if stream is not None else []
+    if ctx.truncated:
+        errors.append(f"[output truncated after {settings.MAX_OUTPUT_BYTES} bytes]")
+    return output + errors, stage.success if stage is not None else True
+
+
+def _collect(stream: Iterable[str], ctx: CommandContext) -> List[str]:
+    """Pull output lines until settings.MAX_OUTPUT_BYTES, then stop the stages"""
+    output: List[str] = []
+    budget = settings.MAX_OUTPUT_BYTES
+    for line in stream:
+        budget -= len(line) + 1
+        if budget < 0:
+            ctx.truncated = True
+            break
+        output.append(line)
+    return output
+
+
+async def run(line: str, ctx: CommandContext) -> Tuple[str, bool]:
+    """Parse and run a full command line, honouring &&, || and ;"""
+    output: List[str] = []
+    success = True
+    for connector, pipeline in parse(line):
+        if (connector == '&&' and not success) or (connector == '||' and success):
+            continue
+        lines, success = await run_pipeline(pipeline, ctx)
+        ctx.status = 0 if success else 1
+        output.extend(lines)
+    return '\n'.join(output), success
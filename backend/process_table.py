@@ -0,0 +1,332 @@
+"""
+Incremental Process Table for TerminalX
+Keeps psutil process state between scans so only dynamic counters are re-read
+
+The scan reads only what one ``oneshot()`` of the stat/status files gives
+(CPU times, ppid, status, RSS). A parent -> children index is kept in step
+with it: an entry is relinked only when its ppid changes or it exits, so the
+tree costs nothing extra per tick. Open files, threads, IO counters, memory
+maps and connections are collected by ``detail()`` for one process on request.
+
+A worker that does not scan can ``follow`` rows published by one that does.
+The rows are pulled when the table is read, and only when they changed, so
+a follower nobody asks for processes never decodes them.
+"""
+
+import heapq
+import socket
+import threading
+import time
+from typing import Callable, Dict, Any, List, Iterable, Optional, Set
+
+import psutil
+
+MEMORY_MAPS_TOP = 10  # largest mappings listed in a detail's memory map summary
+DETAIL_LIST_LIMIT = 200  # open files, threads and connections listed per detail
+
+
+class ProcessEntry:
+    """Cached state of one process, identified by (pid, create_time)"""
+
+    __slots__ = ('pid', 'create_time', 'name', 'username', 'cmdline', 'proc',
+                 'ppid', 'status', 'cpu_time', 'sampled_at', 'cpu_percent',
+                 'rss', 'memory_percent', 'generation')
+
+    def __init__(self, proc: psutil.Process, create_time: float):
+        self.pid = proc.pid
+        self.create_time = create_time
+        self.proc = proc
+        # Static attributes: read once for the lifetime of the process
+        self.name = proc.name()
+        try:
+            self.username = proc.username()
+        except (psutil.AccessDenied, KeyError):
+            self.username = 'unknown'
+        try:
+            self.cmdline = proc.cmdline()
+        except psutil.AccessDenied:
+            self.cmdline = []
+        self.ppid = 0
+        self.status = ''
+        self.cpu_time = 0.0
+        self.sampled_at = 0.0
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.memory_percent = 0.0
+        self.generation = 0
+
+    @property
+    def command(self) -> str:
+        return ' '.join(self.cmdline) if self.cmdline else self.name
+
+    def to_row(self) -> List[Any]:
+        return [self.pid, self.create_time, self.name, self.username, self.cmdline, self.ppid,
+                self.status, self.cpu_time, self.sampled_at, self.cpu_percent, self.rss, self.memory_percent]
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> 'ProcessEntry':
+        """Entry published by another worker's table; it has no psutil handle until refreshed here"""
+        entry = cls.__new__(cls)
+        (entry.pid, entry.create_time, entry.name, entry.username, entry.cmdline, entry.ppid,
+         entry.status, entry.cpu_time, entry.sampled_at, entry.cpu_percent, entry.rss,
+         entry.memory_percent) = row
+        entry.proc = None
+        entry.generation = 0
+        return entry
+
+
+class ProcessTable:
+    """Persistent process table refreshed with per-tick CPU deltas"""
+
+    def __init__(self):
+        self._entries: Dict[int, ProcessEntry] = {}
+        self._children: Dict[int, Set[int]] = {}  # ppid -> pids, as of the last refresh
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._memory_total = psutil.virtual_memory().total
+        # Returns newer published rows, or None when they have not changed
+        self._source: Optional[Callable[[], Optional[List[List[Any]]]]] = None
+
+    def follow(self, source: Optional[Callable[[], Optional[List[List[Any]]]]]) -> None:
+        """Load rows from `source` before each read instead of scanning (None: stop following)"""
+        self._source = source
+
+    def _pull(self) -> None:
+        source = self._source
+        if source is not None:
+            rows = source()
+            if rows is not None:
+                self.load(rows)
+
+    def __len__(self) -> int:
+        self._pull()
+        with self._lock:
+            return len(self._entries)
+
+    def refresh(self) -> None:
+        """Re-read dynamic counters for live processes and drop exited ones"""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            entries = self._entries
+            for pid in psutil.pids():
+                entry = entries.get(pid)
+                try:
+                    proc = entry.proc if entry is not None else None
+                    # psutil caches create_time(); is_running() re-reads it to catch pid reuse
+                    if proc is None or not proc.is_running():
+                        proc = psutil.Process(pid)
+                    with proc.oneshot():
+                        create_time = proc.create_time()
+                        if entry is None or entry.create_time != create_time:
+                            # New process, or the pid was reused by another one
+                            if entry is not None:
+                                self._unlink(entry)
+                            entry = ProcessEntry(proc, create_time)
+                            entries[pid] = entry
+                            parent = None
+                        else:
+                            parent = entry.ppid
+                            entry.proc = proc  # no-op unless the entry was loaded from rows
+                        self._update(entry, proc)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    if pid in entries:
+                        self._unlink(entries.pop(pid))
+                    continue
+                if entry.ppid != parent:
+                    if parent is not None:
+                        self._unlink(entry, parent)
+                    self._children.setdefault(entry.ppid, set()).add(pid)
+                entry.generation = generation
+            for pid in [pid for pid, e in entries.items() if e.generation != generation]:
+                self._unlink(entries.pop(pid))
+
+    def _unlink(self, entry: ProcessEntry, ppid: Optional[int] = None) -> None:
+        """Remove `entry` from its parent's (or `ppid`'s) children"""
+        ppid = entry.ppid if ppid is None else ppid
+        siblings = self._children.get(ppid)
+        if siblings is not None:
+            siblings.discard(entry.pid)
+            if not siblings:
+                del self._children[ppid]
+
+    def _update(self, entry: ProcessEntry, proc: psutil.Process) -> None:
+        now = time.time()
+        times = proc.cpu_times()
+        cpu_time = times.user + times.system
+        if entry.sampled_at:
+            elapsed = now - entry.sampled_at
+            if elapsed > 0:
+                entry.cpu_percent = max(0.0, (cpu_time - entry.cpu_time) / elapsed * 100)
+        else:
+            # First sighting: use the lifetime average instead of a bogus 0.0
+            lifetime = now - entry.create_time
+            entry.cpu_percent = cpu_time / lifetime * 100 if lifetime > 0 else 0.0
+        entry.cpu_time = cpu_time
+        entry.sampled_at = now
+        entry.ppid = proc.ppid()
+        entry.status = proc.status()
+        entry.rss = proc.memory_info().rss
+        entry.memory_percent = entry.rss / self._memory_total * 100
+
+    def rows(self) -> List[List[Any]]:
+        """Every entry as a JSON-friendly row, for publishing to other workers"""
+        with self._lock:
+            return [entry.to_row() for entry in self._entries.values()]
+
+    def load(self, rows: List[List[Any]]) -> None:
+        """Replace the table with rows published by the worker that scans"""
+        entries = {row[0]: ProcessEntry.from_row(row) for row in rows}
+        children: Dict[int, Set[int]] = {}
+        for pid, entry in entries.items():
+            children.setdefault(entry.ppid, set()).add(pid)
+        with self._lock:
+            self._entries, self._children = entries, children
+
+    def entries(self) -> List[ProcessEntry]:
+        self._pull()
+        with self._lock:
+            return list(self._entries.values())
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of processes in each psutil status as of the last refresh"""
+        counts: Dict[str, int] = {}
+        self._pull()
+        with self._lock:
+            for entry in self._entries.values():
+                counts[entry.status] = counts.get(entry.status, 0) + 1
+        return counts
+
+    def get(self, pid: int) -> Optional[ProcessEntry]:
+        self._pull()
+        with self._lock:
+            return self._entries.get(pid)
+
+    def top(self, limit: int, key: str = 'cpu_percent') -> List[ProcessEntry]:
+        """Top `limit` entries by `key`, via a bounded heap rather than a full sort"""
+        self._pull()
+        with self._lock:
+            values: Iterable[ProcessEntry] = self._entries.values()
+            return heapq.nlargest(limit, values, key=lambda e: getattr(e, key))
+
+    def tree(self, root: Optional[int] = None, depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Nested process nodes under `root` (default: every process whose parent is not listed)
+
+        Built from the children index, so only the returned nodes are visited.
+        A node cut off by `depth` reports its number of children but no list.
+        """
+        self._pull()
+        with self._lock:
+            entries, children = self._entries, self._children
+            if root is None:
+                roots = sorted(pid for pid, e in entries.items() if e.ppid not in entries or e.ppid == pid)
+            elif root in entries:
+                roots = [root]
+            else:
+                return []
+
+            def node(pid: int, level: int) -> Dict[str, Any]:
+                entry = entries[pid]
+                kids = sorted(child for child in children.get(pid, ()) if child != pid and child in entries)
+                data = {'pid': pid, 'ppid': entry.ppid, 'name': entry.name, 'username': entry.username,
+                        'status': entry.status, 'cpu_percent': round(entry.cpu_percent, 1),
+                        'memory_percent': round(entry.memory_percent, 1), 'command': entry.command}
+                if depth is not None and level >= depth:
+                    data['child_count'] = len(kids)
+                else:
+                    data['children'] = [node(child, level + 1) for child in kids]
+                return data
+
+            return [node(pid, 0) for pid in roots]
+
+    def detail(self, pid: int) -> Optional[Dict[str, Any]]:
+        """Expensive per-process fields, read for one process on demand (None if it is gone)
+
+        Everything is read inside one ``oneshot()``. A field the server may not
+        read (another user's process) is None and named in ``denied``.
+        """
+        entry = self.get(pid)
+        try:
+            proc = entry.proc if entry is not None else None
+            if proc is None or not proc.is_running():
+                proc = psutil.Process(pid)  # the cached handle's create_time() would hide pid reuse
+            with proc.oneshot():
+                create_time = proc.create_time()
+                if entry is not None and entry.create_time != create_time:
+                    entry = None  # pid reused since the last refresh
+                denied: List[str] = []
+
+                def read(field: str, reader: Callable[[], Any]) -> Any:
+                    try:
+                        return reader()
+                    except (psutil.AccessDenied, psutil.ZombieProcess):
+                        denied.append(field)
+                        return None
+
+                times = proc.cpu_times()
+                memory = proc.memory_info()
+                cmdline = read('cmdline', proc.cmdline)
+                data = {
+                    'pid': pid,
+                    'ppid': proc.ppid(),
+                    'name': proc.name(),
+                    'username': entry.username if entry is not None else read('username', proc.username),
+                    'status': proc.status(),
+                    'create_time': create_time,
+                    'cmdline': cmdline,
+                    'command': ' '.join(cmdline) if cmdline else proc.name(),
+                    'exe': read('exe', proc.exe),
+                    'cwd': read('cwd', proc.cwd),
+                    'nice': read('nice', proc.nice),
+                    'cpu_percent': round(entry.cpu_percent, 1) if entry is not None else None,
+                    'cpu_times': {'user': times.user, 'system': times.system},
+                    'memory_info': memory._asdict(),
+                    'memory_percent': round(memory.rss / self._memory_total * 100, 1),
+                    'num_threads': read('num_threads', proc.num_threads),
+                    'threads': read('threads', lambda: [
+                        thread._asdict() for thread in proc.threads()[:DETAIL_LIST_LIMIT]]),
+                    'num_fds': read('num_fds', proc.num_fds) if hasattr(proc, 'num_fds') else None,
+                    'open_files': read('open_files', lambda: [
+                        {'path': f.path, 'fd': f.fd} for f in proc.open_files()[:DETAIL_LIST_LIMIT]]),
+                    'io_counters': read('io_counters', lambda: proc.io_counters()._asdict())
+                    if hasattr(proc, 'io_counters') else None,
+                    'memory_maps': read('memory_maps', lambda: _maps_summary(proc.memory_maps(grouped=True)))
+                    if hasattr(proc, 'memory_maps') else None,
+                    'connections': read('connections', lambda: [
+                        _connection(conn) for conn in _connections(proc)[:DETAIL_LIST_LIMIT]]),
+                }
+        except psutil.NoSuchProcess:
+            return None
+        with self._lock:
+            data['children'] = sorted(self._children.get(pid, ()))
+        data['denied'] = denied
+        return data
+
+
+def _connections(proc: psutil.Process) -> list:
+    # Process.connections() was renamed net_connections() in psutil 6.0
+    reader = getattr(proc, 'net_connections', None) or proc.connections
+    return reader(kind='inet')
+
+
+def _connection(conn: Any) -> Dict[str, Any]:
+    return {'fd': conn.fd, 'type': 'tcp' if conn.type == socket.SOCK_STREAM else 'udp',
+            'local': f'{conn.laddr.ip}:{conn.laddr.port}' if conn.laddr else None,
+            'remote': f'{conn.raddr.ip}:{conn.raddr.port}' if conn.raddr else None,
+            'status': conn.status}
+
+
+def _maps_summary(maps: list) -> Dict[str, Any]:
+    """Totals over grouped memory maps and the largest mappings by RSS"""
+    fields = ('rss', 'pss', 'private_clean', 'private_dirty', 'shared_clean', 'shared_dirty', 'swap')
+    totals = {field: sum(getattr(m, field, 0) for m in maps) for field in fields}
+    largest = heapq.nlargest(MEMORY_MAPS_TOP, maps, key=lambda m: m.rss)
+    return {
+        'count': len(maps),
+        'rss': totals['rss'],
+        'pss': totals['pss'],
+        'private': totals['private_clean'] + totals['private_dirty'],
+        'shared': totals['shared_clean'] + totals['shared_dirty'],
+        'swap': totals['swap'],
+        'largest': [{'path': m.path or '[anon]', 'rss': m.rss} for m in largest],
+    }
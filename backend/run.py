@@ -2,22 +2,99 @@
 """
 TerminalX Backend Server
 A FastAPI backend for the TerminalX web application
+
+DEBUG=true runs one process with auto-reload. Otherwise the server starts
+WORKERS processes (default: one per CPU this process may use, after
+affinity and any cgroup CPU quota, so a container on a fractional-CPU plan
+gets one worker rather than one per host core). With more than one worker,
+this process creates the shared metrics segment the workers attach to, so
+only one of them samples psutil, and sessions default to a shared SQLite
+store so any worker can serve any session.
 """
 
+import math
+import os
+import tempfile
+
 import uvicorn
-from main import app
 from config import settings
+from shared_metrics import SharedSnapshot
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, capped by a cgroup v2 or v1 CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def serve_workers(workers: int) -> None:
+    shared = SharedSnapshot.create(settings.METRICS_SHM_SIZE)
+    lock_path = os.path.join(tempfile.gettempdir(), f"terminalx-{shared.name.lstrip('/')}.lock")
+    # Workers are fresh processes that read their settings from the environment
+    os.environ["METRICS_SHM"] = shared.name
+    os.environ["SAMPLER_LOCK"] = lock_path
+    os.environ.setdefault("SESSION_DB", os.path.join(tempfile.gettempdir(), "terminalx-sessions.db"))
+    temporary = [lock_path]
+    if "ALERT_RULES_FILE" not in os.environ:
+        # Alert rule changes then last as long as the workers
+        rules_path = os.path.join(tempfile.gettempdir(), f"terminalx-{shared.name.lstrip('/')}-alerts.json")
+        os.environ["ALERT_RULES_FILE"] = rules_path
+        temporary += [rules_path, rules_path + ".lock"]
+    try:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=workers,
+            log_level="warning"
+        )
+    finally:
+        shared.close()
+        shared.unlink()
+        for path in temporary:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
 
 if __name__ == "__main__":
-    print(f"�� Starting {settings.PROJECT_NAME} v{settings.VERSION}")
+    workers = 1 if settings.DEBUG else settings.WORKERS or available_cpus()
+
+    print(f"🚀 Starting {settings.PROJECT_NAME} v{settings.VERSION}")
     print(f"📡 Server will be available at: http://{settings.HOST}:{settings.PORT}")
     print(f"📚 API Documentation: http://{settings.HOST}:{settings.PORT}/docs")
     print(f"🔧 Debug mode: {'ON' if settings.DEBUG else 'OFF'}")
-    
-    uvicorn.run(
-        "main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level="info" if settings.DEBUG else "warning"
-    )
+    print(f"👷 Workers: {workers}")
+
+    if workers > 1:
+        serve_workers(workers)
+    else:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            log_level="info" if settings.DEBUG else "warning"
+        )
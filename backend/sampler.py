@@ -0,0 +1,197 @@
+"""
+Background Metrics Sampler for TerminalX
+Periodically reads system metrics off the event loop into a shared snapshot
+
+Each metric group is read concurrently on the monitor executor with a
+timeout. A group that times out keeps its previous value and is listed under
+the snapshot's ``stale`` key, so one slow /proc read only delays itself.
+
+With a shared snapshot segment (multi-worker mode) only the worker holding
+the sampler lock reads psutil; the others follow the segment. The owner also
+publishes its process table there (if it fits), so followers answer process
+listings from it instead of scanning /proc themselves, decoding it only
+when a listing is asked for.
+
+``start`` returns at once and the first sample is taken in the background,
+so server startup (and the first health check) never waits on psutil.
+Until it lands, ``latest`` raises ``SnapshotUnavailable`` at once; readers
+neither wait for it nor take a sample inline on the event loop.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from executor import MonitorExecutor, monitor_executor
+from shared_metrics import SamplerLock, SharedSnapshot
+from system_monitor import SystemMonitor, system_monitor
+from config import settings
+
+
+class SnapshotUnavailable(LookupError):
+    """No metrics sample has been taken yet"""
+
+
+class MetricsSampler:
+    """Samples SystemMonitor at a fixed interval and keeps the latest snapshot"""
+
+    def __init__(self, monitor: SystemMonitor, executor: MonitorExecutor, interval: float = 1.0,
+                 shared: Optional[SharedSnapshot] = None, lock: Optional[SamplerLock] = None):
+        self.monitor = monitor
+        self.executor = executor
+        self.interval = interval
+        self.shared = shared
+        self.lock = lock
+        self._sequence = 0  # last shared snapshot sequence seen by a follower
+        self._table_sequence = 0  # sequence of the last process table a follower loaded
+        self._table_shared = False  # a follower received the owner's process table
+        self._publish_lock = threading.Lock()
+        self._published = 0.0  # timestamp of the newest snapshot published
+        self.last_error: Optional[str] = None
+        # (snapshot, monotonic time it was taken), swapped as a single reference
+        self._latest: Optional[Tuple[Dict[str, Any], float]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``listener(snapshot)`` on a monitor worker thread after every tick"""
+        self._listeners.append(listener)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def owner(self) -> bool:
+        """Whether this process reads psutil (always, unless following a shared segment)"""
+        return self.shared is None or self.lock is None or self.lock.held
+
+    @property
+    def sampling(self) -> bool:
+        """Running, and the process table is refreshed every tick (here or from the owner)"""
+        return self.running and self._latest is not None and (self.owner or self._table_shared)
+
+    async def start(self) -> None:
+        """Start the loop; it primes the CPU counters and takes the first sample"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def _prime(self) -> None:
+        self.monitor.process_table.follow(None)  # scanning here from now on
+        await self.executor.run(self.monitor.prime_cpu_counters)
+        # Probe the static platform info now so /api/system/info never pays for it
+        await self.executor.run(lambda: self.monitor.system_info, key='system_info')
+        await asyncio.sleep(min(self.interval, 0.1))
+        await self._sample_groups()
+
+    async def stop(self) -> None:
+        """Cancel the sampling loop"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.lock is not None:
+            self.lock.release()
+
+    async def _run(self) -> None:
+        try:
+            if self.shared is not None and self.lock is not None and not self.lock.try_acquire():
+                await self._follow()
+            else:
+                await self._prime()
+        except Exception as e:
+            self.last_error = str(e)
+        while True:
+            try:
+                if self.owner:
+                    await asyncio.sleep(self.interval)
+                    await self._sample_groups()
+                else:
+                    await asyncio.sleep(min(self.interval / 4, 0.25))
+                    if self.lock.try_acquire():
+                        await self._prime()  # the previous owner went away
+                    else:
+                        await self._follow()
+            except Exception as e:
+                self.last_error = str(e)
+
+    async def _follow(self) -> None:
+        """Pick up a newer snapshot from the shared segment, if one was published"""
+        if self.shared.sequence() == self._sequence:
+            return
+        published = self.shared.read()
+        if published is None:
+            return
+        self._sequence, snapshot = published
+        # Keep ages measured from when the owner took the sample
+        self._set_latest(snapshot, time.monotonic() - max(0.0, time.time() - snapshot['timestamp']))
+        self._table_shared = self.shared.table_sequence() != 0
+        self.monitor.process_table.follow(self._shared_rows if self._table_shared else None)
+        await self._publish_async(snapshot)
+
+    def _shared_rows(self) -> Optional[List[List[Any]]]:
+        """Process table rows the owner published since the last load, or None"""
+        published = self.shared.read_table(self._table_sequence)
+        if published is None:
+            return None
+        self._table_sequence, rows = published
+        return rows
+
+    async def _sample_groups(self) -> Dict[str, Any]:
+        results, missing = await self.executor.gather(self.monitor.readers())
+        previous = self._latest[0] if self._latest is not None else {}
+        snapshot: Dict[str, Any] = {'timestamp': time.time(), **results}
+        if 'processes' in results:
+            snapshot['process_states'] = await self.executor.run(self.monitor.process_table.status_counts)
+        elif 'process_states' in previous:
+            snapshot['process_states'] = previous['process_states']
+        for group in missing:
+            if group in previous:
+                snapshot[group] = previous[group]
+        if missing:
+            snapshot['stale'] = missing
+        self._set_latest(snapshot, time.monotonic())
+        self.last_error = None
+        await self._publish_async(snapshot)
+        return snapshot
+
+    def _set_latest(self, snapshot: Dict[str, Any], taken_at: float) -> None:
+        self._latest = (snapshot, taken_at)
+
+    async def _publish_async(self, snapshot: Dict[str, Any]) -> None:
+        # Keyed per snapshot: joining an in-flight publish would drop this newer one
+        await self.executor.run(self._publish, snapshot, key=('publish', snapshot['timestamp']))
+
+    def _publish(self, snapshot: Dict[str, Any]) -> None:
+        with self._publish_lock:
+            if snapshot['timestamp'] < self._published:
+                return  # a newer snapshot got here first
+            self._published = snapshot['timestamp']
+            if self.shared is not None and self.owner:
+                self.shared.write(snapshot, self.monitor.process_table.rows())
+            for listener in self._listeners:
+                listener(snapshot)
+
+    def latest(self) -> Tuple[Dict[str, Any], float]:
+        """Return the latest snapshot and its age in seconds; raise SnapshotUnavailable before the first"""
+        latest = self._latest
+        if latest is None:
+            raise SnapshotUnavailable("No metrics sample has been taken yet")
+        snapshot, taken_at = latest
+        return snapshot, round(time.monotonic() - taken_at, 3)
+
+
+# Global metrics sampler instance
+metrics_sampler = MetricsSampler(
+    system_monitor,
+    monitor_executor,
+    interval=settings.SAMPLER_INTERVAL,
+    shared=SharedSnapshot.attach(settings.METRICS_SHM) if settings.METRICS_SHM else None,
+    lock=SamplerLock(settings.SAMPLER_LOCK) if settings.METRICS_SHM else None
+)
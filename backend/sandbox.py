@@ -0,0 +1,242 @@
+"""
+Sandboxed Command Execution for TerminalX
+Opt-in "real" mode running allowlisted binaries in asyncio subprocesses
+
+Each command runs without a shell, in a per-session working directory, with
+CPU time, address space and file size rlimits, a wall-clock timeout and an
+output byte cap. Output is yielded as it is produced so callers can stream it.
+
+Options that make an allowlisted binary run another program or write a file
+(``sort --compress-program``, ``sort -o``, ``find -exec``, uniq's OUTPUT
+operand) are rejected. Every path named in the arguments, including option
+values such as ``grep -f FILE``, must resolve inside the session's working
+directory, so real mode neither reads nor writes other host files; an
+argument that merely looks like such a path (``grep /etc x``) is rejected
+too. The child only sees the environment variables in ``ENV_ALLOWLIST``. The rlimits are applied by
+exec'ing through ``prlimit(1)`` rather than a ``preexec_fn``, which is not
+safe to run in a process with other threads.
+"""
+
+import asyncio
+import os
+import shlex
+import shutil
+import signal
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+CHUNK_SIZE = 4096
+# Session variables passed through to the child; everything else (LD_*, BASH_ENV, ...) is dropped
+ENV_ALLOWLIST = frozenset({
+    'LANG', 'LC_ALL', 'LC_COLLATE', 'LC_CTYPE', 'LC_MESSAGES', 'LC_NUMERIC', 'LC_TIME',
+    'TZ', 'TERM', 'COLUMNS', 'LINES', 'USER', 'LOGNAME',
+})
+# Per-binary options that execute other programs or write files. Long options
+# also match their abbreviations, which getopt_long accepts (``--compress``
+# for sort), and one-letter options also match inside a bundle (``-ro``) or
+# with an attached value (``-oFILE``).
+DENIED_OPTIONS = {
+    'sort': ('--compress-program', '-o', '--output'),
+    'find': ('-exec', '-execdir', '-ok', '-okdir', '-delete', '-fprint', '-fprint0', '-fprintf', '-fls'),
+    'xargs': ('*',),  # runs its operands as a command
+    'env': ('*',),
+}
+# Binaries that write their last operand when given this many (``uniq IN OUT``),
+# with the options that take a separate value, so values are not counted
+OUTPUT_OPERANDS = {
+    'uniq': (2, ('-f', '-s', '-w', '--skip-fields', '--skip-chars', '--check-chars')),
+}
+
+
+class SandboxError(Exception):
+    """Command rejected before it was started"""
+
+
+class SandboxRunner:
+    """Runs allowlisted commands with resource limits and streams their output"""
+
+    def __init__(self, root: str, allowlist: Iterable[str], timeout: float = 10.0,
+                 cpu_seconds: int = 5, memory_mb: int = 256, max_output: int = 1024 * 1024,
+                 max_processes: int = 8):
+        self.root = root
+        self.allowlist = set(allowlist)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self._slots = asyncio.Semaphore(max_processes)
+        self._prlimit = shutil.which('prlimit')
+
+    def workdir(self, session_id: str) -> str:
+        """Private working directory for a session, created on first use"""
+        path = os.path.join(self.root, session_id)
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return path
+
+    def cleanup(self, session_id: str) -> None:
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+    def parse(self, command: str, cwd: Optional[str] = None) -> Tuple[str, List[str]]:
+        """Split a command line and resolve its allowlisted binary
+
+        With `cwd`, every path in the arguments must resolve inside it.
+        """
+        try:
+            argv = shlex.split(command)
+        except ValueError as e:
+            raise SandboxError(f"parse error: {e}")
+        if not argv:
+            raise SandboxError("empty command")
+        if "/" in argv[0] or argv[0] not in self.allowlist:
+            raise SandboxError(f"{argv[0]}: command not allowed in real mode")
+        denied = DENIED_OPTIONS.get(argv[0], ())
+        for arg in argv[1:]:
+            if _denied(arg, denied):
+                raise SandboxError(f"{argv[0]}: option '{arg}' is not allowed in real mode")
+        if argv[0] in OUTPUT_OPERANDS:
+            limit, with_value = OUTPUT_OPERANDS[argv[0]]
+            if len(_operands(argv[1:], with_value)) >= limit:
+                raise SandboxError(f"{argv[0]}: an output file operand is not allowed in real mode")
+        if cwd is not None:
+            for arg in argv[1:]:
+                if not _inside(arg, cwd):
+                    raise SandboxError(f"{argv[0]}: '{arg}' names a path outside the session directory")
+        binary = shutil.which(argv[0])
+        if binary is None:
+            raise SandboxError(f"{argv[0]}: command not found")
+        return binary, argv
+
+    def _limits(self) -> List[Tuple[int, int]]:
+        """(resource, limit) pairs applied to every child"""
+        if resource is None:
+            return []
+        return [(resource.RLIMIT_CPU, self.cpu_seconds),
+                (resource.RLIMIT_AS, self.memory_mb * 1024 * 1024),
+                (resource.RLIMIT_FSIZE, self.max_output),
+                (resource.RLIMIT_CORE, 0)]
+
+    def _command(self, binary: str, argv: List[str]) -> List[str]:
+        """argv to exec, wrapped in prlimit when it is installed"""
+        if self._prlimit is None:
+            return [binary] + argv[1:]
+        return [self._prlimit, f'--cpu={self.cpu_seconds}', f'--as={self.memory_mb * 1024 * 1024}',
+                f'--fsize={self.max_output}', '--core=0', '--', binary] + argv[1:]
+
+    async def run(self, session_id: str, command: str,
+                  env: Optional[Dict[str, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``output`` events while the command runs, then one ``exit`` event"""
+        cwd = self.workdir(session_id)
+        binary, argv = self.parse(command, cwd)
+        child_env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": cwd, "LANG": "C.UTF-8"}
+        if env:
+            child_env.update({k: v for k, v in env.items() if k in ENV_ALLOWLIST})
+
+        async with self._slots:
+            proc = await asyncio.create_subprocess_exec(
+                *self._command(binary, argv),
+                cwd=cwd,
+                env=child_env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True
+            )
+            if self._prlimit is None and hasattr(resource, 'prlimit'):
+                # No prlimit(1): limit the child right after it started
+                for limit, value in self._limits():
+                    try:
+                        resource.prlimit(proc.pid, limit, (value, value))
+                    except (ProcessLookupError, PermissionError):
+                        pass
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            sent = 0
+            timed_out = truncated = False
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        timed_out = True
+                        break
+                    try:
+                        chunk = await asyncio.wait_for(proc.stdout.read(CHUNK_SIZE), remaining)
+                    except asyncio.TimeoutError:
+                        timed_out = True
+                        break
+                    if not chunk:
+                        try:
+                            await asyncio.wait_for(proc.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            timed_out = True
+                        break
+                    if sent + len(chunk) > self.max_output:
+                        chunk = chunk[:self.max_output - sent]
+                        truncated = True
+                    sent += len(chunk)
+                    if chunk:
+                        yield {"type": "output", "data": chunk.decode("utf-8", errors="replace")}
+                    if truncated:
+                        break
+            finally:
+                # Also reached when the client disconnects and the stream is closed
+                if proc.returncode is None:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                # Drain the pipe as well: wait() alone never returns while a
+                # paused stdout transport still holds unread output
+                await proc.communicate()
+                code = proc.returncode
+            yield {"type": "exit", "code": code, "timed_out": timed_out,
+                   "truncated": truncated, "bytes": sent}
+
+
+def _denied(arg: str, denied: Tuple[str, ...]) -> bool:
+    if '*' in denied:
+        return True
+    if arg.startswith('--') and len(arg) > 2:
+        name = arg.partition('=')[0]
+        return any(option.startswith(name) for option in denied if option.startswith('--'))
+    if arg.startswith('-') and any(len(option) == 2 and option[1] in arg[1:] for option in denied):
+        return True
+    return arg in denied
+
+
+def _operands(args: List[str], with_value: Tuple[str, ...]) -> List[str]:
+    """Non-option arguments, skipping the values of options in `with_value`"""
+    operands = []
+    args = iter(args)
+    for arg in args:
+        if arg == '--':
+            operands.extend(args)
+        elif arg.startswith('--') and '=' not in arg:
+            if any(option.startswith(arg) for option in with_value if option.startswith('--')):
+                next(args, None)
+        elif arg.startswith('-') and len(arg) > 1:
+            if f'-{arg[-1]}' in with_value and not any(f'-{c}' in with_value for c in arg[1:-1]):
+                next(args, None)  # the last letter of a bundle takes the next argument
+        else:
+            operands.append(arg)
+    return operands
+
+
+def _inside(arg: str, cwd: str) -> bool:
+    """Whether every path `arg` may name resolves inside `cwd`
+
+    Options can carry a path after ``=`` or attached to a letter (``-f/etc/x``,
+    ``-if../x``), so each suffix of an option is checked as well.
+    """
+    candidates = [arg[i:] for i in range(1, len(arg))] if arg.startswith('-') else [arg]
+    root = os.path.realpath(cwd)
+    for candidate in candidates:
+        if '/' not in candidate and candidate != '..':
+            continue
+        path = os.path.realpath(os.path.join(root, candidate))
+        if path != root and not path.startswith(root + os.sep):
+            return False
+    return True
@@ -0,0 +1,246 @@
+"""
+Terminal Session Management for TerminalX
+Per-session working directory, environment and history with LRU/TTL eviction
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+from history import HistoryLog
+from vfs import OverlayFileSystem
+
+DEFAULT_ENV = {
+    'HOME': '/home/user',
+    'USER': 'user',
+    'SHELL': '/bin/bash',
+    'PATH': '/usr/local/bin:/usr/bin:/bin'
+}
+
+
+class Session:
+    """State of one terminal session"""
+
+    __slots__ = ('session_id', 'cwd', 'env', 'history', 'last_used', 'fs')
+
+    def __init__(self, session_id: str, cwd: str = '/home/user',
+                 env: Optional[Dict[str, str]] = None,
+                 last_used: Optional[float] = None):
+        self.session_id = session_id
+        self.cwd = cwd
+        self.env = dict(DEFAULT_ENV) if env is None else env
+        self.last_used = last_used if last_used is not None else time.time()
+        # Private copy-on-write view of the shared file system (not persisted)
+        self.fs: Optional[OverlayFileSystem] = None
+        # Command log; persisted in its own file rather than with the session
+        self.history: Optional[HistoryLog] = None
+
+    def record(self, command: str) -> None:
+        """Append a command to the session's history log"""
+        if self.history is not None and command.strip():
+            self.history.append(command)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'cwd': self.cwd,
+            'env': self.env,
+            'last_used': self.last_used
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Session':
+        return cls(data['session_id'], data['cwd'], data['env'], last_used=data['last_used'])
+
+
+class SessionStore(ABC):
+    """Backing store interface so sessions can be shared across workers
+
+    Methods may block (disk, network); SessionManager calls them on a thread.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Session]:
+        ...
+
+    @abstractmethod
+    def save(self, session: Session) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float) -> None:
+        ...
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a local SQLite file, safe to share between processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)'
+            )
+
+    def _connection(self) -> 'sqlite3.Connection':
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3  # deferred: only needed when SESSION_DB is set
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Optional[Session]:
+        row = self._connection().execute(
+            'SELECT data FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return Session.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, session: Session) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, data, last_used) VALUES (?, ?, ?)',
+                (session.session_id, json.dumps(session.to_dict()), session.last_used)
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def purge(self, older_than: float) -> None:
+        with self._connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE last_used < ?', (older_than,))
+
+
+class SessionManager:
+    """O(1) session lookup with LRU eviction, idle TTL and an optional store
+
+    The in-memory table is only touched from the event loop; store calls run
+    on a worker thread so a slow disk never stalls other requests.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600,
+                 store: Optional[SessionStore] = None,
+                 fs_factory: Optional[Callable[[], OverlayFileSystem]] = None,
+                 history_factory: Optional[Callable[[str], HistoryLog]] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.store = store
+        self.fs_factory = fs_factory
+        self.history_factory = history_factory
+        self.on_evict = on_evict  # called with the id of a session that is gone for good
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def session_ids(self) -> List[str]:
+        return list(self._sessions)
+
+    async def _call_store(self, method: Callable, *args) -> Any:
+        return await asyncio.to_thread(method, *args)
+
+    def _evict(self, now: float) -> List[str]:
+        """Drop expired and over-capacity sessions; returns the ids that are gone for good"""
+        # OrderedDict is kept in LRU order, so expired sessions sit at the front
+        sessions = self._sessions
+        gone = []
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if len(sessions) <= self.max_sessions and now - oldest.last_used < self.ttl:
+                break
+            sessions.popitem(last=False)
+            # Without a store an evicted session cannot come back; with one it
+            # is only gone once it expires
+            if self._discard(oldest, gone=self.store is None or now - oldest.last_used >= self.ttl):
+                gone.append(oldest.session_id)
+        return gone
+
+    def _discard(self, session: Session, gone: bool) -> bool:
+        """Release a session dropped from memory, and its resources if it is `gone`"""
+        if session.history is not None:
+            if gone:
+                session.history.delete()
+            else:
+                session.history.close()
+        if gone and self.on_evict is not None:
+            self.on_evict(session.session_id)
+        return gone
+
+    def _attach(self, session: Session) -> None:
+        if session.fs is None and self.fs_factory is not None:
+            session.fs = self.fs_factory()
+        if session.history is None and self.history_factory is not None:
+            session.history = self.history_factory(session.session_id)
+
+    async def get(self, session_id: Optional[str]) -> Optional[Session]:
+        """Look up a live session, or None if unknown or expired"""
+        if not session_id:
+            return None
+        if self.store is not None:
+            # Another worker may have advanced this session; the store wins
+            session = await self._call_store(self.store.load, session_id)
+            cached = self._sessions.get(session_id)
+            if session is not None and cached is not None:
+                session.fs = cached.fs
+                session.history = cached.history
+        else:
+            session = self._sessions.get(session_id)
+        now = time.time()
+        if session is None or now - session.last_used >= self.ttl:
+            expired = self._sessions.pop(session_id, None)
+            if expired is not None:
+                self._discard(expired, gone=True)
+            if session is not None and self.store is not None:
+                await self._call_store(self.store.delete, session_id)
+            return None
+        session.last_used = now
+        self._attach(session)
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def create(self, cwd: str = '/home/user') -> Session:
+        now = time.time()
+        session = Session(secrets.token_urlsafe(16), cwd=cwd, last_used=now)
+        self._attach(session)
+        self._sessions[session.session_id] = session
+        gone = self._evict(now)
+        if self.store is not None:
+            def persist():
+                for session_id in gone:
+                    self.store.delete(session_id)
+                self.store.purge(now - self.ttl)
+                self.store.save(session)
+            await self._call_store(persist)
+        return session
+
+    async def get_or_create(self, session_id: Optional[str]) -> Session:
+        return await self.get(session_id) or await self.create()
+
+    async def save(self, session: Session) -> None:
+        """Persist a session after it changed (no-op without a store)"""
+        if self.store is not None:
+            await self._call_store(self.store.save, session)
+
+    async def delete(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None and session.history is not None:
+            session.history.delete()
+        if self.store is not None:
+            await self._call_store(self.store.delete, session_id)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
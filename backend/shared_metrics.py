@@ -0,0 +1,240 @@
+"""
+Shared Metrics Snapshot for TerminalX
+Publishes sampler snapshots to other worker processes through shared memory
+
+Layout of the segment, all little-endian:
+
+    header     uint64 sequence, uint64 rest length,
+               uint64 table sequence, uint64 table length
+    numeric    the NUMERIC_FIELDS of the snapshot, fixed struct layout
+    rest       JSON of the snapshot without those fields (top processes,
+               per-core percentages, strings, ...)
+    table      JSON rows of the owner's process table, if they fit
+
+The writer follows the seqlock protocol: it makes the sequence odd, writes,
+then makes it even again. A reader that sees an odd sequence, or a different
+one after reading, retries. Readers poll only the sequence number; on a
+change, the numeric groups are unpacked straight from the segment and only
+the small rest is copied and decoded. The process table is decoded by
+``read_table`` alone, when a follower is asked for processes and the table's
+sequence has moved, so its cost does not grow with ticks or workers.
+
+Exactly one worker samples: whoever holds an exclusive ``flock`` on the
+sampler lock file. The others follow the segment and retry the lock, so if
+the owner dies another worker takes over.
+"""
+
+import json
+import math
+import os
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+SEQUENCE = struct.Struct('<Q')
+HEADER = struct.Struct('<QQQQ')
+HEADER_SIZE = HEADER.size
+READ_RETRIES = 100
+INT_MISSING = -2 ** 63
+
+# Snapshot leaves kept in the fixed layout, as (path, struct code); 'd' is a
+# float (NaN when absent), 'q' an int (INT_MISSING when absent). A leaf that
+# is absent or not a number stays in the JSON rest instead.
+NUMERIC_FIELDS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (('timestamp',), 'd'),
+    (('cpu', 'cpu_count_physical'), 'q'),
+    (('cpu', 'cpu_count_logical'), 'q'),
+    (('cpu', 'cpu_percent_average'), 'd'),
+    *((('cpu', 'cpu_frequency', key), 'd') for key in ('current', 'min', 'max')),
+    *((('cpu', 'cpu_times', key), 'd') for key in (
+        'user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice')),
+    *((('memory', 'virtual_memory', key), 'q') for key in (
+        'total', 'available', 'used', 'free', 'cached', 'buffers')),
+    (('memory', 'virtual_memory', 'percent'), 'd'),
+    *((('memory', 'swap_memory', key), 'q') for key in ('total', 'used', 'free')),
+    (('memory', 'swap_memory', 'percent'), 'd'),
+    *((('disk', 'disk_usage', key), 'q') for key in ('total', 'used', 'free')),
+    (('disk', 'disk_usage', 'percent'), 'd'),
+    *((('disk', 'disk_io', key), 'q') for key in ('read_count', 'write_count', 'read_bytes', 'write_bytes')),
+    *((('network', 'network_io', key), 'q') for key in (
+        'bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')),
+    (('network', 'active_connections'), 'q'),
+    (('uptime', 'uptime_seconds'), 'd'),
+)
+NUMERIC = struct.Struct('<' + ''.join(code for _, code in NUMERIC_FIELDS))
+DATA_OFFSET = HEADER_SIZE + NUMERIC.size
+
+
+def split_numeric(snapshot: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+    """(NUMERIC_FIELDS values, the snapshot without them); `snapshot` is not modified"""
+    rest = dict(snapshot)
+    copied = {()}  # paths of the dicts in `rest` that are copies
+    values: List[Any] = []
+    for path, code in NUMERIC_FIELDS:
+        parent = rest
+        for depth, key in enumerate(path[:-1], 1):
+            child = parent.get(key)
+            if not isinstance(child, dict):
+                parent = None
+                break
+            if path[:depth] not in copied:
+                child = parent[key] = dict(child)
+                copied.add(path[:depth])
+            parent = child
+        value = parent.get(path[-1]) if parent is not None else None
+        if code == 'q' and type(value) is int and value != INT_MISSING:
+            values.append(value)
+        elif code == 'd' and type(value) in (int, float):
+            values.append(float(value))
+        else:
+            values.append(INT_MISSING if code == 'q' else math.nan)
+            continue
+        del parent[path[-1]]
+    return values, rest
+
+
+def join_numeric(values: Tuple[Any, ...], rest: Dict[str, Any]) -> Dict[str, Any]:
+    """Put unpacked NUMERIC_FIELDS values back into `rest`"""
+    for (path, code), value in zip(NUMERIC_FIELDS, values):
+        missing = value == INT_MISSING if code == 'q' else math.isnan(value)
+        if missing:
+            continue
+        parent = rest
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        parent[path[-1]] = value
+    return rest
+
+
+class SharedSnapshot:
+    """Single-writer, multi-reader snapshot slot in a shared memory segment"""
+
+    def __init__(self, shm: 'shared_memory.SharedMemory'):
+        self.shm = shm
+        self.capacity = shm.size - DATA_OFFSET  # bytes for the rest and the process table
+
+    @classmethod
+    def create(cls, size: int) -> 'SharedSnapshot':
+        from multiprocessing import shared_memory  # deferred: single-process servers never need it
+        shm = shared_memory.SharedMemory(create=True, size=size + DATA_OFFSET)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedSnapshot':
+        # Workers spawned by run.py share its resource tracker, so this
+        # attach does not make the segment go away when a worker exits
+        from multiprocessing import shared_memory
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def sequence(self) -> int:
+        """Current sequence number; 0 until the first write, odd while writing"""
+        return SEQUENCE.unpack_from(self.shm.buf, 0)[0]
+
+    def table_sequence(self) -> int:
+        """Sequence of the write that published the current process table; 0 if there is none"""
+        return SEQUENCE.unpack_from(self.shm.buf, 16)[0]
+
+    def write(self, snapshot: Dict[str, Any], rows: Optional[List[List[Any]]] = None) -> bool:
+        """Publish `snapshot` and, if they fit, the process table `rows`; return whether they did"""
+        values, rest = split_numeric(snapshot)
+        payload = json.dumps(rest, separators=(',', ':')).encode()
+        if len(payload) > self.capacity:
+            raise ValueError(f"snapshot of {len(payload)} bytes exceeds shared segment of {self.capacity}")
+        table = json.dumps(rows, separators=(',', ':')).encode() if rows is not None else b''
+        # Too big for the segment: followers fall back to their own scans
+        fits = rows is not None and len(payload) + len(table) <= self.capacity
+        buf = self.shm.buf
+        sequence = self.sequence()
+        SEQUENCE.pack_into(buf, 0, sequence + 1)
+        HEADER.pack_into(buf, 0, sequence + 1, len(payload),
+                         sequence + 2 if fits else 0, len(table) if fits else 0)
+        NUMERIC.pack_into(buf, HEADER_SIZE, *values)
+        buf[DATA_OFFSET:DATA_OFFSET + len(payload)] = payload
+        if fits:
+            start = DATA_OFFSET + len(payload)
+            buf[start:start + len(table)] = table
+        SEQUENCE.pack_into(buf, 0, sequence + 2)
+        return fits
+
+    def read(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(sequence, snapshot) of a consistent copy, or None if nothing is published yet"""
+        buf = self.shm.buf
+        for _ in range(READ_RETRIES):
+            before = self.sequence()
+            if before == 0:
+                return None
+            if before % 2:
+                os.sched_yield()
+                continue
+            length = SEQUENCE.unpack_from(buf, 8)[0]
+            values = NUMERIC.unpack_from(buf, HEADER_SIZE)
+            payload = bytes(buf[DATA_OFFSET:DATA_OFFSET + min(length, self.capacity)])
+            if self.sequence() == before:
+                return before, join_numeric(values, json.loads(payload))
+        return None
+
+    def read_table(self, since: int = 0) -> Optional[Tuple[int, List[List[Any]]]]:
+        """(table sequence, rows) if a table newer than `since` is published, else None"""
+        buf = self.shm.buf
+        for _ in range(READ_RETRIES):
+            before = self.sequence()
+            if before % 2:
+                os.sched_yield()
+                continue
+            _, length, table_sequence, table_length = HEADER.unpack_from(buf, 0)
+            if table_sequence in (0, since):
+                if self.sequence() == before:
+                    return None
+                continue
+            start = DATA_OFFSET + length
+            table = bytes(buf[start:start + min(table_length, self.capacity - length)])
+            if self.sequence() == before:
+                return table_sequence, json.loads(table)
+        return None
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+class SamplerLock:
+    """Exclusive, non-blocking file lock deciding which worker samples"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1  # no flock: every worker samples
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)  # closing the descriptor drops the flock
+        self._fd = None
@@ -0,0 +1,125 @@
+"""
+Live Metrics Streaming for TerminalX
+Pushes delta-encoded sampler snapshots and alert state changes to WebSocket and SSE subscribers
+
+All subscribers read the one shared MetricsSampler snapshot, so any number of
+open dashboards costs a single sampling pass per tick. The first message is a
+full snapshot; later messages are JSON Merge Patches (RFC 7386) against the
+previous message, where ``null`` marks a removed key and lists are replaced
+whole. Alert state changes follow as ``alert`` messages.
+"""
+
+import asyncio
+import json
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional
+
+from alerts import AlertEngine
+from sampler import MetricsSampler, SnapshotUnavailable
+
+_MISSING = object()
+
+
+def merge_patch_diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the merge patch that turns `old` into `new`"""
+    patch: Dict[str, Any] = {}
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if previous is _MISSING:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(previous, dict):
+            nested = merge_patch_diff(previous, value)
+            if nested:
+                patch[key] = nested
+        elif value != previous:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Iterable[str]]:
+    """Parse a comma separated `fields` query parameter"""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(',') if f.strip()]
+
+
+class MetricsSubscription:
+    """One subscriber's view of the shared sampler: field filter plus push rate"""
+
+    def __init__(self, sampler: MetricsSampler, fields: Optional[Iterable[str]] = None,
+                 interval: Optional[float] = None, alerts: Optional[AlertEngine] = None):
+        self.sampler = sampler
+        self.alerts = alerts
+        self._alert_sequence = alerts.sequence if alerts is not None else 0
+        self._last_data: Optional[Dict[str, Any]] = None
+        self._last_snapshot: Optional[Dict[str, Any]] = None
+        self.configure(fields, interval)
+
+    def configure(self, fields: Optional[Iterable[str]] = None,
+                  interval: Optional[float] = None) -> None:
+        """Change the selected fields and push interval; forces a full snapshot"""
+        self.fields = set(fields) if fields else None
+        # Pushing faster than the sampler ticks would only resend old data
+        self.interval = max(interval or self.sampler.interval, self.sampler.interval)
+        self._last_data = None
+        self._last_snapshot = None
+
+    def _select(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return snapshot
+        return {key: value for key, value in snapshot.items()
+                if key in self.fields or key == 'timestamp'}
+
+    def next_message(self) -> Optional[Dict[str, Any]]:
+        """Build the next message, or None if the sampler has not ticked since"""
+        try:
+            snapshot, age = self.sampler.latest()
+        except SnapshotUnavailable:
+            return None
+        if snapshot is self._last_snapshot:
+            return None
+        self._last_snapshot = snapshot
+        data = self._select(snapshot)
+        if self._last_data is None:
+            message = {'type': 'snapshot', 'age': age, 'data': data}
+        else:
+            message = {'type': 'delta', 'age': age, 'data': merge_patch_diff(self._last_data, data)}
+        self._last_data = data
+        return message
+
+    async def messages(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield messages at the subscriber's push rate"""
+        while True:
+            message = self.next_message()
+            if message is not None:
+                yield message
+            for event in self.alert_events():
+                yield {'type': 'alert', 'data': event}
+            await asyncio.sleep(self.interval)
+
+    def alert_events(self) -> List[Dict[str, Any]]:
+        """Alert state changes since the last call"""
+        if self.alerts is None:
+            return []
+        self._alert_sequence, events = self.alerts.events_since(self._alert_sequence)
+        return events
+
+
+async def alert_stream(alerts: AlertEngine, interval: float) -> AsyncIterator[str]:
+    """text/event-stream of alert state changes only, polled every `interval` seconds"""
+    sequence = alerts.sequence
+    firing = [rule for rule in alerts.rules() if rule['state'] == 'firing']
+    yield f"event: alerts\ndata: {json.dumps({'type': 'alerts', 'firing': firing})}\n\n"
+    while True:
+        sequence, events = alerts.events_since(sequence)
+        for event in events:
+            yield f"event: alert\ndata: {json.dumps({'type': 'alert', 'data': event})}\n\n"
+        await asyncio.sleep(interval)
+
+
+async def sse_events(subscription: MetricsSubscription) -> AsyncIterator[str]:
+    """Render a subscription as a text/event-stream body"""
+    async for message in subscription.messages():
+        yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
@@ -7,15 +7,35 @@ import psutil
 import platform
 import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-import subprocess
-import json
+from typing import Callable, Dict, List, Any, Iterable, Optional
+
+from process_table import ProcessTable
+from perf import monitor_timings, timed
+
+# SystemInfo field -> SystemMonitor.sample() group it is derived from
+SYSTEM_INFO_FIELDS = {
+    'cpu_percent': 'cpu',
+    'memory_percent': 'memory',
+    'memory_used': 'memory',
+    'memory_total': 'memory',
+    'disk_usage': 'disk',
+    'uptime': 'uptime',
+    'processes': 'processes'
+}
 
 class SystemMonitor:
     """Real system monitoring using psutil and system commands"""
     
     def __init__(self):
-        self.system_info = self._get_system_info()
+        self._system_info: Optional[Dict[str, Any]] = None
+        self.process_table = ProcessTable()
+    
+    @property
+    def system_info(self) -> Dict[str, Any]:
+        """Static platform details, probed on first use (platform.processor() may spawn a process)"""
+        if self._system_info is None:
+            self._system_info = self._get_system_info()
+        return self._system_info
     
     def _get_system_info(self) -> Dict[str, Any]:
         """Get basic system information"""
@@ -29,14 +49,17 @@ class SystemMonitor:
             'python_version': platform.python_version()
         }
     
+    @timed(monitor_timings)
     def get_cpu_info(self) -> Dict[str, Any]:
         """Get detailed CPU information"""
         try:
             cpu_count = psutil.cpu_count()
             cpu_count_logical = psutil.cpu_count(logical=True)
             cpu_freq = psutil.cpu_freq()
-            cpu_percent = psutil.cpu_percent(interval=1, percpu=True)
-            cpu_percent_avg = psutil.cpu_percent(interval=1)
+            # Non-blocking: percentages are measured since the previous call,
+            # so callers are expected to sample at a regular interval.
+            cpu_percent = psutil.cpu_percent(interval=None, percpu=True)
+            cpu_percent_avg = psutil.cpu_percent(interval=None)
             
             return {
                 'cpu_count_physical': cpu_count,
@@ -54,6 +77,7 @@ class SystemMonitor:
         except Exception as e:
             return {'error': f'Failed to get CPU info: {str(e)}'}
     
+    @timed(monitor_timings)
     def get_memory_info(self) -> Dict[str, Any]:
         """Get detailed memory information"""
         try:
@@ -80,6 +104,7 @@ class SystemMonitor:
         except Exception as e:
             return {'error': f'Failed to get memory info: {str(e)}'}
     
+    @timed(monitor_timings)
     def get_disk_info(self) -> Dict[str, Any]:
         """Get disk usage information"""
         try:
@@ -103,6 +128,7 @@ class SystemMonitor:
         except Exception as e:
             return {'error': f'Failed to get disk info: {str(e)}'}
     
+    @timed(monitor_timings)
     def get_network_info(self) -> Dict[str, Any]:
         """Get network information"""
         try:
@@ -121,31 +147,31 @@ class SystemMonitor:
         except Exception as e:
             return {'error': f'Failed to get network info: {str(e)}'}
     
-    def get_processes(self, limit: int = 20) -> List[Dict[str, Any]]:
+    @timed(monitor_timings)
+    def get_processes(self, limit: int = 20, refresh: bool = True) -> List[Dict[str, Any]]:
         """Get real system processes"""
         try:
+            if refresh:
+                self.process_table.refresh()
             processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'username', 'status', 'create_time']):
-                try:
-                    proc_info = proc.info
-                    processes.append({
-                        'pid': proc_info['pid'],
-                        'name': proc_info['name'],
-                        'cpu_percent': round(proc_info['cpu_percent'] or 0, 1),
-                        'memory_percent': round(proc_info['memory_percent'] or 0, 1),
-                        'username': proc_info['username'] or 'unknown',
-                        'status': proc_info['status'],
-                        'create_time': datetime.fromtimestamp(proc_info['create_time']).strftime('%H:%M:%S')
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
-            
-            # Sort by CPU usage
-            processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-            return processes[:limit]
+            for entry in self.process_table.top(limit):
+                processes.append({
+                    'pid': entry.pid,
+                    'ppid': entry.ppid,
+                    'name': entry.name,
+                    'cpu_percent': round(entry.cpu_percent, 1),
+                    'memory_percent': round(entry.memory_percent, 1),
+                    'username': entry.username,
+                    'status': entry.status,
+                    'cpu_time': round(entry.cpu_time, 2),
+                    'create_time': datetime.fromtimestamp(entry.create_time).strftime('%H:%M:%S'),
+                    'command': entry.command
+                })
+            return processes
         except Exception as e:
             return [{'error': f'Failed to get processes: {str(e)}'}]
     
+    @timed(monitor_timings)
     def get_system_uptime(self) -> Dict[str, Any]:
         """Get system uptime"""
         try:
@@ -164,31 +190,101 @@ class SystemMonitor:
         except Exception as e:
             return {'error': f'Failed to get uptime: {str(e)}'}
     
+    @timed(monitor_timings)
     def get_top_processes(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top processes by CPU and memory usage"""
         try:
+            self.process_table.refresh()
             processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'username', 'cmdline']):
-                try:
-                    proc_info = proc.info
-                    cmdline = ' '.join(proc_info['cmdline']) if proc_info['cmdline'] else proc_info['name']
-                    processes.append({
-                        'pid': proc_info['pid'],
-                        'name': proc_info['name'],
-                        'cpu_percent': round(proc_info['cpu_percent'] or 0, 1),
-                        'memory_percent': round(proc_info['memory_percent'] or 0, 1),
-                        'username': proc_info['username'] or 'unknown',
-                        'command': cmdline[:50] + '...' if len(cmdline) > 50 else cmdline
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
-            
-            # Sort by CPU usage
-            processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-            return processes[:limit]
+            for entry in self.process_table.top(limit):
+                processes.append({
+                    'pid': entry.pid,
+                    'ppid': entry.ppid,
+                    'name': entry.name,
+                    'cpu_percent': round(entry.cpu_percent, 1),
+                    'memory_percent': round(entry.memory_percent, 1),
+                    'username': entry.username,
+                    'command': entry.command
+                })
+            return processes
         except Exception as e:
             return [{'error': f'Failed to get top processes: {str(e)}'}]
     
+    @timed(monitor_timings)
+    def get_process_tree(self, root: Optional[int] = None, depth: Optional[int] = None,
+                         refresh: bool = True) -> Optional[List[Dict[str, Any]]]:
+        """Process tree from ppid links, under `root` if given (None if `root` is not running)"""
+        if refresh:
+            self.process_table.refresh()
+        tree = self.process_table.tree(root, depth)
+        return tree if tree or root is None else None
+    
+    @timed(monitor_timings)
+    def get_process_detail(self, pid: int) -> Optional[Dict[str, Any]]:
+        """Open files, threads, IO, memory maps and connections of one process (None if it is gone)"""
+        return self.process_table.detail(pid)
+    
+    def prime_cpu_counters(self) -> None:
+        """Set the CPU percent baseline so the next reading is meaningful"""
+        psutil.cpu_percent(interval=None, percpu=True)
+        psutil.cpu_percent(interval=None)
+    
+    def readers(self, groups: Optional[Iterable[str]] = None) -> Dict[str, Callable[[], Any]]:
+        """Independent per-group readers for sample(), safe to run concurrently"""
+        readers = {
+            'cpu': self.get_cpu_info,
+            'memory': self.get_memory_info,
+            'disk': self.get_disk_info,
+            'network': self.get_network_info,
+            'uptime': self.get_system_uptime,
+            'processes': self.get_top_processes
+        }
+        if groups is None:
+            return readers
+        groups = set(groups)
+        return {group: reader for group, reader in readers.items() if group in groups}
+    
+    @timed(monitor_timings)
+    def sample(self, groups: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Take one non-blocking reading of the requested metric groups (default: all)"""
+        snapshot = {'timestamp': time.time()}
+        for group, reader in self.readers(groups).items():
+            snapshot[group] = reader()
+        if 'processes' in snapshot:
+            # Counted from the process table the 'processes' reader just refreshed
+            snapshot['process_states'] = self.process_table.status_counts()
+        return snapshot
+    
+    def get_system_info_snapshot(self, fields: Optional[Iterable[str]] = None,
+                                 sample: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the /api/system payload from one sample, reading only what `fields` needs"""
+        fields = list(SYSTEM_INFO_FIELDS) if fields is None else [f for f in fields if f in SYSTEM_INFO_FIELDS]
+        if sample is None:
+            sample = self.sample({SYSTEM_INFO_FIELDS[f] for f in fields})
+        
+        info: Dict[str, Any] = {}
+        memory = sample.get('memory', {}).get('virtual_memory')
+        disk = sample.get('disk', {}).get('disk_usage')
+        for field in fields:
+            if SYSTEM_INFO_FIELDS[field] not in sample:
+                continue  # not read yet: leave the field out rather than guess
+            if field == 'cpu_percent':
+                info[field] = sample['cpu'].get('cpu_percent_average', 0.0)
+            elif field == 'memory_percent':
+                info[field] = memory['percent'] if memory else 0.0
+            elif field == 'memory_used':
+                info[field] = self.format_bytes(memory['used']) if memory else 'unknown'
+            elif field == 'memory_total':
+                info[field] = self.format_bytes(memory['total']) if memory else 'unknown'
+            elif field == 'disk_usage':
+                info[field] = (f"{self.format_bytes(disk['used'])}/{self.format_bytes(disk['total'])} "
+                               f"({disk['percent']}%)") if disk else 'unknown'
+            elif field == 'uptime':
+                info[field] = sample['uptime'].get('uptime_formatted', 'unknown')
+            elif field == 'processes':
+                info[field] = sample['processes']
+        return info
+    
     def get_system_summary(self) -> Dict[str, Any]:
         """Get complete system summary"""
         return {
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from alerts import AlertEngine, UnknownMetric
+
+
+def snapshot(timestamp, cpu, read_count=0):
+    return {'timestamp': timestamp,
+            'cpu': {'cpu_percent_average': cpu, 'load_average': (0, 0, 0)},
+            'disk': {'disk_io': {'read_count': read_count, 'write_count': 0,
+                                 'read_bytes': 0, 'write_bytes': 0}}}
+
+
+def test_rule_changes_reach_every_worker(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    first, second = AlertEngine(rules_path=path), AlertEngine(rules_path=path)
+    for engine in (first, second):
+        engine.add('base: cpu.percent > 95')  # configured on every worker
+
+    first.add('hot: cpu_percent > 50')
+    second.update(snapshot(1.0, 60.0))
+    assert {rule['name']: rule['state'] for rule in second.rules()} == {'base': 'ok', 'hot': 'firing'}
+    assert second.events_since(0)[1][0]['rule'] == 'hot'
+
+    second.add('hot: cpu.percent > 70')  # replaced from the other worker
+    assert [rule['expression'] for rule in first.rules() if rule['name'] == 'hot'] == ['hot: cpu.percent > 70']
+    assert second.remove('base')
+    assert not second.remove('base')
+    assert [rule['name'] for rule in first.rules()] == ['hot']
+
+
+def test_unknown_metrics_are_rejected():
+    engine = AlertEngine()
+    metrics = ['cpu.percent', 'disk.read_count']
+    with pytest.raises(UnknownMetric):
+        engine.add('cpu.percnt > 5', metrics=metrics)
+    engine.add('disk read count > 10', metrics=metrics)
+    engine.update(snapshot(1.0, 0.0, read_count=20))
+    assert engine.rules()[0]['state'] == 'firing'
+
+
+def test_api_answers_422_for_an_unknown_metric(monkeypatch):
+    import main
+    from sampler import metrics_sampler
+    monkeypatch.setattr(main, 'alert_engine', AlertEngine())
+    monkeypatch.setattr(metrics_sampler, '_latest', None)
+    client = TestClient(main.app)
+    assert client.post('/api/alerts/rules', json={'rule': 'cpu.percent > 5'}).status_code == 503
+    asyncio.run(metrics_sampler._prime())
+    response = client.post('/api/alerts/rules', json={'rule': 'cpu.percnt > 5'})
+    assert response.status_code == 422
+    assert client.post('/api/alerts/rules', json={'rule': 'cpu.percent > 5'}).status_code == 200
+    assert client.delete('/api/alerts/rules/cpu.percent.last.gt.5').status_code == 200
@@ -0,0 +1,23 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from cache import TTLCache
+from sampler import metrics_sampler
+
+
+def test_metrics_answer_503_until_the_first_sample(monkeypatch):
+    monkeypatch.setattr(metrics_sampler, '_latest', None)
+    monkeypatch.setattr(main.metrics_exporter, 'payload', None)
+    monkeypatch.setattr(main, 'response_cache', TTLCache())
+    client = TestClient(main.app)  # no lifespan: the sampler never ticks on its own
+    for path in ('/api/system', '/api/system/info', '/api/memory', '/metrics'):
+        response = client.get(path)
+        assert response.status_code == 503, path
+        assert int(response.headers['retry-after']) >= 1
+
+    asyncio.run(metrics_sampler._prime())
+    for path in ('/api/system', '/api/system/info', '/api/memory', '/metrics'):
+        assert client.get(path).status_code == 200, path
+    assert client.get('/api/health').status_code == 200
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from history import HistoryLog, expand_history
+from sessions import SessionManager
+
+
+def test_prefix_lookups_match_a_full_scan(tmp_path):
+    path = str(tmp_path / 'h.log')
+    log = HistoryLog(path)
+    other = HistoryLog(path)  # a second worker appending to the same log
+    rng = random.Random(1)
+    words = ['ls', 'ls -la', 'cat a', 'cat b', 'cd /', 'cd /etc', 'echo hi', 'grep x f']
+    entries = []
+    for i in range(300):
+        command = rng.choice(words)
+        (log if i % 3 else other).append(command)
+        entries.append(command)
+        if i % 50 == 0:
+            log.suggest('')  # build the index early, then keep it current
+        for prefix in ('', 'c', 'ca', 'cd /e', 'ls', 'zz'):
+            numbered = [(n + 1, e) for n, e in enumerate(entries) if e.startswith(prefix)]
+            assert log.find_prefix(prefix) == (numbered[-1] if numbered else None)
+    counts = {}
+    for n, command in enumerate(entries):
+        counts[command] = (counts.get(command, (0, 0))[0] + 1, n + 1)
+    expected = sorted((c for c in counts if c.startswith('c')), key=lambda c: counts[c], reverse=True)
+    assert log.suggest('c', limit=3) == expected[:3]
+    assert expand_history('!cat', log) == [e for e in entries if e.startswith('cat')][-1]
+
+
+def test_index_survives_compaction(tmp_path):
+    log = HistoryLog(str(tmp_path / 'h.log'), max_entries=8)
+    for i in range(20):
+        log.append(f'echo {i}')
+        assert log.find_prefix('echo')[1] == f'echo {i}'
+    assert log.find_prefix('echo 1') == (len(log), 'echo 19')
+    assert 'echo 0' not in log.suggest('echo', limit=100)
+
+
+def make_manager(tmp_path, **kwargs):
+    evicted = []
+    manager = SessionManager(
+        history_factory=lambda session_id: HistoryLog(str(tmp_path / f'{session_id}.log')),
+        on_evict=evicted.append, **kwargs
+    )
+    return manager, evicted
+
+
+def history_files(session):
+    return [p for p in (session.history.path, session.history.index_path) if os.path.exists(p)]
+
+
+def test_shared_log_reopens_with_one_index_entry_per_command(tmp_path):
+    path = str(tmp_path / 'h.log')
+    first, second = HistoryLog(path), HistoryLog(path)
+    for log, command in ((first, 'one'), (second, 'two'), (first, 'three')):
+        log.append(command)
+        assert len(first) == len(second)
+    assert [command for _, command in HistoryLog(path).entries()] == ['one', 'two', 'three']
+    assert os.path.getsize(path + '.idx') == 3 * 8
+
+
+def test_concurrent_writer_processes_keep_the_index_consistent(tmp_path):
+    path = str(tmp_path / 'h.log')
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = ("import sys; sys.path.insert(0, sys.argv[1]); from history import HistoryLog\n"
+              "log = HistoryLog(sys.argv[2])\n"
+              "for i in range(200): log.append(f'{sys.argv[3]} {i}'); len(log)")
+    writers = [subprocess.Popen([sys.executable, '-c', script, backend, path, name]) for name in 'ab']
+    assert all(writer.wait(timeout=60) == 0 for writer in writers)
+    entries = [command for _, command in HistoryLog(path).entries()]
+    assert sorted(entries) == sorted(f'{name} {i}' for name in 'ab' for i in range(200))
+    for name in 'ab':
+        assert [e for e in entries if e[0] == name] == [f'{name} {i}' for i in range(200)]
+
+
+def test_expired_session_history_is_deleted(tmp_path):
+    manager, evicted = make_manager(tmp_path, ttl=60)
+    session = asyncio.run(manager.create())
+    session.record('ls')
+    assert history_files(session)
+    session.last_used = time.time() - 120
+    assert asyncio.run(manager.get(session.session_id)) is None
+    assert not history_files(session)
+    assert evicted == [session.session_id]
+
+
+def test_evicted_session_history_is_deleted(tmp_path):
+    manager, evicted = make_manager(tmp_path, max_sessions=1)
+    first = asyncio.run(manager.create())
+    first.record('ls')
+    asyncio.run(manager.create())
+    assert asyncio.run(manager.get(first.session_id)) is None
+    assert not history_files(first)
+    assert evicted == [first.session_id]
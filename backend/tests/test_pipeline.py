@@ -0,0 +1,71 @@
+import asyncio
+import itertools
+
+import pytest
+
+import pipeline
+from commands import STREAM, Command, CommandContext, CommandError, registry
+from vfs import VirtualFileSystem
+
+
+def make_ctx() -> CommandContext:
+    fs = VirtualFileSystem()
+    fs.load({"log": {"type": "file", "content": "first\n"}})
+    return CommandContext("/", {}, fs)
+
+
+def run(ctx: CommandContext, line: str):
+    return asyncio.run(pipeline.run(line, ctx))
+
+
+def test_quoted_operators_are_plain_text():
+    ctx = make_ctx()
+    assert run(ctx, 'echo "a|b"') == ("a|b", True)
+    assert run(ctx, "echo 'x && y' ; echo z") == ("x && y\nz", True)
+
+
+def test_status_of_a_failing_command_is_visible_as_dollar_question():
+    ctx = make_ctx()
+    output, success = run(ctx, "cat missing; echo $?")
+    assert success
+    assert output.splitlines()[-1] == "1"
+    assert run(ctx, "echo ok; echo $?") == ("ok\n0", True)
+    assert run(ctx, "echo '$?'") == ("$?", True)
+
+
+@pytest.mark.parametrize("line, token", [
+    ("echo a |", "newline"),
+    ("| echo a", "|"),
+    ("echo a 2>&1", "&"),
+    ("echo a >", "newline"),
+    ("echo a &&", "newline"),
+])
+def test_syntax_errors_name_the_unexpected_token(line, token):
+    with pytest.raises(CommandError, match=f"syntax error near unexpected token `{token}'"):
+        pipeline.parse(line)
+
+
+def test_append_redirect_adds_to_the_end():
+    ctx = make_ctx()
+    assert run(ctx, "echo second >> log") == ("", True)
+    run(ctx, "echo new >> fresh")
+    assert ctx.fs.read("/log") == "first\nsecond\n"
+    assert ctx.fs.read("/fresh") == "new\n"
+    run(ctx, "echo over > log")
+    assert ctx.fs.read("/log") == "over\n"
+
+
+def test_head_stops_pulling_from_upstream(monkeypatch):
+    pulled = []
+
+    def numbers(ctx, flags, operands, stdin):
+        for n in itertools.count(1):
+            pulled.append(n)
+            yield str(n)
+
+    monkeypatch.setitem(registry._commands, "numbers",
+                        Command("numbers", numbers, "numbers", "", kind=STREAM))
+    ctx = make_ctx()
+    assert run(ctx, "numbers | head -1") == ("1", True)
+    assert run(ctx, "numbers | grep 7 | head -n 2") == ("7\n17", True)
+    assert len(pulled) == 1 + 17
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import pytest
+
+from process_table import ProcessTable
+
+
+@pytest.fixture
+def child():
+    proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    yield proc.pid
+    proc.kill()
+    proc.wait()
+
+
+def pretend_reused(table: ProcessTable, pid: int) -> None:
+    """Make the cached entry and handle look like an older process that had `pid`"""
+    entry = table.get(pid)
+    entry.create_time -= 100
+    entry.name, entry.username = 'previous', 'previous-user'
+    entry.proc._create_time = entry.create_time  # what psutil caches after create_time()
+    entry.proc._ident = (pid, entry.create_time)
+
+
+def test_refresh_replaces_an_entry_whose_pid_was_reused(child):
+    table = ProcessTable()
+    table.refresh()
+    pretend_reused(table, child)
+    table.refresh()
+    entry = table.get(child)
+    assert entry.name != 'previous'
+    assert entry.create_time == pytest.approx(entry.proc.create_time())
+
+
+def test_detail_ignores_the_entry_of_a_reused_pid(child):
+    table = ProcessTable()
+    table.refresh()
+    pretend_reused(table, child)
+    detail = table.detail(child)
+    assert detail['username'] != 'previous-user'
+    assert detail['name'] != 'previous'
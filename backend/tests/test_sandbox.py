@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from sandbox import SandboxError, SandboxRunner
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return SandboxRunner(root=str(tmp_path), allowlist=['sort', 'uniq', 'echo', 'cat', 'grep', 'find', 'sh'])
+
+
+def collect(runner: SandboxRunner, command: str, env=None):
+    async def run():
+        return [event async for event in runner.run('s1', command, env)]
+    events = asyncio.run(run())
+    return ''.join(e['data'] for e in events if e['type'] == 'output'), events[-1]
+
+
+@pytest.mark.parametrize('command', [
+    'sort --compress-program=/bin/sh x',
+    'sort --compress-prog sh x',
+    'sort --comp=sh x',
+    'find . -exec sh ;',
+    'find . -okdir sh ;',
+])
+def test_rejects_options_that_run_programs(runner, command):
+    with pytest.raises(SandboxError):
+        runner.parse(command)
+
+
+@pytest.mark.parametrize('command', [
+    'sort -o victim x',
+    'sort -ovictim x',
+    'sort -ro victim x',
+    'sort --output=victim x',
+    'sort --out victim x',
+    'uniq x victim',
+    'uniq -c -f 1 x victim',
+    'uniq -- x victim',
+])
+def test_rejects_writing_files(runner, command):
+    with pytest.raises(SandboxError):
+        runner.parse(command)
+
+
+def test_counts_option_values_apart_from_operands(runner):
+    assert runner.parse('uniq -c -f 1 x')[1] == ['uniq', '-c', '-f', '1', 'x']
+    assert runner.parse('uniq --skip-f 1 -w2 x')[1][-1] == 'x'
+
+
+@pytest.mark.parametrize('command', [
+    'cat /etc/hostname',
+    'cat ../other/file',
+    'cat sub/../../other',
+    'grep -f/etc/passwd x',
+    'grep -if../x y',
+    'sort --files0-from=/etc/x',
+    'cat escape/passwd',
+])
+def test_rejects_paths_outside_the_workdir(runner, tmp_path, command):
+    cwd = runner.workdir('s1')
+    (tmp_path / 's1' / 'escape').symlink_to('/etc')
+    with pytest.raises(SandboxError):
+        runner.parse(command, cwd)
+
+
+def test_reads_files_inside_the_workdir(runner, tmp_path):
+    (tmp_path / 's1').mkdir()
+    (tmp_path / 's1' / 'notes').write_text('b\na\n')
+    output, exit_event = collect(runner, 'sort ./notes')
+    assert output == 'a\nb\n'
+    with pytest.raises(SandboxError):
+        list(collect(runner, 'cat /etc/hostname'))
+
+
+def test_allows_ordinary_options(runner):
+    assert runner.parse('sort -r --check=quiet x')[1] == ['sort', '-r', '--check=quiet', 'x']
+
+
+def test_child_environment_is_allowlisted(runner):
+    output, exit_event = collect(runner, 'sh -c env', {
+        'LD_LIBRARY_PATH': '/tmp', 'LD_AUDIT': 'x.so', 'BASH_ENV': '/tmp/rc', 'TZ': 'UTC', 'FOO': 'bar'
+    })
+    assert exit_event['code'] == 0
+    names = {line.partition('=')[0] for line in output.splitlines()}
+    assert 'TZ' in names
+    assert not names & {'LD_LIBRARY_PATH', 'LD_AUDIT', 'BASH_ENV', 'FOO'}
+
+
+def test_limits_are_applied(runner):
+    output, exit_event = collect(runner, 'sh -c "ulimit -t; ulimit -c"')
+    assert output.split() == [str(runner.cpu_seconds), '0']
+
+
+def test_cleanup_removes_workdir(runner, tmp_path):
+    collect(runner, 'echo hi')
+    assert (tmp_path / 's1').is_dir()
+    runner.cleanup('s1')
+    assert not (tmp_path / 's1').exists()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sessions import SessionManager, SessionStore, SQLiteSessionStore
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_store_calls_run_off_the_event_loop(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    threads = []
+    load = store.load
+    store.load = lambda session_id: (threads.append(threading.current_thread()), load(session_id))[1]
+    manager = SessionManager(store=store)
+
+    async def run():
+        session = await manager.create()
+        session.cwd = '/etc'
+        await manager.save(session)
+        return session, await manager.get(session.session_id)
+
+    session, loaded = asyncio.run(run())
+    assert loaded.cwd == '/etc'
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_expired_session_row_is_deleted(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    manager = SessionManager(store=store, ttl=60)
+
+    async def run():
+        session = await manager.create()
+        session.last_used = time.time() - 120
+        await manager.save(session)
+        assert await manager.get(session.session_id) is None
+        return session
+
+    session = asyncio.run(run())
+    assert store.load(session.session_id) is None
+
+
+def test_evicted_expired_session_row_is_deleted(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    manager = SessionManager(store=store, ttl=60, max_sessions=1)
+
+    async def run():
+        first = await manager.create()
+        first.last_used = time.time() - 120
+        await manager.save(first)
+        # Keep the row from being purged by age so only eviction can remove it
+        store.purge = lambda older_than: None
+        await manager.create()
+        return first
+
+    first = asyncio.run(run())
+    assert store.load(first.session_id) is None
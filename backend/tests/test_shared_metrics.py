@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from executor import MonitorExecutor
+from sampler import MetricsSampler
+from shared_metrics import SamplerLock, SharedSnapshot, fcntl
+from system_monitor import SystemMonitor
+
+
+@pytest.fixture
+def segment():
+    shared = SharedSnapshot.create(4 * 1024 * 1024)
+    yield shared
+    shared.close()
+    shared.unlink()
+
+
+def make_sampler(segment, lock_path):
+    monitor = SystemMonitor()
+    scans = []
+    refresh = monitor.process_table.refresh
+    monitor.process_table.refresh = lambda: (scans.append(1), refresh())
+    sampler = MetricsSampler(monitor, MonitorExecutor(timeout=5), interval=0.2,
+                             shared=SharedSnapshot.attach(segment.name), lock=SamplerLock(lock_path))
+    return sampler, scans
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+def test_only_the_owner_scans_processes(segment, tmp_path):
+    lock_path = str(tmp_path / 'sampler.lock')
+    owner, owner_scans = make_sampler(segment, lock_path)
+    follower, follower_scans = make_sampler(segment, lock_path)
+
+    async def run():
+        await owner.start()
+        while not owner.owner:
+            await asyncio.sleep(0.01)  # let the owner take the lock first
+        await follower.start()
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            if follower.sampling:
+                break
+        await asyncio.sleep(0.5)
+        assert owner.owner and not follower.owner
+        assert follower.sampling
+        await follower.stop()
+        await owner.stop()
+
+    asyncio.run(run())
+    assert owner_scans
+    assert not follower_scans
+    table = follower.monitor.process_table
+    assert len(table) > 0
+    listed = follower.monitor.get_processes(limit=5, refresh=False)
+    assert listed and 'error' not in listed[0]
+    assert follower.monitor.get_process_tree()
+
+
+def test_publish_keeps_the_newest_snapshot(segment):
+    sampler = MetricsSampler(SystemMonitor(), MonitorExecutor(), shared=SharedSnapshot.attach(segment.name))
+    seen = []
+    sampler.add_listener(lambda snapshot: seen.append(snapshot['timestamp']))
+    sampler._publish({'timestamp': 2.0})
+    sampler._publish({'timestamp': 1.0})
+    assert seen == [2.0]
+    assert segment.read()[1]['timestamp'] == 2.0
+
+
+def test_snapshots_round_trip_through_the_numeric_layout(segment):
+    monitor = SystemMonitor()
+    monitor.prime_cpu_counters()
+    snapshot = {'timestamp': 1.5, **monitor.sample(), 'stale': ['disk']}
+    snapshot['cpu']['cpu_frequency'] = None  # not a dict on some hosts: stays in the JSON rest
+    before = json.dumps(snapshot, sort_keys=True)
+    segment.write(snapshot)
+    assert json.dumps(snapshot, sort_keys=True) == before  # the caller's snapshot is untouched
+    sequence, published = segment.read()
+    assert json.loads(json.dumps(published, sort_keys=True)) == json.loads(before)
+
+
+def test_process_table_is_decoded_only_when_it_changed(segment, monkeypatch):
+    follower = SystemMonitor().process_table
+    sampler = MetricsSampler(SystemMonitor(), MonitorExecutor(), shared=SharedSnapshot.attach(segment.name))
+    follower.follow(sampler._shared_rows)
+    rows = [[1, 0.0, 'init', 'root', [], 0, 'sleeping', 0.0, 0.0, 0.0, 0, 0.0]]
+    assert segment.write({'timestamp': 1.0}, rows)
+
+    loads = []
+    load = follower.load
+    monkeypatch.setattr(follower, 'load', lambda rows: (loads.append(len(rows)), load(rows)))
+    assert len(follower) == 1 and follower.get(1).name == 'init'
+    follower.top(5)
+    assert loads == [1]  # decoded once, not per read
+    segment.write({'timestamp': 2.0}, rows + [[2, 0.0, 'kthreadd', 'root', [], 0, 'sleeping', 0.0, 0.0, 0.0, 0, 0.0]])
+    assert len(follower) == 2 and loads == [1, 2]
+    assert not segment.write({'timestamp': 3.0}, [['x' * 64]] * (5 * 1024 * 1024 // 64))  # too big
+    assert segment.table_sequence() == 0 and segment.read()[1] == {'timestamp': 3.0}
@@ -0,0 +1,51 @@
+import asyncio
+
+import pipeline
+from commands import CommandContext
+from filestore import FileBlob
+from vfs import VirtualFileSystem
+
+
+def make_ctx() -> CommandContext:
+    fs = VirtualFileSystem()
+    fs.load({
+        "notes": {"type": "file", "content": "héllo wörld\nnaïve café €5\n"},
+        "plain": {"type": "file", "content": "no newline at the end"},
+    })
+    return CommandContext("/", {}, fs)
+
+
+def run(ctx: CommandContext, line: str) -> str:
+    output, success = asyncio.run(pipeline.run(line, ctx))
+    assert success, output
+    return output
+
+
+def test_wc_counts_bytes_and_characters_the_same_from_files_and_pipes():
+    ctx = make_ctx()
+    assert run(ctx, "wc -c notes").split() == ["32", "notes"]
+    assert run(ctx, "cat notes | wc -c").split() == ["32"]
+    assert run(ctx, "wc -m notes").split() == ["26", "notes"]
+    assert run(ctx, "cat notes | wc -m").split() == ["26"]
+    assert run(ctx, "wc -lwmc notes").split() == ["2", "5", "26", "32", "notes"]
+
+
+def test_wc_counts_an_unterminated_file_the_same_both_ways():
+    ctx = make_ctx()
+    assert run(ctx, "wc plain").split() == ["1", "5", "21", "plain"]
+    assert run(ctx, "cat plain | wc").split() == ["1", "5", "21"]
+    assert run(ctx, "cat plain | wc -m").split() == ["21"]
+    run(ctx, "echo hi > g")
+    assert run(ctx, "wc -c g").split() == ["3", "g"]
+    assert run(ctx, "cat g | wc -c").split() == ["3"]
+    run(ctx, "cat plain > copy")
+    assert ctx.fs.open("/copy").text() == "no newline at the end"
+    run(ctx, "echo more >> copy")
+    assert ctx.fs.open("/copy").text() == "no newline at the end\nmore\n"
+
+
+def test_blob_chars_span_chunks(monkeypatch):
+    import filestore
+    monkeypatch.setattr(filestore, "CHUNK_SIZE", 4)
+    text = "aé€😀" * 10
+    assert FileBlob(text.encode()).chars() == len(text)
@@ -0,0 +1,31 @@
+import pytest
+
+from timeseries import MetricStore
+
+
+def test_rollup_averages_are_weighted_by_samples_per_metric():
+    store = MetricStore(retention=600, interval=1.0)
+    present = []
+    for t in range(120):
+        values = {'a': float(t)}
+        if t % 3 == 0 or 50 <= t < 55:  # 'b' is missing from most samples
+            values['b'] = float(t * 2)
+            present.append((t, t * 2))
+        store.add(float(t), values)
+
+    for step in (10, 20, 60):
+        series = store.query('b', 0, 119, step=step)
+        for bucket, avg in zip(series['t'], series['avg']):
+            expected = [v for t, v in present if bucket <= t < bucket + step]
+            assert avg == pytest.approx(sum(expected) / len(expected))
+        series = store.query('a', 0, 119, step=step)
+        assert series['avg'][0] == pytest.approx((step - 1) / 2)
+
+
+def test_raw_queries_skip_samples_missing_the_metric():
+    store = MetricStore(retention=60, interval=1.0)
+    for t in range(6):
+        store.add(float(t), {'a': 1.0, 'b': float(t)} if t % 2 else {'a': 1.0})
+    series = store.query('b', 0, 5)
+    assert series['t'] == [1.0, 3.0, 5.0]
+    assert series['value'] == [1.0, 3.0, 5.0]
@@ -0,0 +1,85 @@
+import asyncio
+
+import pipeline
+from commands import CommandContext
+from completion import complete_line
+from vfs import VirtualFileSystem, OverlayFileSystem
+
+
+def make_base() -> VirtualFileSystem:
+    fs = VirtualFileSystem()
+    fs.load({
+        "etc": {
+            "config": {"type": "file", "content": "System configuration"},
+            "hosts": {"type": "file", "content": "127.0.0.1 localhost"},
+        },
+        "home": {"user": {}},
+    })
+    return fs
+
+
+def run(ctx: CommandContext, line: str):
+    return asyncio.run(pipeline.run(line, ctx))
+
+
+def test_overlay_same_directory_mv():
+    base = make_base()
+    fs = OverlayFileSystem(base)
+    ctx = CommandContext("/", {}, fs)
+    output, success = run(ctx, "mv /etc/hosts /etc/h2")
+    assert success, output
+    assert fs.listdir("/etc") == ["config", "h2"]
+    assert [node.name for node in fs.children("/etc")] == ["config", "h2"]
+    assert fs.read("/etc/h2") == "127.0.0.1 localhost"
+    output, success = run(ctx, "ls -la /etc")
+    assert success, output
+    assert output.splitlines()[0] == "total 2"
+    # The shared base is untouched
+    assert base.listdir("/etc") == ["config", "hosts"]
+
+
+def test_overlay_same_directory_copy():
+    base = make_base()
+    fs = OverlayFileSystem(base)
+    ctx = CommandContext("/", {}, fs)
+    output, success = run(ctx, "cat /etc/hosts > /etc/h2")
+    assert success, output
+    assert fs.listdir("/etc") == ["config", "h2", "hosts"]
+    assert [node.name for node in fs.children("/etc")] == ["config", "h2", "hosts"]
+    assert fs.read("/etc/h2") == fs.read("/etc/hosts")
+    output, success = run(ctx, "ls -la /etc")
+    assert success, output
+    assert base.listdir("/etc") == ["config", "hosts"]
+
+
+def test_forked_overlay_same_directory_mv():
+    fs = OverlayFileSystem(make_base())
+    fs.touch("/etc/new")
+    child = fs.fork()
+    child.move("/etc/new", "/etc/renamed")
+    assert child.listdir("/etc") == ["config", "hosts", "renamed"]
+    assert fs.listdir("/etc") == ["config", "hosts", "new"]
+    assert [node.name for node in child.children("/etc")] == ["config", "hosts", "renamed"]
+
+
+def test_removed_and_renamed_files_are_no_longer_completed():
+    base = make_base()
+    fs = OverlayFileSystem(base)
+    ctx = CommandContext("/", {}, fs)
+    assert complete_line("cat /etc/h", fs, "/")["completions"] == ["/etc/hosts"]
+    run(ctx, "rm /etc/hosts")
+    assert complete_line("cat /etc/h", fs, "/")["completions"] == []
+    run(ctx, "mv /etc/config /etc/conf2")
+    assert complete_line("cat /etc/co", fs, "/")["completions"] == ["/etc/conf2"]
+    assert complete_line("cat /etc/co", base, "/")["completions"] == ["/etc/config"]
+
+
+def test_parent_of_a_moved_directory_is_its_new_parent():
+    fs = OverlayFileSystem(make_base())
+    ctx = CommandContext("/", {}, fs)
+    for line in ("mkdir /home/user/a", "mv /home/user/a /etc/a", "cd /etc/a", "cd .."):
+        output, success = run(ctx, line)
+        assert success, output
+    assert run(ctx, "pwd")[0] == "/etc"
+    assert fs.listdir("/etc") == ["a", "config", "hosts"]
+    assert fs.listdir("/home/user") == []
@@ -0,0 +1,69 @@
+"""
+Prefix Trie for TerminalX
+Small character trie used for command-name completion
+"""
+
+from typing import Dict, List, Iterator, Optional
+
+
+class _TrieNode:
+    __slots__ = ('children', 'terminal')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.terminal = False
+
+
+class Trie:
+    """Set of strings supporting O(len(prefix) + results) prefix queries"""
+
+    def __init__(self, words: Optional[List[str]] = None):
+        self._root = _TrieNode()
+        self._size = 0
+        for word in words or ():
+            self.add(word)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, word: str) -> None:
+        node = self._root
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+        if not node.terminal:
+            node.terminal = True
+            self._size += 1
+
+    def __contains__(self, word: str) -> bool:
+        node = self._root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return False
+        return node.terminal
+
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        """Words starting with `prefix`, in sorted order"""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if node.terminal:
+                yield word
+            for char in sorted(node.children, reverse=True):
+                stack.append((node.children[char], word + char))
+
+    def complete(self, prefix: str, limit: int = 50) -> List[str]:
+        matches = []
+        for word in self.iter_prefix(prefix):
+            matches.append(word)
+            if len(matches) >= limit:
+                break
+        return matches
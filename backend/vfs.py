@@ -0,0 +1,385 @@
+"""
+Virtual File System for TerminalX
+Path-indexed in-memory file system backing the simulated shell commands
+
+Every inode is registered in a flat ``path -> Inode`` index, so lookups are a
+single dict access regardless of depth. Directories keep their child names in
+a sorted list, which makes ``ls`` a copy rather than a sort. Errors are raised
+as the matching built-in ``OSError`` subclasses with ``strerror`` set, so
+callers can print them the way a shell would.
+
+File contents are plain strings. With a ``FileStore`` attached, contents
+above its threshold are kept as mmap-backed ``FileBlob``s instead; ``open``
+returns a blob for any file so large-file readers never build the whole
+string.
+"""
+
+import errno
+import os
+import posixpath
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Any, Iterator, Optional, Union
+
+from filestore import FileBlob, FileStore
+
+HOME = '/home/user'
+
+
+def _error(cls, code: int, path: str) -> OSError:
+    return cls(code, os.strerror(code), path)
+
+
+class Inode:
+    """A file or directory; directories have `names`, files have `content`"""
+
+    __slots__ = ('path', 'name', 'names', 'content', 'mtime')
+
+    def __init__(self, path: str, name: str, is_dir: bool, content: str = ''):
+        self.path = path
+        self.name = name
+        self.names: Optional[List[str]] = [] if is_dir else None
+        self.content: Optional[Union[str, FileBlob]] = None if is_dir else content
+        self.mtime = time.time()
+
+    @property
+    def is_dir(self) -> bool:
+        return self.names is not None
+
+    @property
+    def size(self) -> int:
+        if self.names is not None:
+            return 4096
+        content = self.content
+        return content.size if isinstance(content, FileBlob) else len(content)
+
+
+class VirtualFileSystem:
+    """In-memory tree indexed by absolute path"""
+
+    def __init__(self, store: Optional[FileStore] = None):
+        self.store = store
+        self.root = Inode('/', '', is_dir=True)
+        self._index: Dict[str, Inode] = {'/': self.root}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._index
+
+    @staticmethod
+    def resolve(path: str, cwd: str = '/') -> str:
+        """Normalize `path` relative to `cwd` into an absolute path"""
+        if path == '~' or path.startswith('~/'):
+            path = HOME + path[1:]
+        path = posixpath.normpath(posixpath.join(cwd, path))
+        # normpath keeps a leading '//' as POSIX allows; the VFS does not
+        return '/' + path.lstrip('/')
+
+    def lookup(self, path: str) -> Inode:
+        """Return the inode at absolute `path`"""
+        node = self._index.get(path)
+        if node is None:
+            raise _error(FileNotFoundError, errno.ENOENT, path)
+        return node
+
+    def _parent_dir(self, path: str) -> Inode:
+        parent = self._index.get(posixpath.dirname(path))
+        if parent is None:
+            raise _error(FileNotFoundError, errno.ENOENT, path)
+        if not parent.is_dir:
+            raise _error(NotADirectoryError, errno.ENOTDIR, path)
+        return parent
+
+    def _writable(self, node: Inode) -> Inode:
+        """Return a version of `node` that may be mutated in place"""
+        return node
+
+    def _link(self, parent: Inode, node: Inode) -> None:
+        parent = self._writable(parent)
+        insort(parent.names, node.name)
+        parent.mtime = node.mtime
+        self._index[node.path] = node
+
+    def _unlink(self, node: Inode) -> None:
+        parent = self._writable(self._index[posixpath.dirname(node.path)])
+        names = parent.names
+        del names[bisect_left(names, node.name)]
+        parent.mtime = time.time()
+
+    def mkdir(self, path: str, parents: bool = False) -> Inode:
+        existing = self._index.get(path)
+        if existing is not None:
+            if parents and existing.is_dir:
+                return existing
+            raise _error(FileExistsError, errno.EEXIST, path)
+        if parents and posixpath.dirname(path) not in self._index:
+            self.mkdir(posixpath.dirname(path), parents=True)
+        parent = self._parent_dir(path)
+        node = Inode(path, posixpath.basename(path), is_dir=True)
+        self._link(parent, node)
+        return node
+
+    def touch(self, path: str) -> Inode:
+        """Create an empty file, or update the mtime of an existing entry"""
+        node = self._index.get(path)
+        if node is not None:
+            node = self._writable(node)
+            node.mtime = time.time()
+            return node
+        return self.write(path, '')
+
+    def _contents(self, content: str, previous: Union[str, FileBlob, None] = None
+               ) -> Union[str, FileBlob]:
+        """New file contents: `content`, appended to `previous` if given"""
+        store = self.store
+        if isinstance(previous, FileBlob):
+            # Blobs are shared with forks and never modified; appending makes a new one
+            return store.put(previous.buffer, content.encode())
+        if previous is not None:
+            content = previous + content
+        if store is not None and len(content) > store.threshold:
+            return store.put(content.encode())
+        return content
+
+    def write(self, path: str, content: str, append: bool = False) -> Inode:
+        node = self._index.get(path)
+        if node is None:
+            parent = self._parent_dir(path)
+            node = Inode(path, posixpath.basename(path), is_dir=False,
+                         content=self._contents(content))
+            self._link(parent, node)
+            return node
+        if node.is_dir:
+            raise _error(IsADirectoryError, errno.EISDIR, path)
+        node = self._writable(node)
+        node.content = self._contents(content, node.content if append else None)
+        node.mtime = time.time()
+        return node
+
+    def read(self, path: str) -> str:
+        content = self._file(path).content
+        return content.text() if isinstance(content, FileBlob) else content
+
+    def open(self, path: str) -> FileBlob:
+        """Contents of the file at `path` as a blob, without copying stored ones"""
+        content = self._file(path).content
+        return content if isinstance(content, FileBlob) else FileBlob(content.encode())
+
+    def _file(self, path: str) -> Inode:
+        node = self.lookup(path)
+        if node.is_dir:
+            raise _error(IsADirectoryError, errno.EISDIR, path)
+        return node
+
+    def listdir(self, path: str) -> List[str]:
+        """Sorted child names of the directory at `path`"""
+        node = self.lookup(path)
+        if not node.is_dir:
+            raise _error(NotADirectoryError, errno.ENOTDIR, path)
+        return list(node.names)
+
+    def children(self, path: str) -> Iterator[Inode]:
+        """Child inodes of `path` in name order"""
+        node = self.lookup(path)
+        if not node.is_dir:
+            raise _error(NotADirectoryError, errno.ENOTDIR, path)
+        prefix = path.rstrip('/') + '/'
+        index = self._index
+        for name in node.names:
+            yield index[prefix + name]
+
+    def _walk(self, node: Inode) -> Iterator[Inode]:
+        """`node` and all its descendants, parents before children"""
+        stack = [node]
+        index = self._index
+        while stack:
+            current = stack.pop()
+            yield current
+            if current.names:
+                prefix = current.path.rstrip('/') + '/'
+                stack.extend(index[prefix + name] for name in current.names)
+
+    def remove(self, path: str, recursive: bool = False) -> None:
+        node = self.lookup(path)
+        if path == '/':
+            raise _error(PermissionError, errno.EPERM, path)
+        if node.is_dir and not recursive:
+            raise _error(IsADirectoryError, errno.EISDIR, path)
+        self._unlink(node)
+        for descendant in list(self._walk(node)):
+            del self._index[descendant.path]
+
+    def rmdir(self, path: str) -> None:
+        node = self.lookup(path)
+        if not node.is_dir:
+            raise _error(NotADirectoryError, errno.ENOTDIR, path)
+        if node.names:
+            raise _error(OSError, errno.ENOTEMPTY, path)
+        self.remove(path, recursive=True)
+
+    def move(self, src: str, dst: str) -> Inode:
+        """Rename `src` to `dst`; moving into an existing directory keeps the name"""
+        node = self.lookup(src)
+        target = self._index.get(dst)
+        if target is not None and target.is_dir:
+            dst = posixpath.join(dst, node.name)
+            target = self._index.get(dst)
+        if src == '/' or dst == src or dst.startswith(src.rstrip('/') + '/'):
+            raise _error(OSError, errno.EINVAL, dst)
+        if target is not None:
+            if target.is_dir or node.is_dir:
+                raise _error(FileExistsError, errno.EEXIST, dst)
+            self.remove(dst)
+        self._parent_dir(dst)
+
+        self._unlink(node)
+        parent = self._parent_dir(dst)  # after _unlink, which may have copied it up
+        moved = [self._writable(descendant) for descendant in self._walk(node)]
+        node = moved[0]
+        for descendant in moved:
+            del self._index[descendant.path]
+        node.name = posixpath.basename(dst)
+        old_prefix, new_prefix = node.path, dst
+        for descendant in moved:
+            descendant.path = new_prefix + descendant.path[len(old_prefix):]
+            self._index[descendant.path] = descendant
+        self._link(parent, node)
+        return node
+
+    def load(self, tree: Dict[str, Any], path: str = '/') -> None:
+        """Populate from the nested ``{"name": {...}}`` dict format"""
+        for name, item in tree.items():
+            child = posixpath.join(path, name)
+            if item.get('type') == 'file':
+                self.write(child, item.get('content', ''))
+            else:
+                self.mkdir(child)
+                self.load({k: v for k, v in item.items() if k != 'type'}, child)
+
+
+_MISSING = object()
+
+
+class _OverlayIndex:
+    """Path index reading through a private delta to a shared base index"""
+
+    __slots__ = ('base', 'upper', 'size')
+
+    def __init__(self, base: Dict[str, Inode]):
+        self.base = base
+        # path -> private inode, or None for a whiteout hiding a base entry
+        self.upper: Dict[str, Optional[Inode]] = {}
+        self.size = len(base)
+
+    def get(self, path: str, default: Optional[Inode] = None) -> Optional[Inode]:
+        node = self.upper.get(path, _MISSING)
+        if node is _MISSING:
+            return self.base.get(path, default)
+        return default if node is None else node
+
+    def __getitem__(self, path: str) -> Inode:
+        node = self.get(path)
+        if node is None:
+            raise KeyError(path)
+        return node
+
+    def __contains__(self, path: str) -> bool:
+        return self.get(path) is not None
+
+    def __setitem__(self, path: str, node: Inode) -> None:
+        if path not in self:
+            self.size += 1
+        self.upper[path] = node
+
+    def __delitem__(self, path: str) -> None:
+        if path in self.base:
+            self.upper[path] = None
+        else:
+            del self.upper[path]
+        self.size -= 1
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class OverlayFileSystem(VirtualFileSystem):
+    """Copy-on-write view of a shared base VirtualFileSystem
+
+    All overlays read the same base tree, which must not be modified while
+    they exist. Writes copy the touched inodes into a per-overlay delta, so an
+    idle overlay costs only its own object and an empty dict. ``fork`` and
+    ``snapshot`` share the delta and defer copying it to the first write;
+    ``reset`` drops it.
+    """
+
+    def __init__(self, base: VirtualFileSystem, readonly: bool = False):
+        self.base = base
+        self.store = base.store
+        self.root = base.root
+        self.readonly = readonly
+        self._index = _OverlayIndex(base._index)
+        self._shared = False
+
+    @property
+    def delta_size(self) -> int:
+        """Number of copied-up or whited-out paths"""
+        return len(self._index.upper)
+
+    def _own_delta(self) -> None:
+        if self.readonly:
+            raise _error(PermissionError, errno.EROFS, '/')
+        if self._shared:
+            # Another overlay still points at these inodes; take private copies
+            self._index.upper = {path: _clone(node) if node is not None else None
+                                 for path, node in self._index.upper.items()}
+            self._shared = False
+
+    def _writable(self, node: Inode) -> Inode:
+        self._own_delta()
+        upper = self._index.upper
+        existing = upper.get(node.path)
+        if existing is not None:
+            # Already copied up; `node` may be a stale base inode read before the copy
+            return existing
+        copy = _clone(node)
+        upper[node.path] = copy
+        return copy
+
+    def _link(self, parent: Inode, node: Inode) -> None:
+        self._own_delta()
+        super()._link(parent, node)
+
+    def remove(self, path: str, recursive: bool = False) -> None:
+        self._own_delta()
+        super().remove(path, recursive)
+
+    def fork(self, readonly: bool = False) -> 'OverlayFileSystem':
+        """O(1) copy of this view; the shared delta is copied on first write"""
+        child = OverlayFileSystem(self.base, readonly=readonly)
+        child._index.upper = self._index.upper
+        child._index.size = self._index.size
+        child._shared = True
+        self._shared = True
+        return child
+
+    def snapshot(self) -> 'OverlayFileSystem':
+        """Read-only fork of the current state"""
+        return self.fork(readonly=True)
+
+    def reset(self) -> None:
+        """Discard all changes and show the base tree again"""
+        self._index.upper = {}
+        self._index.size = len(self.base)
+        self._shared = False
+
+
+def _clone(node: Inode) -> Inode:
+    copy = Inode.__new__(Inode)
+    copy.path = node.path
+    copy.name = node.name
+    copy.names = list(node.names) if node.names is not None else None
+    copy.content = node.content
+    copy.mtime = node.mtime
+    return copy